@@ -1 +1,4 @@
 from .animation import *
+from .blit_animation import *
+from .redraw_scheduler import *
+from .frame_profiler import *
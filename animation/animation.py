@@ -1,18 +1,29 @@
 """
 Abstract animation class.
 """
-import matplotlib.pyplot as plt
-# from matplotlib.artist import Artist
-from matplotlib.lines import Line2D
-from matplotlib.text import Text
-from matplotlib.collections import Collection
-from matplotlib.quiver import QuiverKey, Quiver
-import matplotlib.animation as animation
+# Matplotlib is only imported when it is first used, so that importing
+# this module is cheap and a GUI can be shown before the figure is built.
 from .animation_constants import AnimationConstants
-from typing import List
+from .blit_animation import BlitAnimation
+from .frame_profiler import FrameProfiler
+from functools import lru_cache
+from typing import List, Union, TYPE_CHECKING
 from time import perf_counter
 
-artists = [Line2D, Collection, Text, QuiverKey, Quiver]
+if TYPE_CHECKING:
+    from matplotlib.artist import Artist
+
+
+@lru_cache(maxsize=None)
+def artist_types() -> tuple:
+    """
+    Return the types of plot attributes that are automatically added.
+    """
+    from matplotlib.lines import Line2D
+    from matplotlib.text import Text
+    from matplotlib.collections import Collection
+    from matplotlib.quiver import QuiverKey, Quiver
+    return (Line2D, Collection, Text, QuiverKey, Quiver)
 
 
 class Animation(AnimationConstants):
@@ -32,28 +43,45 @@ class Animation(AnimationConstants):
          or add plots individually using the add_plot and
          add_plots method.
         -Update the plots inside the update method, which must be
-         overriden.
+         overriden. If it returns False, nothing has changed and the
+         animation is paused until the wake method is called.
         -Call the animation_loop method to show the animation.
 
     Attributes:
     figure [Figure]: Use this to obtain plot elements.
     autoaddartists [bool]: Automatically add plot attributes if True.
+    headless [bool]: If True, the figure is drawn on an Agg canvas that
+                     does not need a display. Otherwise, a GUI canvas
+                     such as FigureCanvasTkAgg must be attached to the
+                     figure before the animation loop is started.
     self.delta_t [float]: The time between each frame in seconds of
-                          the animation.                
+                          the animation.
+    profiler [FrameProfiler]: Records the time spent in each phase of
+                              the frames. It is disabled by default.
     """
 
-    def __init__(self, autoaddartists: bool = False) -> None:
+    def __init__(self, autoaddartists: bool = False,
+                 headless: bool = False) -> None:
         """
         Initializer
         """
         AnimationConstants.__init__(self)
         self.autoaddartists = autoaddartists
-        self.figure = None
+        self.headless = headless
         self._plots = []
-        self.figure = plt.figure(
-                dpi=self.dots_per_inches)
+        # The figure is never registered with pyplot, so that several
+        # animations can be drawn in one process, and from several threads.
+        from matplotlib.figure import Figure
+        self.figure = Figure(dpi=self.dots_per_inches)
+        if headless:
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            FigureCanvasAgg(self.figure)
         self.delta_t = 1.0/60.0
         self._t = perf_counter()
+        self.main_animation = None
+        self._paused = False
+        self.profiler = FrameProfiler()
+        self._profiler_overlay = None
         # TODO: Figure out a better way to do this!
         self.backendiskivy = False
 
@@ -81,43 +109,79 @@ class Animation(AnimationConstants):
         # self.add_plots([self.line])
         pass
 
-    def add_plot(self, plot: plt.Artist) -> None:
+    def add_plot(self, plot: "Artist") -> None:
         """
         Add a list of plot objects so that they can be animated.
         """
         self._plots.append(plot)
 
-    def add_plots(self, plot_objects: List[plt.Artist]) -> None:
+    def add_plots(self, plot_objects: List["Artist"]) -> None:
         """
         Add a single plot to be animated.
         """
         for i in range(len(plot_objects)):
             self._plots.append(plot_objects[i])
 
-    def update(self) -> None:
+    def update(self) -> Union[bool, None]:
         """
         Update how each plots will change between each animation frame.
         This must be implemented in the inherited classes.
+        Return False if nothing has changed since the last frame.
         """
         raise NotImplementedError
 
+    def wake(self) -> None:
+        """
+        Resume the animation if it was paused because nothing changed.
+        """
+        if self._paused and self.main_animation is not None:
+            self._paused = False
+            self.main_animation.event_source.start()
+
     def _make_frame(self, i: int) -> list:
         """
         Generate a single animation frame.
         """
-        self.update()
+        if self.update() is False and self.main_animation is not None:
+            # Skip the following frames until something changes.
+            self._paused = True
+            self.main_animation.event_source.stop()
         t = perf_counter()
         self.delta_t = t - self._t
         self._t = t
+        if self._profiler_overlay is not None and \
+                self.profiler.frames % 10 == 0:
+            self._profiler_overlay.set_text(
+                "%.0f fps  %s" % (1.0/max(self.delta_t, 1e-6),
+                                  self.profiler.summary()))
         if not self.backendiskivy:
             return self._plots
         else:
             return []
 
-    def animation_loop(self) -> None:
-        """This method plays the animation. This must be called in order
-        for an animation to be shown.
+    def show_profiler_overlay(self) -> None:
+        """
+        Enable the profiler, and show the frame rate and frame times
+        in the bottom right corner of the first axes.
+        """
+        self.profiler.enabled = True
+        if self._profiler_overlay is None:
+            ax = self.figure.axes[0]
+            self._profiler_overlay = ax.text(
+                0.99, 0.01, "", transform=ax.transAxes, fontsize=6,
+                horizontalalignment="right", verticalalignment="bottom")
+            self._profiler_overlay.set_bbox(
+                {"facecolor": "white", "alpha": 0.8})
+            self._plots.append(self._profiler_overlay)
+
+    def collect_artists(self) -> None:
+        """
+        Add the plot attributes to the animated artists if autoaddartists
+        is set. This is done when the animation loop starts, whether it
+        is played by matplotlib or by another renderer.
         """
+        from matplotlib.text import Text
+        artists = artist_types()
         text_objects = []  # Ensure that text boxes are rendered last
         if self.autoaddartists:
             self_dict = self.__dict__
@@ -132,9 +196,14 @@ class Animation(AnimationConstants):
                             self._plots.append(self_dict[key])
             self._plots.extend(text_objects)
 
-        self.main_animation = animation.FuncAnimation(
-                self.figure,
-                self._make_frame,
-                blit=True,
-                interval=self.animation_interval
-        )
+    def animation_loop(self) -> None:
+        """This method plays the animation. This must be called in order
+        for an animation to be shown.
+        """
+        self.collect_artists()
+        # The artists are left out of the background from the first draw
+        for artist in self._plots:
+            artist.set_animated(True)
+        self.main_animation = BlitAnimation(self.figure, self._make_frame,
+                                            self.animation_interval,
+                                            self.profiler)
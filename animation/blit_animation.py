@@ -0,0 +1,112 @@
+"""
+Animation loop that blits its artists over a background.
+"""
+from itertools import count
+from .frame_profiler import FrameProfiler
+from typing import Callable, List, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from matplotlib.artist import Artist
+    from matplotlib.figure import Figure
+
+
+class BlitAnimation:
+    """
+    Call a function at the ticks of a timer of the canvas of a figure, and
+    blit the animated artists that it returns over the background.
+
+    Unlike FuncAnimation, which copies the background again whenever the
+    limits of the axes change, the background is only copied when the
+    whole figure is drawn, since everything else is an animated artist.
+    The limits of the axes can then change on every frame without
+    redrawing the figure, which leaves the grid and ticks behind until the
+    figure is drawn again, for example with draw_idle.
+
+    Attributes:
+    figure [Figure]: The figure that is animated.
+    event_source [TimerBase]: Timer of the animation, which is started
+                              once the figure is first drawn.
+    """
+
+    def __init__(self, figure: "Figure", func: Callable[[int], List["Artist"]],
+                 interval: int, profiler: FrameProfiler = None) -> None:
+        """
+        Initializer.
+
+        Parameters:
+        figure: The figure, whose canvas must already exist.
+        func: Called with the number of the frame, and returns the
+              animated artists.
+        interval: Time between the frames in milliseconds.
+        profiler: Records the time spent drawing as the draw phase
+                  of the frames, which it ends.
+        """
+        self.figure = figure
+        self.profiler = FrameProfiler() if profiler is None else profiler
+        self._func = func
+        self._frames = count()
+        self._artists = []
+        self._background = None
+        self._in_step = False
+        canvas = figure.canvas
+        self.event_source = canvas.new_timer(interval=interval)
+        self.event_source.add_callback(self.step)
+        self._first_draw = canvas.mpl_connect("draw_event", self._start)
+        canvas.mpl_connect("draw_event", self._on_draw)
+        canvas.mpl_connect("close_event",
+                           lambda event: self.event_source.stop())
+
+    def _start(self, event) -> None:
+        self.figure.canvas.mpl_disconnect(self._first_draw)
+        self.event_source.start()
+
+    def _on_draw(self, event) -> None:
+        """
+        Copy the background that the figure was just drawn with, and draw
+        the artists over it, since they are left out of the figure.
+        Artists that were removed from the figure since the last frame
+        are skipped.
+        """
+        canvas = self.figure.canvas
+        if not canvas.supports_blit:
+            return
+        self._background = canvas.copy_from_bbox(self.figure.bbox)
+        if not self._in_step:
+            for artist in self._artists:
+                if artist.figure is not None:
+                    artist.draw(event.renderer)
+
+    def step(self) -> None:
+        """
+        Make the next frame, and draw it.
+        """
+        self._in_step = True
+        try:
+            artists = self._func(next(self._frames))
+        finally:
+            self._in_step = False
+        with self.profiler.phase("draw"):
+            self.draw(artists)
+        self.profiler.end_frame()
+
+    def draw(self, artists: List["Artist"]) -> None:
+        """
+        Restore the background, and draw the artists over it
+        in the order of their zorder.
+        """
+        canvas = self.figure.canvas
+        for artist in artists:
+            artist.set_animated(True)
+        self._artists = sorted(artists, key=lambda a: a.get_zorder())
+        if not canvas.supports_blit:
+            canvas.draw_idle()
+            return
+        if self._background is None:
+            # Draws the artists once the background is copied
+            canvas.draw()
+            return
+        canvas.restore_region(self._background)
+        for artist in self._artists:
+            self.figure.draw_artist(artist)
+        for ax in {a.axes for a in self._artists if a.axes is not None}:
+            canvas.blit(ax.bbox)
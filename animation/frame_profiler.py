@@ -0,0 +1,133 @@
+"""
+Per-frame profiler.
+"""
+import numpy as np
+from contextlib import nullcontext
+from time import perf_counter
+from typing import Dict, Sequence, Tuple
+
+# Phases of a frame, in the order of the columns of the ring buffer.
+# The last column holds the total of all phases.
+PHASES = ("events", "compute", "artists", "draw")
+
+
+class _Phase:
+    """
+    Context manager that adds the time spent inside it to a phase of the
+    current frame. Nested uses of the same phase are only counted once.
+    """
+
+    def __init__(self, profiler: "FrameProfiler", index: int) -> None:
+        self._profiler = profiler
+        self._index = index
+        self._depth = 0
+        self._start = 0.0
+
+    def __enter__(self) -> None:
+        if self._depth == 0:
+            self._start = perf_counter()
+        self._depth += 1
+
+    def __exit__(self, *exc_info) -> None:
+        self._depth -= 1
+        if self._depth == 0:
+            self._profiler._current[self._index] += \
+                perf_counter() - self._start
+
+
+class FrameProfiler:
+    """
+    Record how long each phase of the frames of an animation takes.
+
+    The time spent in each phase is accumulated with the phase method,
+    and end_frame stores these times in a fixed-size ring buffer. Time spent
+    handling events between two frames is counted in the next frame.
+    When disabled, phase returns a shared context manager that does
+    nothing, and end_frame returns immediately.
+
+    Attributes:
+    enabled [bool]: Whether anything is recorded.
+    capacity [int]: Number of frames kept in the ring buffer.
+    frames [int]: Total number of recorded frames.
+    """
+
+    def __init__(self, capacity: int = 1024, enabled: bool = False) -> None:
+        """
+        Initializer.
+        """
+        self.enabled = enabled
+        self.capacity = capacity
+        self.frames = 0
+        self._times = np.zeros([capacity, len(PHASES) + 1])
+        self._current = np.zeros([len(PHASES)])
+        self._phases = {name: _Phase(self, i)
+                        for i, name in enumerate(PHASES)}
+        self._null = nullcontext()
+
+    def phase(self, name: str):
+        """
+        Return a context manager that times a phase of the current frame.
+        """
+        if not self.enabled:
+            return self._null
+        return self._phases[name]
+
+    def end_frame(self) -> None:
+        """
+        Store the times of the current frame, and start the next one.
+        """
+        if not self.enabled:
+            return
+        row = self._times[self.frames % self.capacity]
+        row[:-1] = self._current
+        row[-1] = np.sum(self._current)
+        self._current[:] = 0.0
+        self.frames += 1
+
+    def reset(self) -> None:
+        """
+        Forget all recorded frames.
+        """
+        self.frames = 0
+        self._current[:] = 0.0
+
+    def times(self) -> np.ndarray:
+        """
+        Return a (frames, phases + 1) array of the recorded times
+        in milliseconds, from the oldest to the newest frame. The
+        last column is the total time of each frame.
+        """
+        n = min(self.frames, self.capacity)
+        start = self.frames % self.capacity if self.frames > n else 0
+        return 1000.0*np.roll(self._times[:n], -start, axis=0)
+
+    def percentiles(self, q: Sequence[float] = (50, 95, 99)
+                    ) -> Dict[str, Dict[str, float]]:
+        """
+        Return the given percentiles, in milliseconds, of each phase
+        and of the total time of the recorded frames.
+        """
+        times = self.times()
+        if len(times) == 0:
+            return {}
+        values = np.percentile(times, q, axis=0)
+        return {name: {"p%g" % p: float(values[j, i])
+                       for j, p in enumerate(q)}
+                for i, name in enumerate(PHASES + ("total",))}
+
+    def histogram(self, bins: int = 20) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the counts and the bin edges, in milliseconds,
+        of a histogram of the total frame times.
+        """
+        return np.histogram(self.times()[:, -1], bins)
+
+    def summary(self) -> str:
+        """
+        Return a short description of the total frame times.
+        """
+        p = self.percentiles().get("total")
+        if p is None:
+            return "no frames"
+        return "p50 %.1f ms  p95 %.1f ms  p99 %.1f ms" % (
+            p["p50"], p["p95"], p["p99"])
@@ -0,0 +1,113 @@
+"""
+Redraw scheduler.
+"""
+from typing import Callable, Dict, List, Sequence, Set
+
+
+class RedrawScheduler:
+    """
+    Coalesce bursts of events into at most one recomputation per frame.
+
+    Each component of a plot (for example the quiver or the title) is
+    registered with the callback that recomputes it. Events only record
+    the latest arguments of a component and mark it as dirty, which also
+    marks all of its dependents. The dirty components are then recomputed
+    once, in order, when flush is called at the start of a frame.
+
+    Attributes:
+    on_request [Callable]: Called whenever a clean component is marked as
+                           dirty, which can be used to wake up a paused
+                           animation loop.
+    """
+
+    def __init__(self, on_request: Callable[[], None] = None) -> None:
+        """
+        Initializer.
+        """
+        self.on_request = on_request
+        self._order: List[str] = []
+        self._callbacks: Dict[str, Callable] = {}
+        self._dependents: Dict[str, Sequence[str]] = {}
+        self._args: Dict[str, tuple] = {}
+        self._dirty: Set[str] = set()
+
+    def register(self, name: str, callback: Callable,
+                 dependents: Sequence[str] = (), args: tuple = (),
+                 depends_on: Sequence[str] = ()) -> None:
+        """
+        Register a component.
+
+        Parameters:
+        name: Name of the component.
+        callback: Function that recomputes the component. It is called
+                  with the latest arguments given to request.
+        dependents: Components that must be recomputed whenever this
+                    one is. A component is always recomputed before its
+                    dependents, so it is inserted before any of them that
+                    are already registered.
+        args: Initial arguments of the callback.
+        depends_on: Components that are already registered, which this
+                    one is added as a dependent to.
+        """
+        index = len(self._order)
+        for dependent in dependents:
+            if dependent in self._order:
+                index = min(index, self._order.index(dependent))
+        self._order.insert(index, name)
+        self._callbacks[name] = callback
+        self._dependents[name] = tuple(dependents)
+        self._args[name] = tuple(args)
+        for dependency in depends_on:
+            self._dependents[dependency] += (name,)
+
+    def request(self, name: str, *args) -> None:
+        """
+        Request that a component be recomputed with the given arguments.
+        Only the arguments of the latest request are kept.
+        """
+        if args:
+            self._args[name] = args
+        self.mark(name)
+
+    def mark(self, *names: str) -> None:
+        """
+        Mark components, as well as all of their dependents, as dirty.
+        Names that have not been registered are ignored.
+        """
+        was_clean = not self._dirty
+        stack = list(names)
+        while stack:
+            name = stack.pop()
+            if name not in self._dirty and name in self._callbacks:
+                self._dirty.add(name)
+                stack.extend(self._dependents.get(name, ()))
+        if was_clean and self._dirty and self.on_request is not None:
+            self.on_request()
+
+    def clean(self, *names: str) -> None:
+        """
+        Mark components as clean without recomputing them. When called
+        from a callback during flush, this skips components that come
+        later in the order, such as the dependents of the callback.
+        """
+        self._dirty.difference_update(names)
+
+    def is_dirty(self, name: str = None) -> bool:
+        """
+        Return whether the given component, or any component
+        if no name is given, is dirty.
+        """
+        return name in self._dirty if name is not None else bool(self._dirty)
+
+    def flush(self) -> bool:
+        """
+        Recompute all dirty components.
+        Return whether anything was recomputed.
+        """
+        if not self._dirty:
+            return False
+        for name in self._order:
+            if name in self._dirty:
+                self._dirty.discard(name)
+                self._callbacks[name](*self._args[name])
+        return True
@@ -0,0 +1,257 @@
+"""
+Precomputed atlas of the plot for a 1D or 2D slice of parameter space.
+
+The atlas stores the pixels of the axes of the phase portrait for every
+point of a lattice of matrices, in which one or two of the elements vary
+and the others are fixed. The frames are kept in a memory-mapped .npy file,
+so an atlas can be much larger than the available memory, and only the
+frames that are shown are read from disk. When the matrix lies on the
+lattice, the frame is blitted as is instead of recomputing the plot, which
+takes the same short time for every matrix.
+
+Build an atlas where a and d vary with
+
+    python atlas.py atlas_dir --matrix -0.5 -1.5 1.5 -0.5 \\
+        --vary a -10 10 0.5 --vary d -10 10 0.5
+
+and show it with python tk_app.py --atlas atlas_dir.
+"""
+import argparse
+import json
+import os
+import numpy as np
+from matplotlib.artist import Artist
+from typing import List, Sequence, Tuple
+
+ELEMENTS = ("a", "b", "c", "d")
+
+
+def axes_region(ax) -> Tuple[int, int, int, int]:
+    """
+    Return the pixels x0, y0, x1, y1 that lie inside the axes, with the
+    origin at the bottom left of the canvas. The edges are rounded
+    inwards, so that the spines are left to the background. The aspect
+    ratio of the axes is applied first, since it is otherwise only
+    applied once they are drawn.
+    """
+    ax.apply_aspect()
+    bbox = ax.bbox
+    return (int(np.ceil(bbox.x0)), int(np.ceil(bbox.y0)),
+            int(np.floor(bbox.x1)), int(np.floor(bbox.y1)))
+
+
+class RenderAtlas:
+    """
+    Frames of the axes of the plot for a lattice of matrices.
+
+    Attributes:
+    path [str]: Directory holding atlas.json and frames.npy.
+    matrix [np.ndarray]: Elements a, b, c, d of the matrix, of which
+                         those that do not vary are fixed.
+    elements [List[int]]: Indices of the one or two elements that vary.
+    start [np.ndarray]: First value of each varying element.
+    step [np.ndarray]: Spacing of the values of each varying element.
+    shape [Tuple[int, ...]]: Number of values of each varying element.
+    bounds [List[float]]: Bounds of the plot.
+    grid_points [int]: Number of points of the grid along each axis.
+    flow_texture [bool]: Whether the frames show the flow texture.
+    region [Tuple[int, int, int, int]]: Pixels of the canvas covered by
+                                        the frames, as given by
+                                        axes_region.
+    tolerance [float]: Largest difference between a matrix element and
+                       the lattice for a matrix to lie on the lattice.
+    frames [np.memmap]: (*shape, height, width, 4) uint8 array of the
+                        frames, whose first row is at the bottom.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Open the atlas stored in the directory path.
+        """
+        self.path = path
+        with open(os.path.join(path, "atlas.json")) as f:
+            meta = json.load(f)
+        self.matrix = np.array(meta["matrix"])
+        self.elements = list(meta["elements"])
+        self.start = np.array(meta["start"])
+        self.step = np.array(meta["step"])
+        self.shape = tuple(meta["shape"])
+        self.bounds = list(meta["bounds"])
+        self.grid_points = meta["grid_points"]
+        self.flow_texture = meta["flow_texture"]
+        self.region = tuple(meta["region"])
+        self.tolerance = meta["tolerance"]
+        # Agg only draws from writable buffers, so the file is mapped
+        # copy-on-write. It is never written to, so nothing is copied.
+        self.frames = np.load(os.path.join(path, "frames.npy"),
+                              mmap_mode="c")
+
+    def index(self, m: np.ndarray) -> Tuple[int, ...]:
+        """
+        Return the index of the frame of the matrix m,
+        or None if m does not lie on the lattice.
+        """
+        m = np.ravel(m)
+        fixed = np.ones(4, bool)
+        fixed[self.elements] = False
+        if np.any(np.abs(m[fixed] - self.matrix[fixed]) > self.tolerance):
+            return None
+        position = (m[self.elements] - self.start)/self.step
+        index = np.rint(position)
+        if np.any(np.abs(position - index)*self.step > self.tolerance) or \
+                np.any(index < 0) or np.any(index >= self.shape):
+            return None
+        return tuple(index.astype(int).tolist())
+
+    def lookup(self, m: np.ndarray) -> np.ndarray:
+        """
+        Return the frame of the matrix m, as a view of the memory-mapped
+        file, or None if m does not lie on the lattice.
+        """
+        index = self.index(m)
+        return None if index is None else self.frames[index]
+
+    def matches(self, ax, bounds: Sequence[float], grid_points: int,
+                flow_texture: bool) -> bool:
+        """
+        Return whether the frames can be blitted onto the given axes,
+        which must cover the same pixels and show the same plot.
+        """
+        return (axes_region(ax) == self.region
+                and np.allclose(bounds, self.bounds)
+                and grid_points == self.grid_points
+                and flow_texture == self.flow_texture)
+
+
+class AtlasImage(Artist):
+    """
+    Artist that copies a frame of an atlas, pixel for pixel and without
+    resampling, to the region of the canvas it was rendered from.
+    """
+
+    def __init__(self, region: Tuple[int, int, int, int]) -> None:
+        """
+        Initializer.
+        """
+        Artist.__init__(self)
+        self.region = region
+        self.frame = None
+
+    def set_frame(self, frame: np.ndarray) -> None:
+        """
+        Set the (height, width, 4) uint8 frame to draw,
+        whose first row is at the bottom.
+        """
+        self.frame = frame
+        self.stale = True
+
+    def draw(self, renderer) -> None:
+        if not self.get_visible() or self.frame is None:
+            return
+        gc = renderer.new_gc()
+        renderer.draw_image(gc, self.region[0], self.region[1], self.frame)
+        gc.restore()
+        self.stale = False
+
+
+def lattice_values(start: float, stop: float, step: float) -> np.ndarray:
+    """
+    Return the values from start to stop, inclusive, with the given step.
+    """
+    return start + step*np.arange(int(np.floor((stop - start)/step
+                                                + 1e-9)) + 1)
+
+
+def build_atlas(path: str, matrix: Sequence[float],
+                vary: List[Tuple[int, float, float, float]],
+                bounds: List[float] = None, grid_points: int = 21,
+                flow_texture: bool = False,
+                tolerance: float = 0.005) -> RenderAtlas:
+    """
+    Render the frames of an atlas to the directory path.
+
+    Parameters:
+    matrix: Elements a, b, c, d of the matrix. Those that vary
+            are ignored.
+    vary: For each of the one or two elements that vary, its index
+          and the start, stop and step of its values.
+    bounds: Bounds of the plot. If not given, these are read from the
+            resources folder.
+    grid_points: Number of points of the grid along each axis.
+    flow_texture: Also show a line integral convolution texture.
+    tolerance: Largest difference between a matrix element and the
+               lattice for a matrix to lie on the lattice. The default
+               is half of the resolution of the sliders.
+    """
+    from linear_vector_field import LinearVectorField2D
+    if not 1 <= len(vary) <= 2:
+        raise ValueError("An atlas must vary one or two elements.")
+    elements = [v[0] for v in vary]
+    values = [lattice_values(*v[1:]) for v in vary]
+    shape = tuple(len(v) for v in values)
+
+    field = LinearVectorField2D(bounds, headless=True,
+                                grid_points=grid_points)
+    if flow_texture:
+        field.show_flow_texture()
+    # The interactive trajectories are drawn live on top of the frames
+    field.interactive_line.set_visible(False)
+    field.ic_trajectories.set_visible(False)
+    # The axes only take their final size, which keeps the aspect
+    # ratio equal, once they are drawn.
+    field.figure.canvas.draw()
+    x0, y0, x1, y1 = region = axes_region(field.ax)
+
+    os.makedirs(path, exist_ok=True)
+    frames = np.lib.format.open_memmap(
+        os.path.join(path, "frames.npy"), mode="w+", dtype=np.uint8,
+        shape=shape + (y1 - y0, x1 - x0, 4))
+    m = np.array(matrix, np.float64)
+    for index in np.ndindex(*shape):
+        for element, v, i in zip(elements, values, index):
+            m[element] = v[i]
+        field.set_matrix(*m)
+        field.plot_vector_field()
+        field.figure.canvas.draw()
+        pixels = np.asarray(field.figure.canvas.buffer_rgba())
+        height = pixels.shape[0]
+        frames[index] = pixels[height - y1:height - y0, x0:x1][::-1]
+    frames.flush()
+    del frames
+
+    meta = {"matrix": list(map(float, matrix)), "elements": elements,
+            "start": [float(v[0]) for v in values],
+            "step": [float(v[3]) for v in vary], "shape": shape,
+            "bounds": field.bounds.tolist(), "grid_points": grid_points,
+            "flow_texture": flow_texture, "region": region,
+            "tolerance": tolerance}
+    with open(os.path.join(path, "atlas.json"), "w") as f:
+        json.dump(meta, f, indent=1)
+    return RenderAtlas(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Pre-render the plot for a 1D or 2D slice of the "
+                    "matrices of x' = ax + by, y' = cx + dy.")
+    parser.add_argument("path", help="Directory to write the atlas to.")
+    parser.add_argument("--matrix", type=float, nargs=4,
+                        default=[-0.5, -1.5, 1.5, -0.5],
+                        metavar=("a", "b", "c", "d"),
+                        help="Values of the elements that do not vary.")
+    parser.add_argument("--vary", nargs=4, action="append", required=True,
+                        metavar=("ELEMENT", "START", "STOP", "STEP"),
+                        help="An element that varies, and its values. "
+                             "This may be given once or twice.")
+    parser.add_argument("--bounds", type=float, nargs=4,
+                        metavar=("xmin", "xmax", "ymin", "ymax"))
+    parser.add_argument("--grid-points", type=int, default=21)
+    parser.add_argument("--flow-texture", action="store_true")
+    args = parser.parse_args()
+    vary = [(ELEMENTS.index(v[0]),) + tuple(map(float, v[1:]))
+            for v in args.vary]
+    atlas = build_atlas(args.path, args.matrix, vary, args.bounds,
+                        args.grid_points, args.flow_texture)
+    print("%d frames of %dx%d pixels, %.1f MB" % (
+        int(np.prod(atlas.shape)), atlas.frames.shape[-2],
+        atlas.frames.shape[-3], atlas.frames.nbytes/1e6))
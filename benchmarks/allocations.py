@@ -0,0 +1,180 @@
+"""
+Allocation check of the update path of LinearVectorField2D.
+
+Each update is driven through the redraw scheduler as the sliders and the
+mouse would drive it, and tracemalloc records the peak memory allocated
+above what was in use before the update, as well as the memory that is
+still held after it. The garbage collections that run during the updates
+are also counted. Run it from the root of the repository with
+
+    python -m benchmarks.allocations
+
+which exits with a non-zero status if the median peak of any scenario is
+above --max-peak-kb, or if the memory held keeps growing with the number
+of updates. The trajectories are written to buffers that are reused
+between updates, so the peak mostly comes from the small temporaries of
+NumPy and from the copies that the artists keep of their data.
+"""
+import argparse
+import gc
+import tracemalloc
+import numpy as np
+from linear_vector_field import LinearVectorField2D
+from typing import Callable, Dict, List
+
+
+def make_field(trajectories: int,
+               initial_conditions: int) -> LinearVectorField2D:
+    """
+    Make a headless field with the given numbers of trajectories and
+    initial conditions, drawn once so that it is fully set up.
+    """
+    field = LinearVectorField2D(headless=True)
+    rng = np.random.default_rng(0)
+    field.set_trajectory_coeffs(rng.uniform(-4.0, 4.0, [trajectories, 2]))
+    field.set_initial_conditions(
+        rng.uniform(-8.0, 8.0, [initial_conditions, 2]))
+    field.figure.canvas.draw()
+    return field
+
+
+def scenarios(field: LinearVectorField2D, matrices: int,
+              initial_conditions: int,
+              warmup: int) -> Dict[str, Callable[[int], None]]:
+    """
+    Return the update of each scenario for its i-th step. The matrices
+    cycle through a fixed set, so that the cache stops growing once all
+    of them were seen. The largest number of initial conditions is used
+    during the warmup, and the measured updates then cycle through the
+    smaller numbers, so that the scratch buffers must be reused for
+    numbers of trajectories that they were not allocated for.
+    """
+    elements = [(-0.5 + 0.01*i, -1.5, 1.5, -0.5) for i in range(matrices)]
+    points = np.random.default_rng(1).uniform(
+        -8.0, 8.0, [initial_conditions, 2])
+    request = field.scheduler.request
+
+    def drag(i: int) -> None:
+        request("interactive_line", 3.0, 2.0 + 0.01*(i % 100))
+        field.update()
+
+    def slider(i: int) -> None:
+        request("matrix", *elements[i % matrices])
+        field.update()
+
+    def both(i: int) -> None:
+        request("matrix", *elements[i % matrices])
+        request("interactive_line", 3.0, 2.0 + 0.01*(i % 100))
+        field.update()
+
+    def varying_initial_conditions(i: int) -> None:
+        # The scratch buffers of the adaptive sampler are the ones that
+        # depend on the number of trajectories
+        if not field.sampler.adaptive:
+            field.set_adaptive_sampling(True)
+        rows = initial_conditions if i < warmup else \
+            1 + (i - warmup) % max(initial_conditions - 1, 1)
+        field.set_initial_conditions(points[:rows])
+        field.update()
+
+    return {"drag": drag, "slider": slider, "slider_and_drag": both,
+            "varying_initial_conditions": varying_initial_conditions}
+
+
+def measure(update: Callable[[int], None], warmup: int,
+            updates: int) -> Dict[str, float]:
+    """
+    Run update for warmup steps, then measure the allocations of each of
+    the next updates steps. Return the median and maximum peak in KB, the
+    memory in KB that is held after the updates and was not before them,
+    and the number of garbage collections.
+    """
+    for i in range(warmup):
+        update(i)
+    collections = []
+    callback = lambda phase, info: phase == "start" and collections.append(
+        info["generation"])
+    # Allocated up front, so that recording the peaks does not itself
+    # add to the memory held
+    peaks = np.zeros(updates)
+    gc.callbacks.append(callback)
+    tracemalloc.start()
+    try:
+        start = tracemalloc.get_traced_memory()[0]
+        for i in range(updates):
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            update(warmup + i)
+            peaks[i] = tracemalloc.get_traced_memory()[1] - before
+        held = tracemalloc.get_traced_memory()[0] - start
+    finally:
+        tracemalloc.stop()
+        gc.callbacks.remove(callback)
+    peaks /= 1e3
+    return {"median_peak_kb": float(np.median(peaks)),
+            "max_peak_kb": float(np.max(peaks)),
+            "held_kb": held/1e3, "collections": len(collections),
+            "updates": updates}
+
+
+def run(trajectories: int, initial_conditions: int, matrices: int,
+        varying_initial_conditions: int, warmup: int,
+        updates: int) -> Dict[str, Dict[str, float]]:
+    """
+    Measure every scenario on a new field.
+    """
+    field = make_field(trajectories, initial_conditions)
+    return {name: measure(update, warmup, updates)
+            for name, update in scenarios(field, matrices,
+                                          varying_initial_conditions,
+                                          warmup).items()}
+
+
+def failures(results: Dict[str, Dict[str, float]], max_peak_kb: float,
+             max_held_kb: float) -> List[str]:
+    """
+    Return a description of each scenario above the thresholds.
+    """
+    messages = []
+    for name, r in results.items():
+        if r["median_peak_kb"] > max_peak_kb:
+            messages.append("%s: median peak %.1f KB > %.1f KB" % (
+                name, r["median_peak_kb"], max_peak_kb))
+        if r["held_kb"] > max_held_kb:
+            messages.append("%s: %.1f KB held after %d updates > %.1f KB" % (
+                name, r["held_kb"], r["updates"], max_held_kb))
+    return messages
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Check the allocations of the update path of "
+                    "LinearVectorField2D.")
+    parser.add_argument("--trajectories", type=int, default=8)
+    parser.add_argument("--initial-conditions", type=int, default=8)
+    parser.add_argument("--matrices", type=int, default=20,
+                        help="Number of distinct matrices of the sliders.")
+    parser.add_argument("--varying-initial-conditions", type=int,
+                        default=16,
+                        help="Largest number of initial conditions of the "
+                             "scenario where this number changes.")
+    parser.add_argument("--warmup", type=int, default=40)
+    parser.add_argument("--updates", type=int, default=200)
+    parser.add_argument("--max-peak-kb", type=float, default=128.0,
+                        help="Largest allowed median peak of an update.")
+    parser.add_argument("--max-held-kb", type=float, default=64.0,
+                        help="Largest allowed growth of the memory held "
+                             "over all of the updates.")
+    args = parser.parse_args()
+
+    results = run(args.trajectories, args.initial_conditions, args.matrices,
+                  args.varying_initial_conditions, args.warmup, args.updates)
+    for name, r in results.items():
+        print("%-26s peak median %7.1f KB  max %7.1f KB  held %6.1f KB  "
+              "gc %d" % (name, r["median_peak_kb"], r["max_peak_kb"],
+                         r["held_kb"], r["collections"]))
+    messages = failures(results, args.max_peak_kb, args.max_held_kb)
+    for message in messages:
+        print("FAIL " + message)
+    if messages:
+        raise SystemExit(1)
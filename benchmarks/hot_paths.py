@@ -0,0 +1,205 @@
+"""
+Benchmarks of the compute and render hot paths of LinearVectorField2D.
+
+Everything is drawn headless on the Agg canvas, so this can run without a
+display. Run it from the root of the repository with
+
+    python -m benchmarks.hot_paths --output results.json
+
+and compare two runs with
+
+    python -m benchmarks.hot_paths --output new.json --compare old.json
+
+which exits with a non-zero status if any benchmark got slower than the
+given threshold.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import matplotlib
+import numpy as np
+from linear_vector_field import LinearVectorField2D
+from phase_diagram import FIXED_POINT_TYPES, classify
+from typing import Callable, Dict, List
+
+# A matrix for every type of fixed point
+MATRICES = {
+    "Non-isolated": (1.0, 2.0, 2.0, 4.0),
+    "Saddle Node": (1.0, 0.5, 0.0, -1.0),
+    "Stable Node": (-2.0, 0.5, 0.0, -1.0),
+    "Unstable Node": (2.0, 0.5, 0.0, 1.0),
+    "Star": (1.5, 0.0, 0.0, 1.5),
+    "Degernate Node": (-1.0, 1.0, 0.0, -1.0),
+    "Stable Spiral": (-0.5, -1.5, 1.5, -0.5),
+    "Unstable Spiral": (0.5, -1.5, 1.5, 0.5),
+    "Centre": (0.0, -2.0, 1.0, 0.0),
+}
+
+
+def timings(function: Callable[[int], None], repeats: int,
+            setup: Callable[[int], None] = None) -> List[float]:
+    """
+    Return the durations in seconds of repeats calls of function(i),
+    each preceded by an untimed call of setup(i).
+    """
+    durations = []
+    for i in range(repeats):
+        if setup is not None:
+            setup(i)
+        t0 = time.perf_counter()
+        function(i)
+        durations.append(time.perf_counter() - t0)
+    return durations
+
+
+def summary(durations: List[float]) -> Dict[str, float]:
+    """
+    Summarize a list of durations in milliseconds.
+    """
+    ms = 1000.0*np.array(durations)
+    return {"median_ms": float(np.median(ms)),
+            "p95_ms": float(np.percentile(ms, 95)),
+            "min_ms": float(np.min(ms)), "repeats": len(ms)}
+
+
+def make_field(grid_points: int, trajectories: int) -> LinearVectorField2D:
+    """
+    Make a headless field with the given grid size and number of
+    trajectories. The cache only holds one matrix, and the matrix is
+    alternated between calls, so that every call computes its results.
+    """
+    field = LinearVectorField2D(headless=True, cache_capacity=1,
+                                grid_points=grid_points)
+    rng = np.random.default_rng(0)
+    field.set_trajectory_coeffs(rng.uniform(-4.0, 4.0, [trajectories, 2]))
+    field.animation_loop()
+    field.main_animation.event_source.stop()
+    return field
+
+
+def bench_matrix(field: LinearVectorField2D, elements: tuple,
+                 repeats: int) -> Dict[str, List[float]]:
+    """
+    Time each hot path for the matrix with the given elements.
+    """
+    # Alternate with a slightly different matrix so the cache never hits
+    other = (elements[0] + 0.01,) + tuple(elements[1:])
+    choose = lambda i: elements if i % 2 == 0 else other
+    set_matrix = lambda i: field.set_matrix(*choose(i))
+
+    def clear(i: int) -> None:
+        set_matrix(i)
+        entry = field._cache_entry
+        entry.fptype, entry.uvc, entry.trajectories = None, None, None
+
+    canvas = field.figure.canvas
+    ax = field.ax
+    canvas.draw()
+    background = canvas.copy_from_bbox(ax.bbox)
+
+    def frame(i: int) -> None:
+        artists = field._make_frame(i)
+        canvas.restore_region(background)
+        for artist in artists:
+            ax.draw_artist(artist)
+        canvas.blit(ax.bbox)
+
+    return {
+        "set_matrix": timings(set_matrix, repeats),
+        "set_matrix_element": timings(
+            lambda i: field.set_matrix_element(0, 0, choose(i)[0]), repeats),
+        "classify_fixed_point": timings(
+            lambda i: field.classify_fixed_point(), repeats),
+        "plot_trajectories": timings(
+            lambda i: field.plot_trajectories(init_call=False), repeats,
+            clear),
+        "plot_vector_field": timings(
+            lambda i: field.plot_vector_field(init_call=False), repeats,
+            clear),
+        "set_interactive_line": timings(
+            lambda i: field.set_interactive_line(3.0, 2.0 + 0.01*i),
+            repeats),
+        "frame": timings(frame, repeats, lambda i: field.scheduler.request(
+            "matrix", *choose(i))),
+    }
+
+
+def run(grid_points: List[int], trajectories: List[int],
+        repeats: int) -> dict:
+    """
+    Run all benchmarks, and return the results with some metadata.
+    """
+    results = []
+    for n_grid in grid_points:
+        for n_trajectories in trajectories:
+            field = make_field(n_grid, n_trajectories)
+            for name, elements in MATRICES.items():
+                assert FIXED_POINT_TYPES[classify(
+                    np.reshape(elements, [2, 2]))] == name
+                for op, durations in bench_matrix(field, elements,
+                                                  repeats).items():
+                    results.append({"op": op, "fixed_point": name,
+                                    "grid_points": n_grid,
+                                    "trajectories": n_trajectories,
+                                    **summary(durations)})
+    return {"meta": {"python": sys.version.split()[0],
+                     "numpy": np.__version__,
+                     "matplotlib": matplotlib.__version__,
+                     "platform": platform.platform(),
+                     "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                     "repeats": repeats},
+            "results": results}
+
+
+def compare(new: dict, old: dict, threshold: float) -> List[str]:
+    """
+    Return a description of each benchmark whose median time
+    is more than threshold times its old median time.
+    """
+    key = lambda r: (r["op"], r["fixed_point"], r["grid_points"],
+                     r["trajectories"])
+    old_results = {key(r): r for r in old["results"]}
+    regressions = []
+    for r in new["results"]:
+        o = old_results.get(key(r))
+        if o is not None and r["median_ms"] > threshold*o["median_ms"]:
+            regressions.append("%s [%s, grid %d, %d trajectories]: "
+                               "%.3f ms -> %.3f ms" % (
+                                   r["op"], r["fixed_point"],
+                                   r["grid_points"], r["trajectories"],
+                                   o["median_ms"], r["median_ms"]))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the hot paths of LinearVectorField2D.")
+    parser.add_argument("--grid-points", type=int, nargs="+", default=[21])
+    parser.add_argument("--trajectories", type=int, nargs="+",
+                        default=[8, 200])
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--compare", metavar="OLD_JSON",
+                        help="Results of a previous run to compare with.")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="Slowdown factor that counts as a regression.")
+    args = parser.parse_args()
+
+    results = run(args.grid_points, args.trajectories, args.repeats)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=1)
+    table = {}
+    for r in results["results"]:
+        table.setdefault((r["op"], r["grid_points"], r["trajectories"]),
+                         []).append(r["median_ms"])
+    for (op, n_grid, n_trajectories), medians in table.items():
+        print("%-22s grid %4d  trajectories %5d  median %8.3f ms" % (
+            op, n_grid, n_trajectories, np.median(medians)))
+    if args.compare is not None:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print("Regression: " + regression)
+        sys.exit(1 if regressions else 0)
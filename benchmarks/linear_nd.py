@@ -0,0 +1,96 @@
+"""
+Scaling benchmarks of the N-dimensional linear system core.
+
+Times LinearSystem.flow with the eigen-decomposition and with the batched
+matrix exponentials, as the dimension N, the number of trajectories K and
+the number of time samples T grow one at a time from a base case. Run it
+from the root of the repository with
+
+    python -m benchmarks.linear_nd --output linear_nd.json
+
+which prints the median time of each case and the number of points
+computed per second.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import numpy as np
+from linear_system_nd import LinearSystem, random_matrix
+from typing import Dict, List
+
+
+def bench(dim: int, trajectories: int, samples: int, method: str,
+          repeats: int) -> Dict[str, float]:
+    """
+    Time the flow of trajectories initial conditions at samples times
+    for a random system of the given dimension.
+    """
+    system = LinearSystem(random_matrix(dim))
+    rng = np.random.default_rng(1)
+    x0 = rng.normal(size=(trajectories, dim))
+    t = np.linspace(-2.0, 2.0, samples)
+    system.flow(x0, t, method)
+    durations = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        system.flow(x0, t, method)
+        durations.append(time.perf_counter() - t0)
+    median = float(np.median(durations))
+    return {"dim": dim, "trajectories": trajectories, "samples": samples,
+            "method": method, "median_ms": 1000.0*median,
+            "min_ms": 1000.0*float(np.min(durations)),
+            "points_per_second": trajectories*samples/median,
+            "repeats": repeats}
+
+
+def run(dims: List[int], trajectories: List[int], samples: List[int],
+        base: List[int], repeats: int) -> dict:
+    """
+    Run the benchmarks, varying one of N, K and T at a time while the
+    others keep their base values, and return the results with some
+    metadata.
+    """
+    cases = []
+    for values, axis in ((dims, 0), (trajectories, 1), (samples, 2)):
+        for value in values:
+            case = list(base)
+            case[axis] = value
+            if tuple(case) not in cases:
+                cases.append(tuple(case))
+    results = [bench(*case, method, repeats)
+               for case in cases for method in ("eig", "expm")]
+    return {"meta": {"python": sys.version.split()[0],
+                     "numpy": np.__version__,
+                     "platform": platform.platform(),
+                     "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                     "base": base, "repeats": repeats},
+            "results": results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the scaling of the N-dimensional linear "
+                    "system core.")
+    parser.add_argument("--dims", type=int, nargs="+",
+                        default=[2, 3, 4, 6, 8, 10])
+    parser.add_argument("--trajectories", type=int, nargs="+",
+                        default=[1, 10, 100, 1000, 10000])
+    parser.add_argument("--samples", type=int, nargs="+",
+                        default=[10, 100, 1000])
+    parser.add_argument("--base", type=int, nargs=3, default=[3, 100, 100],
+                        metavar=("N", "K", "T"),
+                        help="Values of the parameters that are not varied.")
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--output", default="linear_nd_results.json")
+    args = parser.parse_args()
+
+    results = run(args.dims, args.trajectories, args.samples, args.base,
+                  args.repeats)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=1)
+    for r in results["results"]:
+        print("N %3d  K %6d  T %5d  %-4s  median %9.3f ms  %8.2f M points/s"
+              % (r["dim"], r["trajectories"], r["samples"], r["method"],
+                 r["median_ms"], r["points_per_second"]/1e6))
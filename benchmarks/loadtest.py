@@ -0,0 +1,99 @@
+"""
+Load test of the phase portrait HTTP service in server.py.
+
+Run it from the root of the repository with
+
+    python -m benchmarks.loadtest --requests 500 --concurrency 8
+
+which starts a server in this process on a free port, or point it at a
+running server with --url. The matrices of the requests are drawn from a
+fixed number of distinct ones, which sets how often the response cache
+is hit.
+"""
+import argparse
+import json
+import threading
+import time
+import urllib.request
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from server import PortraitServer
+from typing import Dict, List
+
+
+def request_urls(base_url: str, requests: int, distinct: int,
+                 path: str = "/portrait.png", seed: int = 0) -> List[str]:
+    """
+    Return the URLs of requests for matrices drawn at random
+    from distinct random matrices.
+    """
+    rng = np.random.default_rng(seed)
+    matrices = np.round(rng.uniform(-2.0, 2.0, [distinct, 4]), 2)
+    choices = rng.integers(0, distinct, requests)
+    return ["%s%s?a=%g&b=%g&c=%g&d=%g" % ((base_url, path)
+                                          + tuple(matrices[i]))
+            for i in choices]
+
+
+def fetch(url: str) -> float:
+    """
+    Fetch a URL and return its latency in seconds.
+    """
+    t0 = time.perf_counter()
+    with urllib.request.urlopen(url) as response:
+        response.read()
+    return time.perf_counter() - t0
+
+
+def load_test(urls: List[str], concurrency: int) -> Dict[str, float]:
+    """
+    Fetch all of the URLs with concurrency requests in flight at a time,
+    and return the throughput and the latency percentiles in milliseconds.
+    """
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        latencies = np.array(list(executor.map(fetch, urls)))
+    elapsed = time.perf_counter() - t0
+    p50, p95, p99 = 1000.0*np.percentile(latencies, [50, 95, 99])
+    return {"requests": len(urls), "concurrency": concurrency,
+            "seconds": elapsed, "requests_per_second": len(urls)/elapsed,
+            "p50_ms": p50, "p95_ms": p95, "p99_ms": p99,
+            "max_ms": 1000.0*np.max(latencies)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Load test the phase portrait HTTP service.")
+    parser.add_argument("--url",
+                        help="Base URL of a running server. By default, "
+                             "a server is started in this process.")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--distinct", type=int, default=50,
+                        help="Number of distinct matrices requested.")
+    parser.add_argument("--json", action="store_true",
+                        help="Request trajectory data instead of PNGs.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        server = PortraitServer(("127.0.0.1", 0), args.concurrency)
+        server.pool.prewarm()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = "http://127.0.0.1:%d" % server.server_address[1]
+    urls = request_urls(base_url.rstrip("/"), args.requests, args.distinct,
+                        "/trajectories.json" if args.json
+                        else "/portrait.png", args.seed)
+    results = load_test(urls, args.concurrency)
+    print("%d requests, %d concurrent: %.1f requests/s" % (
+        results["requests"], results["concurrency"],
+        results["requests_per_second"]))
+    print("latency p50 %.1f ms  p95 %.1f ms  p99 %.1f ms  max %.1f ms" % (
+        results["p50_ms"], results["p95_ms"], results["p99_ms"],
+        results["max_ms"]))
+    if server is not None:
+        print("cache: " + json.dumps(server.cache.stats()))
+        server.shutdown()
+        server.server_close()
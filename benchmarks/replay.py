@@ -0,0 +1,53 @@
+"""
+Replay a recorded interaction trace headless and report its latencies.
+
+Record a session with python tk_app.py --record session.npz, then run
+this from the root of the repository with
+
+    python -m benchmarks.replay session.npz --max-p95-ms 50
+
+which prints the percentiles of the input-to-pixels latency of the events
+and the slowest events, and exits with a non-zero status if the 95th
+percentile of the latency is above the given threshold.
+"""
+import argparse
+import json
+from interaction_trace import load_trace, replay, summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Replay an interaction trace recorded with "
+                    "tk_app.py --record, and report its latencies.")
+    parser.add_argument("trace", help="The .npz file of the trace.")
+    parser.add_argument("--slowest", type=int, default=10,
+                        help="Number of slowest events to report.")
+    parser.add_argument("--output", help="Write the summary as JSON.")
+    parser.add_argument("--max-p95-ms", type=float,
+                        help="Fail if the 95th percentile of the latency "
+                             "is above this.")
+    args = parser.parse_args()
+
+    trace = load_trace(args.trace)
+    results = summary(trace, replay(trace), args.slowest)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=1)
+    rows = [("all", results["latency"])] + list(
+        results["latency_by_kind"].items()) + [("frames", results["frames"])]
+    for name, p in rows:
+        if p:
+            print("%-8s %6d  p50 %7.2f ms  p90 %7.2f ms  p95 %7.2f ms  "
+                  "p99 %7.2f ms  max %7.2f ms" % (
+                      name, p["count"], p["p50_ms"], p["p90_ms"],
+                      p["p95_ms"], p["p99_ms"], p["max_ms"]))
+    print("slowest events:")
+    for event in results["slowest"]:
+        print("  #%-5d at %8.3f s  %-7s latency %7.2f ms  handling %6.2f ms"
+              % (event["index"], event["time_s"], event["kind"],
+                 event["latency_ms"], event["handling_ms"]))
+    if args.max_p95_ms is not None and results["latency"] and \
+            results["latency"]["p95_ms"] > args.max_p95_ms:
+        print("FAIL p95 latency %.2f ms > %.2f ms" % (
+            results["latency"]["p95_ms"], args.max_p95_ms))
+        raise SystemExit(1)
@@ -0,0 +1,293 @@
+"""
+Export movies of the phase portrait as the matrix moves along a path.
+
+The matrices of the frames are interpolated linearly between keyframes.
+The frames are rendered in a pool of processes, each of which owns a
+headless LinearVectorField2D that it reuses for all of its frames, and
+which also encodes them, so that the main process only writes the encoded
+bytes. Only a few frames per process are in flight at any time, and they
+are written in order as soon as they are done, so that the frames of a
+long movie are never all held in memory. For example, the sweep of a
+spiral through a centre as the trace of the matrix crosses zero is
+exported with
+
+    python export.py --keyframe -0.5 -1.5 1.5 -0.5 \\
+        --keyframe 0.5 -1.5 1.5 0.5 --frames 120 -o hopf.gif
+
+An output that does not end with .gif is a directory of PNG files.
+"""
+import argparse
+import os
+import struct
+import sys
+import numpy as np
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# State of a worker process, set by _init_worker
+_field = None
+_gif = False
+_duration = 40
+
+
+def path_matrices(keyframes: Sequence[Sequence[float]],
+                  frames: int) -> np.ndarray:
+    """
+    Return the (frames, 4) elements a, b, c, d of the matrices of the
+    frames, which move linearly from each keyframe to the next, with the
+    same number of frames between each pair of keyframes. The first and
+    last frames are the first and last keyframes.
+    """
+    keyframes = np.reshape(np.asarray(keyframes, np.float64), [-1, 4])
+    if len(keyframes) < 2:
+        raise ValueError("A path needs at least two keyframes.")
+    if frames < 1:
+        raise ValueError("A path needs at least one frame.")
+    s = np.linspace(0.0, len(keyframes) - 1.0, frames)
+    i = np.minimum(s.astype(int), len(keyframes) - 2)
+    u = (s - i)[:, None]
+    return (1.0 - u)*keyframes[i] + u*keyframes[i + 1]
+
+
+def encode_gif_frame(rgba: np.ndarray, duration: int) -> bytes:
+    """
+    Return the bytes of a (height, width, 4) uint8 image as a frame of an
+    animated GIF that is shown for duration milliseconds. The image is
+    reduced to 256 colours, which are stored in its own colour table.
+    """
+    from PIL import GifImagePlugin, Image
+    image = Image.fromarray(np.ascontiguousarray(rgba[..., :3])).quantize(256)
+    return b"".join(GifImagePlugin.getdata(image, duration=duration,
+                                           include_color_table=True))
+
+
+class GifWriter:
+    """
+    Write the frames of an animated GIF to a file as they come, so that
+    only one of them is held at a time. Each frame has its own colour
+    table, so there is no global one.
+
+    Attributes:
+    bytes_written [int]: Size of the file so far.
+    """
+
+    def __init__(self, path: str, loop: int = 0) -> None:
+        """
+        Open the file. The animation is repeated loop times,
+        or forever if this is 0.
+        """
+        self.bytes_written = 0
+        self._file = open(path, "wb")
+        self._loop = loop
+        self._started = False
+
+    def _write(self, data: bytes) -> None:
+        self._file.write(data)
+        self.bytes_written += len(data)
+
+    def write(self, width: int, height: int, data: bytes) -> None:
+        """
+        Write a frame encoded by encode_gif_frame.
+        """
+        if not self._started:
+            self._write(b"GIF89a" + struct.pack("<HHBBB", width, height,
+                                                0, 0, 0))
+            self._write(b"!\xff\x0bNETSCAPE2.0\x03\x01"
+                        + struct.pack("<H", self._loop) + b"\x00")
+            self._started = True
+        self._write(data)
+
+    def close(self) -> None:
+        self._write(b";")
+        self._file.close()
+
+
+class PngSequenceWriter:
+    """
+    Write frames as numbered PNG files in a directory.
+
+    Attributes:
+    directory [str]: The directory of the files.
+    bytes_written [int]: Size of all of the files so far.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self.bytes_written = 0
+        self._count = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, width: int, height: int, data: bytes) -> None:
+        """
+        Write a frame, given as the bytes of a PNG file.
+        """
+        path = os.path.join(self.directory, "frame_%05d.png" % self._count)
+        with open(path, "wb") as f:
+            f.write(data)
+        self.bytes_written += len(data)
+        self._count += 1
+
+    def close(self) -> None:
+        pass
+
+
+def _init_worker(scale_matrix: np.ndarray, bounds: List[float], grid_points: int,
+                 initial_conditions: np.ndarray, flow_texture: bool,
+                 gif: bool, duration: int) -> None:
+    """
+    Create the field that a worker process renders all of its frames with.
+    """
+    global _field, _gif, _duration
+    from linear_vector_field import LinearVectorField2D
+    _field = LinearVectorField2D(bounds, headless=True,
+                                 grid_points=grid_points)
+    if flow_texture:
+        _field.show_flow_texture()
+    if initial_conditions is not None:
+        _field.set_initial_conditions(initial_conditions)
+    # The quiver scales its arrows when it is first drawn, so every
+    # process draws the same matrix first, and their arrows match
+    _field.set_matrix(*scale_matrix)
+    _field.plot_vector_field()
+    _field.figure.canvas.draw()
+    _gif, _duration = gif, duration
+
+
+def _render_frame(matrix: np.ndarray) -> Tuple[int, int, bytes]:
+    """
+    Render and encode the frame of a matrix in a worker process.
+    Return the width and height of the frame, and its bytes.
+    """
+    _field.set_matrix(*matrix)
+    _field.plot_vector_field()
+    if _gif:
+        rgba = _field.render("rgba")
+        return rgba.shape[1], rgba.shape[0], encode_gif_frame(rgba,
+                                                              _duration)
+    width, height = _field.figure.canvas.get_width_height()
+    return width, height, _field.render("png")
+
+
+def export_movie(keyframes: Sequence[Sequence[float]], frames: int,
+                 output: str, fps: float = 25.0, workers: int = None,
+                 bounds: List[float] = None, grid_points: int = 21,
+                 initial_conditions: np.ndarray = None,
+                 flow_texture: bool = False,
+                 progress: Callable[[int, int, float], None] = None
+                 ) -> Dict[str, float]:
+    """
+    Export a movie of the phase portrait as the matrix moves along a path.
+
+    Parameters:
+    keyframes: Elements a, b, c, d of the matrices of the path.
+    frames: Number of frames.
+    output: A .gif file, or otherwise a directory of PNG files.
+    fps: Frames per second of the GIF, whose delays are rounded
+         to hundredths of a second.
+    workers: Number of processes. By default, this is the number of CPUs.
+    bounds: xmin, xmax, ymin and ymax of the plot. If not given,
+            these are read from the resources folder.
+    grid_points: Number of points of the grid along each axis.
+    initial_conditions: (N, 2) array of initial conditions whose
+                        trajectories are also plotted.
+    flow_texture: Show a line integral convolution texture of the flow.
+    progress: Called after each frame is written with the number of
+              frames written, the number of frames, and the time
+              elapsed in seconds.
+
+    Returns the number of frames, the time taken in seconds, the number
+    of frames exported per second, the number of processes, and the
+    number of bytes written.
+    """
+    matrices = path_matrices(keyframes, frames)
+    # The arrows are scaled for the largest matrix of the path, since
+    # those of a zero matrix would have no scale and fill the plot
+    scale_matrix = matrices[np.argmax(np.linalg.norm(matrices, axis=1))]
+    gif = output.lower().endswith(".gif")
+    workers = workers or os.cpu_count() or 1
+    writer = GifWriter(output) if gif else PngSequenceWriter(output)
+    t0 = perf_counter()
+    written = 0
+    pending = deque()
+
+    def write_next() -> None:
+        nonlocal written
+        writer.write(*pending.popleft().result())
+        written += 1
+        if progress is not None:
+            progress(written, frames, perf_counter() - t0)
+
+    try:
+        with ProcessPoolExecutor(
+                workers, initializer=_init_worker,
+                initargs=(scale_matrix, bounds, grid_points,
+                          initial_conditions, flow_texture, gif,
+                          int(round(1000.0/fps)))) as executor:
+            try:
+                for m in matrices:
+                    # Keep every process busy, but only hold a few
+                    # frames for each of them
+                    if len(pending) >= 2*workers:
+                        write_next()
+                    pending.append(executor.submit(_render_frame, m))
+                while pending:
+                    write_next()
+            except BaseException:
+                executor.shutdown(cancel_futures=True)
+                raise
+    finally:
+        writer.close()
+    seconds = perf_counter() - t0
+    return {"frames": frames, "seconds": seconds,
+            "frames_per_second": frames/seconds, "workers": workers,
+            "bytes": writer.bytes_written}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Export a movie of the phase portrait of "
+                    "x' = ax + by, y' = cx + dy as the matrix moves "
+                    "along a path.")
+    parser.add_argument("--keyframe", type=float, nargs=4, action="append",
+                        required=True, metavar=("a", "b", "c", "d"),
+                        help="A matrix of the path. This must be given at "
+                             "least twice.")
+    parser.add_argument("--frames", type=int, default=100)
+    parser.add_argument("-o", "--output", default="phase_portrait.gif",
+                        help="A .gif file, or otherwise a directory "
+                             "of PNG files.")
+    parser.add_argument("--fps", type=float, default=25.0)
+    parser.add_argument("--workers", type=int,
+                        help="Number of processes, by default the "
+                             "number of CPUs.")
+    parser.add_argument("--bounds", type=float, nargs=4,
+                        metavar=("xmin", "xmax", "ymin", "ymax"))
+    parser.add_argument("--ic", type=float, nargs=2, action="append",
+                        metavar=("x", "y"),
+                        help="Initial condition of an extra trajectory. "
+                             "This may be given multiple times.")
+    parser.add_argument("--grid-points", type=int, default=21)
+    parser.add_argument("--flow-texture", action="store_true",
+                        help="Show a line integral convolution texture "
+                             "of the flow behind the arrows.")
+    args = parser.parse_args()
+    if len(args.keyframe) < 2:
+        parser.error("At least two keyframes are needed.")
+    if args.frames < 1:
+        parser.error("At least one frame is needed.")
+
+    def report(done: int, total: int, elapsed: float) -> None:
+        print("\rframe %d/%d  %.2f frames/s  %.0f s left" % (
+            done, total, done/elapsed, (total - done)*elapsed/done),
+            end="", file=sys.stderr)
+
+    stats = export_movie(args.keyframe, args.frames, args.output, args.fps,
+                         args.workers, args.bounds, args.grid_points,
+                         None if args.ic is None else np.array(args.ic),
+                         args.flow_texture, report)
+    print(file=sys.stderr)
+    print("%d frames in %.1f s, %.2f frames/s with %d processes, %.1f MB"
+          % (stats["frames"], stats["seconds"], stats["frames_per_second"],
+             stats["workers"], stats["bytes"]/1e6))
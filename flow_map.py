@@ -0,0 +1,114 @@
+"""
+Closed-form flow map of a linear system in 2D.
+
+For a 2x2 matrix M with trace tau and determinant delta, let
+s^2 = (tau/2)^2 - delta and N = M - (tau/2)I. By the Cayley-Hamilton
+theorem N^2 = s^2 I, so that
+
+    exp(Mt) = exp(tau t/2)(C(t)I + S(t)N),
+
+where
+
+    C(t) = cosh(st),  S(t) = sinh(st)/s  if s^2 > 0 (real, distinct),
+    C(t) = 1,         S(t) = t           if s^2 = 0 (repeated),
+    C(t) = cos(wt),   S(t) = sin(wt)/w   if s^2 = -w^2 < 0 (complex).
+
+Only real arithmetic is used, and nothing depends on the eigenvectors of
+M, so this stays well behaved for defective and singular matrices.
+"""
+import numpy as np
+from typing import Tuple
+
+
+def flow_terms(m: np.ndarray, t: np.ndarray, tol: float = 1e-12,
+               out: Tuple[np.ndarray, np.ndarray, np.ndarray] = None
+               ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Return the terms c, s and n such that exp(Mt) = c*I + s*n.
+
+    Parameters:
+    m: The 2x2 matrix M.
+    t: Array of times of any shape.
+    tol: Relative tolerance below which s^2 is treated as zero
+         and the eigenvalues are considered repeated.
+    out: Optional arrays c, s and work with the shape of t. The terms
+         are written to c and s, and work is used as scratch space.
+
+    c and s have the same shape as t, while n is the 2x2 matrix
+    M - (tau/2)I.
+    """
+    t = np.asarray(t, np.float64)
+    if out is None:
+        out = np.empty(t.shape), np.empty(t.shape), np.empty(t.shape)
+    c, s, e = out
+    half_tau = 0.5*(m[0][0] + m[1][1])
+    delta = m[0][0]*m[1][1] - m[0][1]*m[1][0]
+    s2 = half_tau*half_tau - delta
+    scale = max(np.max(np.abs(m))**2, np.finfo(np.float64).tiny)
+    if s2 > tol*scale:
+        r = np.sqrt(s2)
+        np.multiply(t, r, out=e)
+        np.cosh(e, out=c)
+        np.sinh(e, out=s)
+        s /= r
+    elif s2 < -tol*scale:
+        w = np.sqrt(-s2)
+        np.multiply(t, w, out=e)
+        np.cos(e, out=c)
+        np.sin(e, out=s)
+        s /= w
+    else:
+        c.fill(1.0)
+        np.copyto(s, t)
+    np.multiply(t, half_tau, out=e)
+    np.exp(e, out=e)
+    c *= e
+    s *= e
+    n = np.array([[m[0][0] - half_tau, m[0][1]],
+                  [m[1][0], m[1][1] - half_tau]])
+    return c, s, n
+
+
+def flow_matrix(m: np.ndarray, t: np.ndarray,
+                tol: float = 1e-12) -> np.ndarray:
+    """
+    Compute exp(Mt) for every time in t.
+
+    Returns an array of shape t.shape + (2, 2).
+    """
+    c, s, n = flow_terms(m, t, tol)
+    return c[..., None, None]*np.identity(2) + s[..., None, None]*n
+
+
+def flow(m: np.ndarray, xy0: np.ndarray, t: np.ndarray,
+         tol: float = 1e-12, out: np.ndarray = None,
+         work: np.ndarray = None) -> np.ndarray:
+    """
+    Evolve many initial conditions under x' = Mx.
+
+    Parameters:
+    m: The 2x2 matrix M.
+    xy0: (N, 2) array of initial conditions.
+    t: Either a (T,) array of times shared by all initial conditions,
+       or an (N, T) array of times for each one of them.
+    out: Optional (N, T, 2) array that the result is written to.
+    work: Optional array of shape t.shape + (3,) used as scratch space,
+          so that nothing proportional to the number of points is
+          allocated when out is also given.
+
+    Returns an (N, T, 2) array of (x, y) points.
+    """
+    xy0 = np.asarray(xy0, np.float64)
+    t = np.asarray(t, np.float64)
+    if work is None:
+        work = np.empty(t.shape + (3,))
+    c, s, n = flow_terms(m, t, tol,
+                         (work[..., 0], work[..., 1], work[..., 2]))
+    if out is None:
+        out = np.empty([len(xy0), t.shape[-1], 2])
+    # x(t) = c(t) x0 + s(t) n x0, written as a product of the (..., T, 2)
+    # array of the terms with the (N, 2, 2) array of x0 and n x0.
+    basis = np.empty([len(xy0), 2, 2])
+    basis[:, 0] = xy0
+    np.matmul(xy0, n.T, out=basis[:, 1])
+    return np.matmul(work[..., :2], basis, out=out)
@@ -0,0 +1,189 @@
+"""
+Runge-Kutta integrators that advance many initial conditions at once.
+
+The right hand side f(xy, t) takes a (2, N) array of points and an (N,)
+array of times, and returns the (2, N) array of their derivatives.
+Trajectories that leave the given bounds stop being integrated, and their
+remaining points are set to NaN, which matplotlib leaves undrawn.
+
+Reference:
+Hairer, E., Norsett, S., Wanner, G. (1993). Solving Ordinary Differential
+Equations I: Nonstiff Problems, chapter II. Springer.
+"""
+import numpy as np
+from typing import Callable, List
+
+Field = Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+# Dormand-Prince 5(4) coefficients
+_C = np.array([0.0, 1/5, 3/10, 4/5, 8/9, 1.0, 1.0])
+_A = [[],
+      [1/5],
+      [3/40, 9/40],
+      [44/45, -56/15, 32/9],
+      [19372/6561, -25360/2187, 64448/6561, -212/729],
+      [9017/3168, -355/33, 46732/5247, 49/176, -5103/18656],
+      [35/384, 0.0, 500/1113, 125/192, -2187/6784, 11/84]]
+# Difference between the fifth and fourth order weights
+_E = np.array([71/57600, 0.0, -71/16695, 71/1920, -17253/339200,
+               22/525, -1/40])
+# Fourth order continuous extension: the weight of stage i at the
+# fraction theta of a step is b_i(theta) = sum_j _P[i, j] theta^(j + 1)
+_P = np.array([
+    [1.0, -8048581381/2820520608, 8663915743/2820520608,
+     -12715105075/11282082432],
+    [0.0, 0.0, 0.0, 0.0],
+    [0.0, 131558114200/32700410799, -68118460800/10900136933,
+     87487479700/32700410799],
+    [0.0, -1754552775/470086768, 14199869525/1410260304,
+     -10690763975/1880347072],
+    [0.0, 127303824393/49829197408, -318862633887/49829197408,
+     701980252875/199316789632],
+    [0.0, -282668133/205662961, 2019193451/616988883,
+     -1453857185/822651844],
+    [0.0, 40617522/29380423, -110615467/29380423,
+     69997945/29380423]])
+
+
+def _inside(xy: np.ndarray, bounds: List[float]) -> np.ndarray:
+    """
+    Return whether each point of the (2, N) array xy is finite
+    and inside the bounds. Everything is inside if bounds is None.
+    """
+    finite = np.all(np.isfinite(xy), axis=0)
+    if bounds is None:
+        return finite
+    xmin, xmax, ymin, ymax = bounds
+    return finite & ((xy[0] >= xmin) & (xy[0] <= xmax)
+                     & (xy[1] >= ymin) & (xy[1] <= ymax))
+
+
+def rk4(f: Field, xy0: np.ndarray, t: np.ndarray,
+        bounds: List[float] = None, substeps: int = 1) -> np.ndarray:
+    """
+    Integrate with the classic fourth order Runge-Kutta method, using
+    substeps equal steps between consecutive output times.
+
+    Parameters:
+    f: Right hand side of the ODE.
+    xy0: (N, 2) array of initial conditions at time t[0].
+    t: (T,) monotonic array of output times.
+    bounds: xmin, xmax, ymin, ymax. Trajectories are stopped once
+            they leave these.
+
+    Returns an (N, T, 2) array of (x, y) points.
+    """
+    xy0 = np.asarray(xy0, np.float64)
+    t = np.asarray(t, np.float64)
+    out = np.full([len(xy0), len(t), 2], np.nan)
+    out[:, 0] = xy0
+    xy = xy0.T.copy()
+    alive = np.flatnonzero(_inside(xy, bounds))
+    for i in range(1, len(t)):
+        if len(alive) == 0:
+            break
+        h = (t[i] - t[i - 1])/substeps
+        x = xy[:, alive]
+        for j in range(substeps):
+            s = np.full(len(alive), t[i - 1] + j*h)
+            k1 = f(x, s)
+            k2 = f(x + 0.5*h*k1, s + 0.5*h)
+            k3 = f(x + 0.5*h*k2, s + 0.5*h)
+            k4 = f(x + h*k3, s + h)
+            x = x + (h/6.0)*(k1 + 2.0*k2 + 2.0*k3 + k4)
+        xy[:, alive] = x
+        out[alive, i] = x.T
+        alive = alive[_inside(x, bounds)]
+    return out
+
+
+def dopri5(f: Field, xy0: np.ndarray, t: np.ndarray,
+           bounds: List[float] = None, rtol: float = 1e-6,
+           atol: float = 1e-9, max_steps: int = 10000) -> np.ndarray:
+    """
+    Integrate with the adaptive Dormand-Prince 5(4) method. Each
+    trajectory has its own step size, and the solution at the output
+    times is found with the fourth order continuous extension of the
+    method within each step, from the seven stages of the step.
+
+    Parameters:
+    f: Right hand side of the ODE.
+    xy0: (N, 2) array of initial conditions at time t[0].
+    t: (T,) monotonic array of output times.
+    bounds: xmin, xmax, ymin, ymax. Trajectories are stopped once
+            they leave these.
+    rtol, atol: Relative and absolute tolerances of each step.
+    max_steps: Maximum number of steps of each trajectory.
+
+    Returns an (N, T, 2) array of (x, y) points.
+    """
+    xy0 = np.asarray(xy0, np.float64)
+    t = np.asarray(t, np.float64)
+    n = len(xy0)
+    out = np.full([n, len(t), 2], np.nan)
+    out[:, 0] = xy0
+    if len(t) < 2 or n == 0:
+        return out
+    direction = np.sign(t[-1] - t[0])
+    t_end = t[-1]
+
+    xy = xy0.T.copy()
+    s = np.full(n, t[0])
+    k1 = f(xy, s)
+    # Initial step from the size of the derivatives
+    scale = atol + rtol*np.abs(xy)
+    d0 = np.sqrt(np.mean((xy/scale)**2, axis=0))
+    d1 = np.sqrt(np.mean((k1/scale)**2, axis=0))
+    h = np.where((d0 > 1e-5) & (d1 > 1e-5), 0.01*d0/np.maximum(d1, 1e-300),
+                 1e-6)
+    h = np.minimum(h, np.abs(t_end - t[0]))
+    next_out = np.ones(n, np.intp)
+    alive = np.flatnonzero(_inside(xy, bounds))
+
+    for _ in range(max_steps):
+        if len(alive) == 0:
+            break
+        x, sa, ha, k = xy[:, alive], s[alive], h[alive], [k1[:, alive]]
+        ha = np.minimum(ha, np.abs(t_end - sa))*direction
+        for i in range(1, 7):
+            dx = sum(a*kj for a, kj in zip(_A[i], k) if a != 0.0)
+            k.append(f(x + ha*dx, sa + _C[i]*ha))
+        x_new = x + ha*sum(a*kj for a, kj in zip(_A[6], k) if a != 0.0)
+        err_vec = ha*sum(e*kj for e, kj in zip(_E, k) if e != 0.0)
+        scale = atol + rtol*np.maximum(np.abs(x), np.abs(x_new))
+        err = np.sqrt(np.mean((err_vec/scale)**2, axis=0))
+        accept = err <= 1.0
+        # Standard step size control, with a safety factor
+        factor = np.clip(0.9*np.maximum(err, 1e-10)**-0.2, 0.2, 10.0)
+
+        # Dense output for the accepted steps
+        acc = np.flatnonzero(accept)
+        if len(acc):
+            x0, x1 = x[:, acc], x_new[:, acc]
+            stages = np.stack(k)[:, :, acc]
+            f1 = stages[6]
+            s0, hh = sa[acc], ha[acc]
+            ids = alive[acc]
+            pending = np.ones(len(acc), bool)
+            while True:
+                j = next_out[ids]
+                pending &= j < len(t)
+                jt = t[np.minimum(j, len(t) - 1)]
+                pending &= direction*(jt - (s0 + hh)) <= 1e-12*np.abs(jt)
+                if not np.any(pending):
+                    break
+                p = np.flatnonzero(pending)
+                th = (jt[p] - s0[p])/hh[p]
+                b = _P @ np.cumprod(np.broadcast_to(th, (4, len(p))),
+                                    axis=0)
+                dx = np.einsum("ip,idp->dp", b, stages[:, :, p])
+                out[ids[p], j[p]] = (x0[:, p] + hh[p]*dx).T
+                next_out[ids[p]] += 1
+            xy[:, ids] = x1
+            s[ids] = s0 + hh
+            k1[:, ids] = f1
+        h[alive] = np.abs(ha)*factor
+
+        done = (next_out[alive] >= len(t)) | ~_inside(xy[:, alive], bounds)
+        alive = alive[~done]
+    return out
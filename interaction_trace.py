@@ -0,0 +1,275 @@
+"""
+Recording and headless replay of the interactions with the app.
+
+While recording, every slider and mouse event that reaches tk_app.App is
+logged with its time in a compact structured array, together with the
+state of the plot when the recording started. Record a session with
+
+    python tk_app.py --record session.npz
+
+The replayer rebuilds this state on a headless field, then feeds the same
+events through apply_event, which is the very function the app uses to
+handle them, with the mouse positions given as locate_mouse.Event objects.
+The animation loop is emulated on a virtual clock: frames are drawn by
+the BlitAnimation of the field, as in the app, at the ticks of a timer
+with the interval of the animation, and the loop pauses when nothing
+changes until the next event wakes it up. The latency of an event is the time from when it
+arrived to when the first frame after it was handled has been drawn.
+Replay a session with
+
+    python -m benchmarks.replay session.npz
+"""
+import numpy as np
+from time import perf_counter
+from locate_mouse import Event, locate_mouse_on_axes, navigation_event
+from typing import Dict, List, Sequence, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from linear_vector_field import LinearVectorField2D
+
+# Kinds of events
+(SLIDER, DRAG, KEEP, DELETE, SCROLL, PAN_PRESS, PAN_MOTION,
+ PAN_RELEASE) = range(8)
+EVENT_NAMES = ("slider", "drag", "keep", "delete", "scroll", "pan_press",
+               "pan_motion", "pan_release")
+
+# The values of a slider event are the elements a, b, c and d of the
+# matrix, and those of a mouse event its pixel coordinates on the canvas,
+# with y starting from the top. These are followed by the step of the
+# mouse wheel for a scroll, and by the button and whether this is a double
+# click for a press of the buttons that pan the view.
+EVENT_DTYPE = np.dtype([("time", np.float64), ("kind", np.uint8),
+                        ("values", np.float64, (4,))])
+
+
+def apply_event(field: "LinearVectorField2D", kind: int,
+                values: Sequence[float], canvas_height: int,
+                pick_radius: float = 8.0) -> None:
+    """
+    Handle an event as the app does.
+
+    Parameters:
+    field: The field that receives the event.
+    kind: One of SLIDER, DRAG, KEEP, DELETE, or of SCROLL, PAN_PRESS,
+          PAN_MOTION and PAN_RELEASE, which zoom and pan the view with
+          the navigation handlers of the field.
+    values: The values of the event, as described for EVENT_DTYPE.
+    canvas_height: Height of the canvas in pixels.
+    pick_radius: Distance in pixels within which a click
+                 picks a trajectory of the workspace.
+    """
+    if kind == SLIDER:
+        field.scheduler.request("matrix", *values)
+        return
+    if kind == SCROLL:
+        field._on_scroll(navigation_event(field.ax, values[0], values[1],
+                                          canvas_height, step=values[2]))
+        return
+    if kind == PAN_PRESS:
+        field._on_press(navigation_event(
+            field.ax, values[0], values[1], canvas_height,
+            button=int(values[2]), dblclick=bool(values[3])))
+        return
+    if kind in (PAN_MOTION, PAN_RELEASE):
+        event = navigation_event(field.ax, values[0], values[1],
+                                 canvas_height)
+        if kind == PAN_MOTION:
+            field._on_motion(event)
+        else:
+            field._on_release(event)
+        return
+    x, y = locate_mouse_on_axes(Event(values[0], values[1]), field.ax,
+                                canvas_height)
+    if kind == DRAG:
+        field.scheduler.request("interactive_line", x, y)
+    elif kind == KEEP:
+        field.add_trajectories([[x, y]])
+        field.wake()
+    elif kind == DELETE:
+        xlim = field.ax.get_xlim()
+        radius = pick_radius*(xlim[1] - xlim[0])/field.ax.bbox.width
+        if field.remove_trajectory(x, y, radius):
+            field.wake()
+    else:
+        raise ValueError("Unknown kind of event %d." % kind)
+
+
+class InteractionRecorder:
+    """
+    Log of timestamped events, stored in an array that grows geometrically.
+
+    Attributes:
+    state [Dict[str, np.ndarray]]: State of the field when the recording
+                                   started, which the replay starts from.
+    """
+
+    def __init__(self, field: "LinearVectorField2D",
+                 matrix: Sequence[float] = None) -> None:
+        """
+        Start recording the events of field from its current state.
+
+        Parameters:
+        field: The field whose events are recorded.
+        matrix: Elements a, b, c and d of the matrix to start from, if
+                these differ from those of the field, for example when
+                a new matrix was requested but not yet applied.
+        """
+        width, height = field.figure.canvas.get_width_height()
+        self.state = {
+            "matrix": np.reshape(field.m if matrix is None else matrix,
+                                 [2, 2]).astype(np.float64),
+            "view": np.array(field.ax.get_xlim() + field.ax.get_ylim()),
+            "initial_conditions": field.initial_conditions.copy(),
+            "interactive_line_ic": np.array(field.interactive_line_ic),
+            "canvas_size": np.array([width, height]),
+            "flow_texture": np.array(field.flow_texture is not None),
+            "particles": np.array(0 if field.particles is None
+                                  else len(field.particles.get_offsets())),
+        }
+        self._events = np.zeros(256, EVENT_DTYPE)
+        self._count = 0
+        self._t0 = perf_counter()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def record(self, kind: int, values: Sequence[float]) -> None:
+        """
+        Log an event of the given kind, at the current time.
+        """
+        if self._count == len(self._events):
+            events = np.zeros(2*len(self._events), EVENT_DTYPE)
+            events[:self._count] = self._events
+            self._events = events
+        event = self._events[self._count]
+        event["time"] = perf_counter() - self._t0
+        event["kind"] = kind
+        event["values"][:len(values)] = values
+        self._count += 1
+
+    def save(self, path: str) -> None:
+        """
+        Save the events and the initial state to a compressed .npz file.
+        """
+        with open(path, "wb") as f:
+            np.savez_compressed(f, events=self._events[:self._count],
+                                **self.state)
+
+
+def load_trace(path: str) -> Dict[str, np.ndarray]:
+    """
+    Load a trace saved by InteractionRecorder.save.
+    """
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+def replay_field(trace: Dict[str, np.ndarray]) -> "LinearVectorField2D":
+    """
+    Build a headless field in the state in which the trace started,
+    ready for the animation loop to be emulated.
+    """
+    from linear_vector_field import LinearVectorField2D
+    field = LinearVectorField2D(headless=True)
+    width, height = trace["canvas_size"]
+    field.figure.set_size_inches(width/field.figure.dpi,
+                                 height/field.figure.dpi)
+    if trace["flow_texture"]:
+        field.show_flow_texture()
+    if trace["particles"]:
+        field.show_particles(int(trace["particles"]))
+    field.set_matrix(*trace["matrix"].ravel())
+    field.plot_vector_field()
+    if not np.allclose(trace["view"], field.bounds):
+        field.set_view(*trace["view"])
+    field.set_initial_conditions(trace["initial_conditions"])
+    field.set_interactive_line(*trace["interactive_line_ic"])
+    field.animation_loop()
+    # The timer of the animation is replaced by the virtual clock
+    field.main_animation.event_source.stop()
+    field.figure.canvas.draw()
+    return field
+
+
+def replay(trace: Dict[str, np.ndarray],
+           pick_radius: float = 8.0) -> Dict[str, np.ndarray]:
+    """
+    Replay the events of a trace on a headless field, and return, for
+    each event, the time spent handling it and its latency in seconds,
+    as well as the duration of each frame.
+    """
+    field = replay_field(trace)
+    animation = field.main_animation
+    # The view is recomputed once it stops changing for a while
+    field.clock = lambda: now
+    events = trace["events"]
+    height = int(trace["canvas_size"][1])
+    interval = field.animation_interval/1000.0
+    handling = np.zeros(len(events))
+    latency = np.zeros(len(events))
+    frames: List[float] = []
+
+    now = 0.0
+    tick = events["time"][0] + interval if len(events) else 0.0
+    i = 0
+    # Frames are drawn after the last event until the view is recomputed
+    while i < len(events) or field._view_pending:
+        # Handle the events that arrive before the next frame
+        pending = []
+        while i < len(events) and events["time"][i] <= tick:
+            t0 = perf_counter()
+            apply_event(field, events["kind"][i], events["values"][i],
+                        height, pick_radius)
+            handling[i] = perf_counter() - t0
+            now = max(now, events["time"][i]) + handling[i]
+            pending.append(i)
+            i += 1
+        # Draw the frame
+        t0 = perf_counter()
+        changed = field.update()
+        animation.draw(field._plots)
+        frames.append(perf_counter() - t0)
+        now = max(now, tick) + frames[-1]
+        for j in pending:
+            latency[j] = now - events["time"][j]
+        if changed:
+            tick = max(tick + interval, now)
+        elif i < len(events):
+            # Paused until the next event wakes up the timer
+            tick = max(events["time"][i] + interval, now)
+    return {"handling": handling, "latency": latency,
+            "frames": np.array(frames)}
+
+
+def summary(trace: Dict[str, np.ndarray], results: Dict[str, np.ndarray],
+            slowest: int = 10) -> dict:
+    """
+    Summarize the results of a replay in milliseconds: the percentiles of
+    the latency of the events, overall and for each kind, the percentiles
+    of the frame durations, and the slowest events.
+    """
+    def percentiles(seconds: np.ndarray) -> Dict[str, float]:
+        if len(seconds) == 0:
+            return {}
+        p50, p90, p95, p99 = 1000.0*np.percentile(seconds, [50, 90, 95, 99])
+        return {"p50_ms": p50, "p90_ms": p90, "p95_ms": p95, "p99_ms": p99,
+                "max_ms": 1000.0*float(np.max(seconds)),
+                "count": len(seconds)}
+
+    events = trace["events"]
+    latency = results["latency"]
+    order = np.argsort(latency)[::-1][:slowest]
+    return {
+        "latency": percentiles(latency),
+        "latency_by_kind": {
+            name: percentiles(latency[events["kind"] == kind])
+            for kind, name in enumerate(EVENT_NAMES)
+            if np.any(events["kind"] == kind)},
+        "frames": percentiles(results["frames"]),
+        "slowest": [{"index": int(i), "time_s": float(events["time"][i]),
+                     "kind": EVENT_NAMES[events["kind"][i]],
+                     "values": events["values"][i].tolist(),
+                     "handling_ms": 1000.0*float(results["handling"][i]),
+                     "latency_ms": 1000.0*float(latency[i])}
+                    for i in order],
+    }
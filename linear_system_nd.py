@@ -0,0 +1,353 @@
+"""
+Linear homogeneous systems x' = Mx in N dimensions, and 2D views of them.
+
+If M has a well conditioned basis of eigenvectors V, it is diagonalized
+once, M = V diag(w) V^-1, and the trajectories of K initial conditions x0
+at T times are the single tensor contraction
+
+    x[k, t, i] = sum_j V[i, j] exp(w[j] t) c[k, j],   c = V^-1 x0,
+
+over the eigen-modes j. Otherwise, for example when M is defective,
+exp(Mt) is computed for all of the times at once by a batched scaling and
+squaring Pade approximant, and contracted with the initial conditions.
+
+ProjectedVectorField2D plots a plane through the N-dimensional space with
+the same classes as the 2D fields: the arrows are the component of Mx in
+the plane, and the trajectories start in the plane and are projected onto
+it. Render the plane of the first two coordinates of a random system with
+
+    python linear_system_nd.py --dim 4 --axes 0 1 -o slice.png
+
+Reference:
+Higham, N. J. (2005). The Scaling and Squaring Method for the Matrix
+Exponential Revisited. SIAM Journal on Matrix Analysis and Applications,
+26(4), 1179-1193.
+"""
+import argparse
+import numpy as np
+from vector_field import BaseVectorField2D
+from typing import List, Tuple
+
+# Coefficients of the [13/13] Pade approximant of exp, and the largest
+# 1-norm for which it is accurate to double precision, from Higham (2005)
+_PADE13 = (64764752532480000.0, 32382376266240000.0, 7771770303897600.0,
+           1187353796428800.0, 129060195264000.0, 10559470521600.0,
+           670442572800.0, 33522128640.0, 1323241920.0, 40840800.0,
+           960960.0, 16380.0, 182.0, 1.0)
+_THETA13 = 5.371920351148152
+
+
+def expm(a: np.ndarray) -> np.ndarray:
+    """
+    Compute the exponential of each matrix of an (..., n, n) array.
+
+    Every matrix is scaled by its own power of two so that the [13/13]
+    Pade approximant is accurate for it, and the approximant is squared
+    back for the matrices that still need it.
+    """
+    a = np.asarray(a, np.float64)
+    n = a.shape[-1]
+    norm = np.max(np.sum(np.abs(a), axis=-2), axis=-1)
+    squarings = np.maximum(0, np.ceil(np.log2(
+        np.maximum(norm, np.finfo(np.float64).tiny)/_THETA13))).astype(int)
+    a = a/np.exp2(squarings)[..., None, None]
+    b = _PADE13
+    identity = np.identity(n)
+    a2 = a @ a
+    a4 = a2 @ a2
+    a6 = a4 @ a2
+    u = a @ (a6 @ (b[13]*a6 + b[11]*a4 + b[9]*a2)
+             + b[7]*a6 + b[5]*a4 + b[3]*a2 + b[1]*identity)
+    v = (a6 @ (b[12]*a6 + b[10]*a4 + b[8]*a2)
+         + b[6]*a6 + b[4]*a4 + b[2]*a2 + b[0]*identity)
+    r = np.linalg.solve(v - u, v + u)
+    for i in range(int(np.max(squarings, initial=0))):
+        square = (squarings > i)[..., None, None]
+        r = np.where(square, r @ r, r)
+    return r
+
+
+class LinearSystem:
+    """
+    Linear system x' = Mx in N dimensions.
+
+    Attributes:
+    m [np.ndarray]: The (N, N) matrix M.
+    eigvals [np.ndarray]: Eigenvalues of M.
+    eigvects [np.ndarray]: Eigenvectors of M, as columns.
+    diagonalizable [bool]: Whether the trajectories are computed from the
+                           eigen-decomposition, which is the case if the
+                           condition number of the eigenvectors is below
+                           the limit given to the initializer.
+    """
+
+    def __init__(self, m: np.ndarray, condition_limit: float = 1e8) -> None:
+        """
+        Diagonalize M if its eigenvectors are well conditioned.
+        """
+        self.m = np.array(m, np.float64)
+        if self.m.ndim != 2 or self.m.shape[0] != self.m.shape[1]:
+            raise ValueError("M must be a square matrix.")
+        self.eigvals, self.eigvects = np.linalg.eig(self.m)
+        self.diagonalizable = bool(
+            np.linalg.cond(self.eigvects) < condition_limit)
+        self._inverse = np.linalg.inv(self.eigvects) \
+            if self.diagonalizable else None
+
+    @property
+    def dim(self) -> int:
+        return len(self.m)
+
+    def f(self, x: np.ndarray) -> np.ndarray:
+        """
+        Evaluate Mx at an (..., N) array of points.
+        """
+        return np.asarray(x, np.float64) @ self.m.T
+
+    def flow_matrix(self, t: np.ndarray) -> np.ndarray:
+        """
+        Compute exp(Mt) for every time in t.
+
+        Returns an array of shape t.shape + (N, N).
+        """
+        t = np.asarray(t, np.float64)
+        if self.diagonalizable:
+            return np.einsum("ij,...j,jk->...ik", self.eigvects,
+                             np.exp(t[..., None]*self.eigvals),
+                             self._inverse, optimize=True).real
+        return expm(t[..., None, None]*self.m)
+
+    def flow(self, x0: np.ndarray, t: np.ndarray,
+             method: str = None) -> np.ndarray:
+        """
+        Evolve many initial conditions under x' = Mx.
+
+        Parameters:
+        x0: (K, N) array of initial conditions.
+        t: Either a (T,) array of times shared by all initial conditions,
+           or a (K, T) array of times for each one of them.
+        method: "eig" to contract with the eigen-decomposition, or "expm"
+                to contract with the matrix exponentials. By default, the
+                eigen-decomposition is used if M is diagonalizable.
+
+        Returns a (K, T, N) array of points.
+        """
+        x0 = np.reshape(np.asarray(x0, np.float64), [-1, self.dim])
+        t = np.asarray(t, np.float64)
+        if method is None:
+            method = "eig" if self.diagonalizable else "expm"
+        shared = "t" if t.ndim == 1 else "kt"
+        if method == "eig":
+            if not self.diagonalizable:
+                raise ValueError("M is not diagonalizable.")
+            coeffs = x0 @ self._inverse.T
+            return np.einsum("ij,%sj,kj->kti" % shared, self.eigvects,
+                             np.exp(t[..., None]*self.eigvals), coeffs,
+                             optimize=True).real
+        elif method == "expm":
+            return np.einsum("%sij,kj->kti" % shared,
+                             expm(t[..., None, None]*self.m), x0,
+                             optimize=True)
+        raise ValueError("Unknown method %s." % method)
+
+
+class ProjectedVectorField2D(BaseVectorField2D):
+    """
+    Plane through the space of an N-dimensional linear system.
+
+    The points of the plane are origin + P(u, v), where the columns of P
+    are orthonormal. The arrows are the component P^T Mx of the vector
+    field in the plane, which is the vector field of the slice when the
+    plane is spanned by two coordinate axes. The trajectories start in
+    the plane, and are projected onto it as they leave it.
+
+    Attributes:
+    system [LinearSystem]: The N-dimensional system.
+    basis [np.ndarray]: (N, 2) matrix P.
+    origin [np.ndarray]: (N,) point of the plane at (u, v) = (0, 0).
+    name [str]: Shown as the title of the plot.
+    seeds [int]: The trajectories start from a seeds x seeds grid.
+    time [Tuple[float, float]]: Range of times of the trajectories.
+    trajectories [LineCollection]: All plotted trajectories.
+    """
+
+    def __init__(self, m: np.ndarray, axes: Tuple[int, int] = (0, 1),
+                 basis: np.ndarray = None, origin: np.ndarray = None,
+                 bounds: List[float] = None, name: str = "",
+                 seeds: int = 12, time: Tuple[float, float] = (-4.0, 4.0),
+                 headless: bool = False, grid_points: int = 21) -> None:
+        """
+        Initializer.
+
+        Parameters:
+        m: The (N, N) matrix of the system.
+        axes: The coordinate axes that span the plane.
+        basis: (N, 2) vectors that span the plane instead of axes.
+               These are orthonormalized.
+        origin: (N,) point of the plane, which is 0 by default.
+        bounds: umin, umax, vmin and vmax of the plot.
+        name: Shown as the title of the plot.
+        seeds: The trajectories start from a seeds x seeds grid.
+        time: Range of times of the trajectories.
+        """
+        if bounds is None:
+            bounds = [-10.0, 10.0, -10.0, 10.0]
+        self.system = LinearSystem(m)
+        n = self.system.dim
+        if basis is None:
+            basis = np.identity(n)[:, list(axes)]
+            self._labels = ["x%d" % (i + 1) for i in axes]
+        else:
+            basis = np.linalg.qr(np.reshape(basis, [n, 2]))[0]
+            self._labels = ["u", "v"]
+        self.basis = basis
+        self.origin = np.zeros(n) if origin is None else np.array(
+            origin, np.float64)
+        self.name = name
+        self.seeds = seeds
+        self.time = time
+        self.trajectories = None
+        self.set_seeds(*bounds)
+        BaseVectorField2D.__init__(self, bounds, headless, grid_points)
+        self.ax.set_xlabel(self._labels[0])
+        self.ax.set_ylabel(self._labels[1])
+
+    def set_seeds(self, xmin: float, xmax: float,
+                  ymin: float, ymax: float) -> None:
+        """
+        Start the trajectories from a seeds x seeds grid inside the bounds.
+        """
+        x, y = np.meshgrid(np.linspace(xmin, xmax, self.seeds + 2)[1:-1],
+                           np.linspace(ymin, ymax, self.seeds + 2)[1:-1])
+        self.initial_conditions = np.stack([x.ravel(), y.ravel()], axis=1)
+
+    def set_view(self, xmin: float, xmax: float,
+                 ymin: float, ymax: float) -> None:
+        """
+        Recompute the plot for the given bounds, with the trajectories
+        seeded inside them.
+        """
+        self.set_seeds(xmin, xmax, ymin, ymax)
+        BaseVectorField2D.set_view(self, xmin, xmax, ymin, ymax)
+
+    def set_values(self) -> None:
+        """
+        Compute the vector field of the plane, P^T M P (u, v) + P^T M o,
+        which is affine in (u, v).
+        """
+        pm = self.basis.T @ self.system.m
+        self._plane_matrix = pm @ self.basis
+        self._plane_offset = pm @ self.origin
+
+    def set_matrix(self, m: np.ndarray) -> None:
+        """
+        Replace the matrix of the system, and recompute the plot.
+        """
+        self.system = LinearSystem(m)
+        self.set_values()
+        self.plot_vector_field()
+
+    def to_space(self, uv: np.ndarray) -> np.ndarray:
+        """
+        Return the N-dimensional points of an (..., 2) array of points
+        of the plane.
+        """
+        return self.origin + np.asarray(uv, np.float64) @ self.basis.T
+
+    def to_plane(self, x: np.ndarray) -> np.ndarray:
+        """
+        Project an (..., N) array of points onto the plane.
+        """
+        return (np.asarray(x, np.float64) - self.origin) @ self.basis
+
+    def f(self, xy: np.ndarray, *t: float,
+          out: np.ndarray = None) -> np.ndarray:
+        """
+        Evaluate the component of the vector field in the plane at the
+        points xy of shape (2, ...) of the plane.
+        """
+        xy = np.asarray(xy, np.float64)
+        if out is None:
+            out = np.empty(xy.shape)
+        flat = out.reshape(2, -1)
+        np.matmul(self._plane_matrix, xy.reshape(2, -1), out=flat)
+        flat += self._plane_offset[:, None]
+        return out
+
+    def compute_trajectories(self, xy0: np.ndarray,
+                             t: np.ndarray) -> np.ndarray:
+        """
+        Compute the trajectories of many initial conditions of the plane
+        in the N-dimensional space, and project them onto the plane.
+
+        Returns an (N, T, 2) array of (u, v) points.
+        """
+        return self.to_plane(self.system.flow(
+            self.to_space(np.reshape(xy0, [-1, 2])), t))
+
+    def set_title(self) -> None:
+        """
+        Set the title.
+        """
+        self.title.set_text(self.name)
+
+    def plot_trajectories(self, init_call: bool = False) -> None:
+        """
+        Plot the trajectories of all initial conditions.
+        """
+        t = np.linspace(self.time[0], self.time[1], 200)
+        xy = self.compute_trajectories(self.initial_conditions, t)
+        # Keep the lines finite where they blow up far outside of the plot
+        xmin, xmax, ymin, ymax = self.bounds
+        pad = max(xmax - xmin, ymax - ymin)
+        np.clip(xy, [xmin - pad, ymin - pad], [xmax + pad, ymax + pad],
+                out=xy)
+        if init_call:
+            from matplotlib.collections import LineCollection
+            self.trajectories = LineCollection(xy, colors="blue",
+                                               linewidths=0.75)
+            self.ax.add_collection(self.trajectories)
+            self.add_plot(self.trajectories)
+        else:
+            self.trajectories.set_segments(xy)
+
+
+def random_matrix(dim: int, seed: int = 0) -> np.ndarray:
+    """
+    Return a random (dim, dim) matrix whose eigenvalues have real parts
+    of order one, for examples.
+    """
+    rng = np.random.default_rng(seed)
+    return rng.normal(size=(dim, dim))/np.sqrt(dim)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Render a plane through the phase space of an "
+                    "N-dimensional linear system x' = Mx.")
+    parser.add_argument("--matrix-file",
+                        help="Text file of the matrix M, one row per line. "
+                             "By default, a random matrix is used.")
+    parser.add_argument("--dim", type=int, default=3,
+                        help="Dimension of the random matrix.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--axes", type=int, nargs=2, default=[0, 1],
+                        metavar=("I", "J"),
+                        help="Coordinate axes that span the plane.")
+    parser.add_argument("--origin", type=float, nargs="+",
+                        help="Point of the plane, which is 0 by default.")
+    parser.add_argument("--bounds", type=float, nargs=4,
+                        metavar=("xmin", "xmax", "ymin", "ymax"))
+    parser.add_argument("--seeds", type=int, default=6)
+    parser.add_argument("-o", "--output", default="phase_portrait.png")
+    args = parser.parse_args()
+    m = np.atleast_2d(np.loadtxt(args.matrix_file)) \
+        if args.matrix_file is not None else random_matrix(args.dim,
+                                                            args.seed)
+    field = ProjectedVectorField2D(
+        m, tuple(args.axes), origin=args.origin, bounds=args.bounds,
+        name="x%d-x%d plane of a %d-dimensional system" % (
+            args.axes[0] + 1, args.axes[1] + 1, len(m)),
+        seeds=args.seeds, headless=True)
+    with open(args.output, "wb") as f:
+        f.write(field.render("png"))
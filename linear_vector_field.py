@@ -1,8 +1,45 @@
 """
 Linear homogeneous vector field in 2D.
 """
+import os
 import numpy as np
+from functools import lru_cache
+from typing import List, Tuple, TYPE_CHECKING
 from vector_field import BaseVectorField2D
+from flow_map import flow, flow_matrix
+from trajectory_sampler import TrajectorySampler
+from phase_diagram import FIXED_POINT_TYPES, classify
+from matrix_cache import MatrixCache, MatrixCacheEntry
+from flow_texture import line_integral_convolution, noise_image
+from workspace import TrajectoryWorkspace
+from worker import ComputeWorker, FrameData, FrameRequest
+
+if TYPE_CHECKING:
+    from atlas import RenderAtlas
+
+CONSTANTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                              "resources", "linear_vector_field_constants.txt")
+
+# Largest size in bytes of the values of the quiver that are cached for
+# each matrix, which holds grids of up to 64 x 64 arrows
+MAX_CACHED_QUIVER_BYTES = 64*1024
+
+
+@lru_cache(maxsize=None)
+def load_constants(path: str = CONSTANTS_PATH) -> Tuple[List[float],
+                                                        List[float]]:
+    """
+    Read the bounds of the plot and the location of its axes from the
+    constants file, which is only parsed once. The path is relative
+    to this module, so that it does not depend on the working directory.
+    """
+    try:
+        arr = np.loadtxt(path)
+        arr = arr.T
+        return list(arr[0:4]), list(arr[4:10])
+    except (FileNotFoundError, IndexError):
+        return ([-10.0, 10.0, -10.0, 10.0],
+                [-100.0, -100.0, 0.0, 0.0, 100.0, 100.0])
 
 
 class LinearVectorField2D(BaseVectorField2D):
@@ -13,10 +50,39 @@ class LinearVectorField2D(BaseVectorField2D):
     m [np.ndarray]: ODE matrix
     eivals [np.ndarray]: Eigenvalues of m
     eigvects [np.ndarray]: Eigenvectors of m
-    lines [List[Line2D]]: List of Line2D
+    trajectory_coeffs [np.ndarray]: (N, 2) eigen-coefficients of the
+                                    initial conditions of the plotted
+                                    trajectories
+    trajectory_scale [float]: Factor by which the initial conditions of
+                              the plotted trajectories are scaled, which
+                              follows the zoom of the view
+    trajectories [LineCollection]: All plotted trajectories
     interactive_line [Line2D]: Line2D object that can be mutated
                                from mouse input.
-    interactive_line_coeffs [Tuple[float, float]]: IC for interactive_line
+    interactive_line_ic [Tuple[float, float]]: IC for interactive_line
+    sampler [TrajectorySampler]: Samples the plotted trajectories at
+                                 equally spaced times, or where they
+                                 are visible once
+                                 set_adaptive_sampling is called
+    workspace [TrajectoryWorkspace]: Initial conditions and points of
+                                     ic_trajectories, which the user
+                                     can add to and remove from
+    cache [MatrixCache]: Results that only depend on m, keyed by m
+    flow_texture [AxesImage]: Optional LIC texture of the flow, drawn
+                              behind the quiver
+    ic_trajectories [LineCollection]: Trajectories of initial_conditions
+    atlas [RenderAtlas]: Optional precomputed frames of the axes for
+                         a slice of matrices
+    atlas_image [AtlasImage]: Draws the frame of the atlas, if any
+    particles [PathCollection]: Optional tracer particles that are
+                                advected by the flow on every frame
+    particle_time_step [float]: Time by which the particles are
+                                advanced on every frame
+    particle_lifetime [float]: Time after which a particle is respawned,
+                               so that the particles keep covering the
+                               plot when they do not leave it
+    worker [ComputeWorker]: Optional thread that computes the frames
+                            for new matrices in the background
 
     Reference:
     Strogatz, S. (2015). Linear Systems.
@@ -24,34 +90,80 @@ class LinearVectorField2D(BaseVectorField2D):
     With Applications to Physics, Chemistry, and Engineering,
     chapter 5. Routledge.
     """
-    def __init__(self) -> None:
+    def __init__(self, bounds: List[float] = None,
+                 headless: bool = False, cache_capacity: int = 512,
+                 grid_points: int = 21, arrow_spacing: float = None) -> None:
         """
         Initializer.
+
+        Parameters:
+        bounds: xmin, xmax, ymin and ymax of the plot. If not given,
+                these are read from the resources folder.
+        headless: Draw on an Agg canvas instead of a GUI window.
+        cache_capacity: Number of matrices whose results are cached.
+        grid_points: Number of points of the grid along each axis.
+        arrow_spacing: Minimum spacing in pixels between the arrows.
         """
 
         # Numpy objects for computations
         self.m = np.array([[0.0, 0.0], [0.0, 0.0]])
         self.eigvals = np.array([0.0, 0.0])
         self.eigvects = np.array([[0.0, 0.0], [0.0, 0.0]])
-        self._t = np.linspace(-4.0, 4.0, 200, np.float64)
+        self.trajectory_time = (-4.0, 4.0)
+        self.trajectory_scale = 1.0
+        self.interactive_time = (0.0, 4.0)
+        self.trajectory_samples = 200
+        self.sampler = TrajectorySampler()
 
         # Matplotlib graphing objects
-        self.lines = []
+        self.trajectories = None
         self.interactive_line = None
-        self.interactive_line_coeffs = 0.0, 0.0
-
-        try:
-            arr = np.loadtxt("./resources/linear_vector_field_constants.txt")
-            arr = arr.T
-            bounds = list(arr[0:4])
-            self._axes_location = list(arr[4:10])
-        except FileNotFoundError:
-            bounds = [-10.0, 10.0, -10.0, 10.0]
-            self._axes_location = [-100.0, -100.0, 0.0, 0.0, 100.0, 100.0]
-        except IndexError:
-            bounds = [-10.0, 10.0, -10.0, 10.0]
-            self._axes_location = [-100.0, -100.0, 0.0, 0.0, 100.0, 100.0]
-        BaseVectorField2D.__init__(self, bounds)
+        self.interactive_line_ic = 0.0, 0.0
+        self.ic_trajectories = None
+        self.workspace = TrajectoryWorkspace(self.trajectory_samples)
+
+        # Sweeping the sliders back and forth revisits the same matrices,
+        # so the results that only depend on the matrix are cached.
+        self.cache = MatrixCache(cache_capacity)
+        self._cache_entry = None
+
+        # The flow texture is computed at a reduced resolution while
+        # the matrix is changing, and refined once it settles.
+        self.flow_texture = None
+        self.flow_texture_resolution = (96, 320)
+        self.flow_texture_delay = 0.2
+        self._flow_texture_coarse = False
+        self._flow_texture_time = 0.0
+        self._noise = None
+
+        # Frames are taken from a precomputed atlas when possible
+        self.atlas = None
+        self.atlas_image = None
+
+        # The particles are advanced by the exact flow map over one time
+        # step, which only needs to be recomputed when the matrix changes.
+        self.particles = None
+        self.particle_time_step = 0.01
+        self.particle_lifetime = 4.0
+        self._particle_xy = None
+        self._particle_next = None
+        self._particle_age = None
+        self._particle_flow = None
+        self._particle_rng = np.random.default_rng(0)
+
+        # Frames for new matrices are computed off the GUI thread if set
+        self.worker = None
+        self.set_trajectory_coeffs(
+            [[4.0, 4.0], [4.0, -4.0], [-4.0, 4.0], [-4.0, -4.0],
+             # The eigentrajectories
+             [4.0, 0.0], [0.0, 4.0], [-4.0, 0.0], [0.0, -4.0]])
+
+        file_bounds, axes_location = load_constants()
+        self._axes_location = list(axes_location)
+        if bounds is None:
+            bounds = list(file_bounds)
+        BaseVectorField2D.__init__(self, bounds, headless,
+                                   grid_points, arrow_spacing)
 
     def set_values(self) -> None:
         """
@@ -59,13 +171,266 @@ class LinearVectorField2D(BaseVectorField2D):
         """
         self.set_matrix()
 
-    def f(self, xy: np.ndarray, *t: float) -> None:
+    def set_scheduler(self) -> None:
+        """
+        Setup the scheduler, which redraws everything when the matrix
+        changes, and only the interactive line when its IC changes.
+        """
+        BaseVectorField2D.set_scheduler(self)
+        self.scheduler.register("interactive_line", self.set_interactive_line,
+                                args=self.interactive_line_ic)
+        self.scheduler.register("matrix", self._matrix_requested,
+                                ("quiver", "trajectories", "title"),
+                                args=tuple(self.m.ravel()))
 
-        # v is (dx/dt, dy/dt)
-        v = [self.m[0][0]*xy[0] + self.m[0][1]*xy[1],
-             self.m[1][0]*xy[0] + self.m[1][1]*xy[1]]
+    def quiver_values(self) -> np.ndarray:
+        """
+        Return the values of the vector field at the arrows of the quiver,
+        from the cache if possible. Larger grids than
+        MAX_CACHED_QUIVER_BYTES are not cached, since each matrix of the
+        cache would hold a copy of them, and they are recomputed into the
+        buffer of the quiver quickly enough.
+        """
+        entry = self._cache_entry
+        if entry.uvc is not None:
+            return entry.uvc
+        uvc = BaseVectorField2D.quiver_values(self)
+        if uvc.nbytes <= MAX_CACHED_QUIVER_BYTES:
+            # Copy, since the buffer is overwritten for other matrices
+            entry.uvc = uvc.copy()
+        return uvc
 
-        return v if (type(xy) == list) else np.array(v)
+    def update(self) -> bool:
+        """
+        Update the animation by recomputing whatever changed since the
+        last frame, and advance the particles if they are shown. Then
+        refine the flow texture once the matrix has stopped changing
+        for flow_texture_delay seconds.
+        """
+        changed = BaseVectorField2D.update(self)
+        if self.worker is not None:
+            frame = self.worker.take()
+            if frame is not None:
+                self.show_frame(frame)
+                changed = True
+            # Keep polling until the frame of the latest matrix is shown
+            changed = changed or self.worker.pending()
+        if self.particles is not None:
+            self.advance_particles()
+        if changed:
+            return True
+        if self._flow_texture_coarse:
+            if self.clock() - self._flow_texture_time \
+                    > self.flow_texture_delay:
+                self.update_flow_texture(fine=True)
+            return True
+        return self.particles is not None
+
+    def plot_vector_field(self, init_call: bool = False) -> None:
+        """
+        Plot the vector field, as well as the flow texture if shown.
+        """
+        BaseVectorField2D.plot_vector_field(self, init_call)
+        if self.flow_texture is not None:
+            self.update_flow_texture(fine=True)
+
+    def show_flow_texture(self) -> None:
+        """
+        Show a line integral convolution texture of the flow behind the
+        quiver. This must be called before the animation loop starts.
+        """
+        if self.flow_texture is not None:
+            return
+        self._noise = noise_image(self.flow_texture_resolution[1])
+        self.flow_texture = self.ax.imshow(
+            np.zeros([2, 2]), extent=tuple(self.bounds), origin="lower",
+            cmap="gray", vmin=0.0, vmax=1.0, alpha=0.6,
+            interpolation="bilinear", zorder=0)
+        self.ax.set_aspect("equal")
+        # Draw the texture before everything else when blitting
+        self._plots.insert(0, self.flow_texture)
+        self.scheduler.register("flow_texture", self.update_flow_texture,
+                                args=(False,), depends_on=("matrix", "view"))
+        self.update_flow_texture(fine=True)
+
+    def update_flow_texture(self, fine: bool = False) -> None:
+        """
+        Recompute the flow texture, in place, at the fine or the
+        coarse resolution.
+        """
+        coarse_resolution, fine_resolution = self.flow_texture_resolution
+        with self.profiler.phase("compute"):
+            texture = line_integral_convolution(
+                self.m, self._noise, self.bounds,
+                fine_resolution if fine else coarse_resolution)
+        with self.profiler.phase("artists"):
+            self.flow_texture.set_data(texture)
+            self.flow_texture.set_extent(tuple(self.bounds))
+        self._flow_texture_coarse = not fine
+        self._flow_texture_time = self.clock()
+
+    def show_particles(self, count: int = 2000) -> None:
+        """
+        Show count tracer particles, seeded at random across the plot,
+        that are advected by the flow on every frame. This keeps the
+        animation running, and must be called before the animation
+        loop starts.
+        """
+        if self.particles is not None:
+            return
+        self._particle_xy = np.empty([count, 2])
+        self._particle_next = np.empty([count, 2])
+        self._particle_age = np.empty([count])
+        self.seed_particles()
+        self.particles = self.ax.scatter(
+            self._particle_xy[:, 0], self._particle_xy[:, 1], s=2.0,
+            color="tab:blue", alpha=0.6, linewidths=0.0, zorder=1.5)
+        # Draw the particles under the trajectories when blitting
+        self._plots.insert(self._plots.index(self.trajectories),
+                           self.particles)
+
+    def seed_particles(self) -> None:
+        """
+        Place all of the particles at random across the plot. Their ages
+        are also random, so that they are not all respawned at once.
+        """
+        xmin, xmax, ymin, ymax = self.bounds
+        self._particle_xy[:] = self._particle_rng.uniform(
+            [xmin, ymin], [xmax, ymax], self._particle_xy.shape)
+        self._particle_age[:] = self._particle_rng.uniform(
+            0.0, self.particle_lifetime, len(self._particle_age))
+
+    def advance_particles(self) -> None:
+        """
+        Advance the particles by particle_time_step. Since the system is
+        linear, this is a single product of the positions with the 2x2
+        matrix exp(M dt). The particles that leave the plot, come close
+        to the origin, or outlive particle_lifetime are respawned at
+        random across the plot.
+        """
+        with self.profiler.phase("compute"):
+            if self._particle_flow is None:
+                self._particle_flow = flow_matrix(
+                    self.m, np.float64(self.particle_time_step)).T
+            # The positions alternate between two buffers
+            xy = np.matmul(self._particle_xy, self._particle_flow,
+                           out=self._particle_next)
+            self._particle_next = self._particle_xy
+            self._particle_xy = xy
+            age = self._particle_age
+            age += self.particle_time_step
+            n = len(xy)
+            respawn = self._buffers.get("particle_respawn", (n,), bool)
+            test = self._buffers.get("particle_test", (n,), bool)
+            distance = self._buffers.get("particle_distance", (n,))
+            xmin, xmax, ymin, ymax = self.bounds
+            np.greater(age, self.particle_lifetime, out=respawn)
+            for axis, lower, upper in ((0, xmin, xmax), (1, ymin, ymax)):
+                respawn |= np.less(xy[:, axis], lower, out=test)
+                respawn |= np.greater(xy[:, axis], upper, out=test)
+            np.hypot(xy[:, 0], xy[:, 1], out=distance)
+            respawn |= np.less(distance, 0.01*max(xmax - xmin, ymax - ymin),
+                               out=test)
+            count = np.count_nonzero(respawn)
+            if count:
+                xy[respawn] = self._particle_rng.uniform(
+                    [xmin, ymin], [xmax, ymax], [count, 2])
+                age[respawn] = 0.0
+        with self.profiler.phase("artists"):
+            self.particles.set_offsets(xy)
+
+    def set_view(self, xmin: float, xmax: float,
+                 ymin: float, ymax: float) -> None:
+        """
+        Recompute the plot for the given bounds. The cached results that
+        depend on the bounds are dropped, and the plotted trajectories are
+        scaled with the view. Since the system is linear, zooming in
+        on the origin shows the same picture at a smaller scale.
+        The particles, if shown, are seeded again across the new view.
+        """
+        for entry in self.cache.values():
+            entry.uvc = None
+            entry.trajectories = None
+        self.trajectory_scale = max(
+            xmax - xmin, ymax - ymin)/max(
+            self.home_bounds[1] - self.home_bounds[0],
+            self.home_bounds[3] - self.home_bounds[2])
+        BaseVectorField2D.set_view(self, xmin, xmax, ymin, ymax)
+        if self.particles is not None:
+            self.seed_particles()
+
+    def use_atlas(self, atlas: "RenderAtlas") -> None:
+        """
+        Show the frames of the atlas instead of recomputing the plot
+        whenever the matrix lies on its lattice. The interactive
+        trajectories are still drawn on top of the frames, and so on top
+        of their arrows, unlike in the live plot.
+        This must be called before the animation loop starts.
+        """
+        from atlas import AtlasImage
+        self.atlas = atlas
+        self.atlas_image = AtlasImage(atlas.region)
+        self.atlas_image.set_visible(False)
+        # The frames already contain the grid, so draw them over it,
+        # and draw the trajectories of the initial conditions over them.
+        # These are then drawn over the arrows of the frames, whereas the
+        # arrows are drawn over them in the live plot.
+        self.atlas_image.set_zorder(1.8)
+        self.ic_trajectories.set_zorder(2.0)
+        self.ax.add_artist(self.atlas_image)
+        self._plots.insert(0, self.atlas_image)
+        self.scheduler.register("atlas", self.show_atlas_frame,
+                                ("quiver", "trajectories", "title"),
+                                depends_on=("matrix", "view_limits",
+                                            "view"))
+        self.show_atlas_frame()
+
+    def show_atlas_frame(self) -> None:
+        """
+        Show the frame of the atlas for the current matrix, and skip
+        recomputing the rest of the plot. If there is none, show
+        the live plot instead.
+        """
+        frame = None
+        if self.atlas.matches(self.ax, self.ax.get_xlim()
+                              + self.ax.get_ylim(), self.grid_points,
+                              self.flow_texture is not None):
+            frame = self.atlas.lookup(self.m)
+        live = [self.line, self.trajectories, self.title, self.text]
+        if self.flow_texture is not None:
+            live.append(self.flow_texture)
+        if frame is None:
+            if self.atlas_image.get_visible():
+                self.atlas_image.set_visible(False)
+                for artist in live:
+                    artist.set_visible(True)
+                # These were not kept up to date while hidden
+                self.scheduler.mark("quiver", "trajectories", "title",
+                                    "flow_texture")
+            return
+        with self.profiler.phase("artists"):
+            self.atlas_image.set_frame(frame)
+            self.atlas_image.set_visible(True)
+            for artist in live:
+                artist.set_visible(False)
+        # Only the interactive trajectories are drawn live
+        self.scheduler.clean("quiver", "trajectories", "title",
+                             "flow_texture")
+        self._flow_texture_coarse = False
+        self.set_interactive_line(*self.interactive_line_ic)
+        self.ic_trajectories.set_segments(self._sample_initial_conditions())
+
+    def f(self, xy: np.ndarray, *t: float,
+          out: np.ndarray = None) -> np.ndarray:
+        """
+        Evaluate the vector field (dx/dt, dy/dt) = m(x, y) at the
+        points xy of shape (2, ...) as a single matrix product.
+        """
+        xy = np.asarray(xy, np.float64)
+        if out is None:
+            out = np.empty(xy.shape)
+        np.matmul(self.m, xy.reshape(2, -1), out=out.reshape(2, -1))
+        return out
 
     def classify_fixed_point(self) -> str:
         """
@@ -73,49 +438,15 @@ class LinearVectorField2D(BaseVectorField2D):
         The complete classification of fixed points can be
         found on page 133 of Strogatz.
         """
-        # TODO: refactor the if statements.
-        fptype = ""
-        if np.linalg.det(self.m) == 0.0:
-            fptype = "Non-isolated"
-        elif self.m[0][0] == self.m[1][1] and (
-            self.m[1][0] == 0.0 or self.m[0][1] == 0.0):
-            if self.m[1][0] == self.m[0][1] == 0.0:
-                fptype = "Star"
-            elif (self.m[1][0] == 0.0 and self.m[0][1] != 0.0) or (
-                self.m[1][0] != 0.0 and self.m[0][1] == 0.0):
-                fptype = "Degernate Node"
-        else:
-            w = self.eigvals
-            if np.abs(np.imag(w[0])) < 1e-30:
-                if np.real(w[0]) > 0 and np.real(w[1]) < 0:
-                    fptype = "Saddle Node"
-                elif np.real(w[0]) < 0 and np.real(w[1]) > 0:
-                    fptype = "Saddle Node"
-                elif np.real(w[0]) > 0 and np.real(w[1]) > 0:
-                    fptype = "Unstable Node"
-                elif np.real(w[0]) < 0 and np.real(w[1]) < 0:
-                    fptype = "Stable Node"
-                else:
-                    fptype = ""
-            elif np.abs(np.imag(w[0])) > 1e-130:
-                if np.abs(np.real(w[0])) < 1e-10 and \
-                   np.abs((np.real(w[1])) < 1e-10):
-                    fptype = "Centre"
-                elif np.real(w[0]) > 0 and np.real(w[1]) > 0:
-                    fptype = "Unstable Spiral"
-                elif np.real(w[0]) < 0 and np.real(w[1]) < 0:
-                    fptype = "Stable Spiral"
-                else:
-                    fptype = ""
-        return fptype
+        return FIXED_POINT_TYPES[classify(self.m)]
 
     def set_title(self) -> None:
         """
         Set the title
         """
 
-        m00 = np.float(np.round(self.m[0][0], 2))
-        m01 = np.float(np.round(self.m[0][1], 2))
+        m00 = float(np.round(self.m[0][0], 2))
+        m01 = float(np.round(self.m[0][1], 2))
         xstring = str(m00) + "x" if np.abs(m00) > 1e-30 else ""
         xstring += "+" if (m01 > 1e-30 and np.abs(m00) > 1e-30) else ""
         xstring += str(m01) + "y" if np.abs(m01) > 1e-30 else ""
@@ -124,8 +455,8 @@ class LinearVectorField2D(BaseVectorField2D):
         # if ("1x" in xstring): xstring = xstring.replace("1x","x")
         # if ("1y" in xstring): xstring = xstring.replace("1x","x")
 
-        m10 = np.float(np.round(self.m[1][0], 2))
-        m11 = np.float(np.round(self.m[1][1], 2))
+        m10 = float(np.round(self.m[1][0], 2))
+        m11 = float(np.round(self.m[1][1], 2))
         ystring = str(m10) + "x" if np.abs(m10) > 1e-30 else ""
         ystring += "+" if (m11 > 1e-30 and np.abs(m10) > 1e-30) else ""
         ystring += str(m11) + "y" if np.abs(m11) > 1e-30 else ""
@@ -133,97 +464,296 @@ class LinearVectorField2D(BaseVectorField2D):
             ystring = "0"
         # if "1" in ystring: ystring = ystring.replace("1","")
 
+        entry = self._cache_entry
+        if entry.fptype is None:
+            with self.profiler.phase("compute"):
+                entry.fptype = self.classify_fixed_point()
+
         # Latex rendering is slow, so we completely avoid it.
-        self.title.set_text(r"x' = ax+by = " + xstring + " \n " +
-                            r"y' = cx+dy = " + ystring)
-        fptype = self.classify_fixed_point()
-        self.text.set_text(fptype)
+        with self.profiler.phase("artists"):
+            self.title.set_text(r"x' = ax+by = " + xstring + " \n " +
+                                r"y' = cx+dy = " + ystring)
+            self.text.set_text(entry.fptype)
+
+    def compute_trajectories(self, xy0: np.ndarray, t: np.ndarray,
+                             out: np.ndarray = None,
+                             work: np.ndarray = None) -> np.ndarray:
+        """
+        Compute many trajectories at once using the closed-form flow map.
+
+        Parameters:
+        xy0: (N, 2) array of initial conditions.
+        t: (T,) array of times, or (N, T) array of times for
+           each initial condition.
+        out, work: Optional buffers, as for flow_map.flow.
 
-    def _plot_trajectory(self, x: list, y: list, a: float, b: float) -> None:
+        Returns an (N, T, 2) array of (x, y) points.
         """
-        Helper function for plot_trajectories. This plots a single trajectory.
+        return flow(self.m, xy0, t, out=out, work=work)
+
+    def sample_trajectories(self, xy0: np.ndarray, t0: float, t1: float,
+                            n: int = None,
+                            out: np.ndarray = None) -> np.ndarray:
         """
-        t = np.linspace(-4, 4, 200)
-        x_elem = a*self.eigvects[0][0]*np.exp(
-                self.eigvals[0]*t) + b*self.eigvects[0][1]*np.exp(
-                        self.eigvals[1]*t)
-        y_elem = a*self.eigvects[1][0]*np.exp(
-                self.eigvals[0]*t) + b*self.eigvects[1][1]*np.exp(
-                        self.eigvals[1]*t)
-        x.append(np.real(x_elem))
-        y.append(np.real(y_elem))
+        Compute trajectories from t0 to t1 at n samples
+        (trajectory_samples by default), which are placed as described
+        for TrajectorySampler.sample.
 
-    def plot_trajectories(self, init_call: bool = False) -> None:
+        Returns an (N, n, 2) array of (x, y) points.
         """
-        Plot the trajectories.
+        return self.sampler.sample(
+            self.m, self.eigvals, self.bounds, xy0, t0, t1,
+            self.trajectory_samples if n is None else n, out)
+
+    def set_adaptive_sampling(self, adaptive: bool) -> None:
+        """
+        Place the samples of the trajectories where they are visible,
+        instead of at equally spaced times. This is about twenty times
+        slower, so it is off by default.
         """
+        self.sampler.adaptive = adaptive
+        for entry in self.cache.values():
+            entry.trajectories = None
+        if self.trajectories is not None:
+            self.plot_trajectories()
 
-        t = np.linspace(-4, 4, 200)
-        x = []
-        y = []
+    def set_trajectory_coeffs(self, coeffs: np.ndarray) -> None:
+        """
+        Set the eigen-coefficients of the trajectories that are plotted.
+        The trajectories along an eigenvector, where one of the
+        coefficients is zero, are drawn thicker.
+        """
+        self.trajectory_coeffs = np.asarray(coeffs, np.float64)
+        eigen = np.any(self.trajectory_coeffs == 0.0, axis=1)
+        self._trajectory_colors = np.where(eigen, "black", "blue")
+        self._trajectory_linewidths = np.where(eigen, 1.75, 0.75)
+        for entry in self.cache.values():
+            entry.trajectories = None
+        if self.trajectories is not None:
+            self.trajectories.set_color(self._trajectory_colors)
+            self.trajectories.set_linewidth(self._trajectory_linewidths)
+            self.plot_trajectories()
 
-        # Plot some trajectories
-        self._plot_trajectory(x, y, 4.0, 4.0)
-        self._plot_trajectory(x, y, 4.0, -4.0)
-        self._plot_trajectory(x, y, -4.0, 4.0)
-        self._plot_trajectory(x, y, -4.0, -4.0)
+    def plot_trajectories(self, init_call: bool = False) -> None:
+        """
+        Plot the trajectories. All of them are computed in a single
+        batch and drawn as one LineCollection.
+        """
 
-        # Plot the eigentrajectories.
-        self._plot_trajectory(x, y, 4.0, 0.0)
-        self._plot_trajectory(x, y, -0.0, 4.0)
-        self._plot_trajectory(x, y, -4.0, 0.0)
-        self._plot_trajectory(x, y, 0.0, -4.0)
+        with self.profiler.phase("compute"):
+            entry = self._cache_entry
+            if entry.trajectories is None:
+                xy0 = self.trajectory_scale*np.real(
+                    self.trajectory_coeffs @ self.eigvects.T)
+                entry.trajectories = self.sample_trajectories(
+                    xy0, *self.trajectory_time)
+            xy = entry.trajectories
+            xy_interactive = self._sample_interactive_line()
+            xy_ic = self._sample_initial_conditions()
 
         if (init_call):
 
+            from matplotlib.collections import LineCollection
+
             # Initialize the trajectories
-            for i in range(len(x)):
-                linewidth = 0.75 if i < 4 else 1.75
-                color = "blue" if i < 4 else "black"
-                line, = self.ax.plot(x[i], y[i],
-                                     # color=(
-                                     # i/len(x),0.5,(len(x)-i)/len(x)),
-                                     color=color,
-                                     linewidth=linewidth)
-                self.lines.append(line)
+            self.trajectories = LineCollection(
+                xy, colors=self._trajectory_colors,
+                linewidths=self._trajectory_linewidths)
+            self.ax.add_collection(self.trajectories)
 
             # Initialize the interactive trajectory
             line, = self.ax.plot(np.array([0]), np.array([0]), color="orange",
-                                 linewidth=linewidth)
+                                 linewidth=1.75)
             self.interactive_line = line
 
-            self.add_plots(self.lines)
+            # Initialize the trajectories of the given initial conditions
+            self.ic_trajectories = LineCollection(
+                xy_ic, colors="orange", linewidths=1.0)
+            self.ax.add_collection(self.ic_trajectories)
+
+            self.add_plots([self.trajectories, self.ic_trajectories])
 
         else:
-            a, b = self.interactive_line_coeffs
-            x_arr = a*self.eigvects[0][0]*np.exp(
-                    self.eigvals[0]*t) + b*self.eigvects[0][1]*np.exp(
-                            self.eigvals[1]*t)
-            y_arr = a*self.eigvects[1][0]*np.exp(
-                    self.eigvals[0]*t) + b*self.eigvects[1][1]*np.exp(
-                            self.eigvals[1]*t)
-            self.interactive_line.set_xdata(np.real(x_arr))
-            self.interactive_line.set_ydata(np.real(y_arr))
-            for i in range(len(x)):
-                self.lines[i].set_xdata(x[i])
-                self.lines[i].set_ydata(y[i])
+            with self.profiler.phase("artists"):
+                self.interactive_line.set_data(xy_interactive.T)
+                self.trajectories.set_segments(xy)
+                self.ic_trajectories.set_segments(xy_ic)
 
     def set_interactive_line(self, x: float, y: float) -> None:
         """
         Set the initial conditions of the trajectory.
         """
-        t = self._t
-        t = np.linspace(0.0, 4.0, 200)
-        a, b = np.linalg.solve(self.eigvects, np.array([x, y]))
-        x_arr = a*self.eigvects[0][0]*np.exp(
-          self.eigvals[0]*t) + b*self.eigvects[0][1]*np.exp(
-                self.eigvals[1]*t)
-        y_arr = a*self.eigvects[1][0]*np.exp(
-          self.eigvals[0]*t) + b*self.eigvects[1][1]*np.exp(
-                self.eigvals[1]*t)
-        self.interactive_line_coeffs = a, b
-        self.interactive_line.set_xdata(np.real(x_arr))
-        self.interactive_line.set_ydata(np.real(y_arr))
+        self.interactive_line_ic = x, y
+        with self.profiler.phase("compute"):
+            xy = self._sample_interactive_line()
+        with self.profiler.phase("artists"):
+            self.interactive_line.set_data(xy.T)
+
+    @property
+    def initial_conditions(self) -> np.ndarray:
+        """
+        (N, 2) array of the initial conditions of ic_trajectories.
+        """
+        return self.workspace.initial_conditions
+
+    def set_initial_conditions(self, xy0: np.ndarray) -> None:
+        """
+        Plot the trajectories of the (N, 2) array of initial conditions xy0,
+        in addition to the interactive trajectory. These replace the
+        trajectories of the workspace.
+        """
+        self.workspace.set(xy0)
+        self.ic_trajectories.set_segments(self._sample_initial_conditions())
+
+    def add_trajectories(self, xy0: np.ndarray) -> None:
+        """
+        Keep the trajectories of the (N, 2) array of initial conditions
+        xy0 in the workspace. Only the new trajectories are computed.
+        """
+        start = self.workspace.add(xy0)
+        with self.profiler.phase("compute"):
+            xy = self._sample_initial_conditions(start)
+        with self.profiler.phase("artists"):
+            self.ic_trajectories.set_segments(xy)
+
+    def remove_trajectory(self, x: float, y: float, radius: float) -> bool:
+        """
+        Remove the trajectory of the workspace nearest to (x, y), if one
+        is within radius. Return whether one was removed.
+        """
+        with self.profiler.phase("compute"):
+            index = self.workspace.nearest(x, y, radius, self.bounds)
+            if index is None:
+                return False
+            self.workspace.remove([index])
+        with self.profiler.phase("artists"):
+            self.ic_trajectories.set_segments(self.workspace.trajectories)
+        return True
+
+    def save_workspace(self, path: str) -> None:
+        """
+        Save the initial conditions of the workspace and the matrix
+        to an .npz file.
+        """
+        self.workspace.save(path, matrix=self.m)
+
+    def load_workspace(self, path: str) -> np.ndarray:
+        """
+        Replace the trajectories of the workspace with those saved in an
+        .npz file, and return the matrix that was saved with them, which
+        is left to the caller to set.
+        """
+        matrix = self.workspace.load(path).get("matrix")
+        self.ic_trajectories.set_segments(self._sample_initial_conditions())
+        return matrix
+
+    def _sample_interactive_line(self) -> np.ndarray:
+        """
+        Return the (n, 2) points of the interactive trajectory, written to
+        a buffer that the line copies when it is set.
+        """
+        xy0 = self._buffers.get("interactive_ic", (1, 2))
+        xy0[0] = self.interactive_line_ic
+        out = self._buffers.get("interactive_line",
+                                (1, self.trajectory_samples, 2))
+        return self.sample_trajectories(xy0, *self.interactive_time,
+                                        out=out)[0]
+
+    def _sample_initial_conditions(self, start: int = 0) -> np.ndarray:
+        """
+        Recompute the trajectories of the workspace from the one with
+        index start onwards, in place and in a single batch. Return the
+        (N, n, 2) points of all of them.
+        """
+        workspace = self.workspace
+        if start < len(workspace):
+            self.sample_trajectories(workspace.initial_conditions[start:],
+                                     *self.interactive_time,
+                                     workspace.samples,
+                                     workspace.trajectories[start:])
+        workspace.invalidate()
+        return workspace.trajectories
+
+    def use_worker(self) -> None:
+        """
+        Compute the frames for new matrices on a background thread, so
+        that the sliders stay responsive while many trajectories are
+        computed. The plot keeps showing the previous matrix until the
+        frame of the latest one is ready, and frames that are superseded
+        while being computed are abandoned.
+        This must be called before the animation loop starts.
+        """
+        if self.worker is None:
+            self.worker = ComputeWorker()
+
+    def _matrix_requested(self, c1: float, c2: float,
+                          c3: float, c4: float) -> None:
+        """
+        Set the matrix requested from the scheduler, or submit it to the
+        worker if there is one, in which case the rest of the plot is
+        only updated once its frame is ready.
+        """
+        if self.worker is None:
+            self.set_matrix(c1, c2, c3, c4)
+            return
+        self.worker.submit(self.frame_request(c1, c2, c3, c4))
+        self.scheduler.clean("quiver", "trajectories", "title",
+                             "flow_texture", "atlas")
+
+    def frame_request(self, c1: float, c2: float,
+                      c3: float, c4: float) -> FrameRequest:
+        """
+        Return the request for the frame of the given matrix,
+        with the rest of the current state of the plot.
+        """
+        return FrameRequest(
+            [c1, c2, c3, c4], self.bounds, self._quiver_xy,
+            self.trajectory_coeffs, self.trajectory_scale,
+            self.trajectory_time, self.interactive_line_ic,
+            self.initial_conditions, self.interactive_time,
+            self.trajectory_samples, self.sampler.adaptive)
+
+    def show_frame(self, frame: FrameData) -> None:
+        """
+        Set the matrix of a frame computed by the worker, and show it.
+        Its results are stored in the cache, and those that no longer
+        match the plot, because the view or the trajectories changed
+        after the frame was requested, are recomputed instead.
+        """
+        request = frame.request
+        with self.profiler.phase("compute"):
+            self.m = request.matrix.copy()
+            self._set_eigen(frame.eigvals, frame.eigvects)
+        self._particle_flow = None
+        entry = self._cache_entry
+        entry.fptype = frame.fptype
+        current = (np.array_equal(request.bounds, self.bounds)
+                   and request.quiver_xy.shape == self._quiver_xy.shape
+                   and request.trajectory_coeffs is self.trajectory_coeffs
+                   and request.trajectory_scale == self.trajectory_scale)
+        if current:
+            if frame.uvc.nbytes <= MAX_CACHED_QUIVER_BYTES:
+                entry.uvc = frame.uvc
+            entry.trajectories = frame.trajectories
+        self.scheduler.mark("flow_texture")
+        if self.atlas is not None:
+            # Either shows the frame of the atlas, or the live plot
+            # from the results that were just cached
+            self.scheduler.mark("atlas")
+            return
+        self.update_quiver()
+        self.set_title()
+        if not current or request.interactive_line_ic != \
+                self.interactive_line_ic or not np.array_equal(
+                request.initial_conditions, self.initial_conditions):
+            self.plot_trajectories()
+            return
+        with self.profiler.phase("artists"):
+            self.interactive_line.set_data(frame.interactive_line.T)
+            self.trajectories.set_segments(entry.trajectories)
+            self.workspace.trajectories[...] = frame.ic_trajectories
+            self.workspace.invalidate()
+            self.ic_trajectories.set_segments(self.workspace.trajectories)
 
     def set_matrix(self, c1: float = -0.5, c2: float = -1.5,
                    c3: float = 1.5, c4: float = -0.5) -> None:
@@ -231,17 +761,40 @@ class LinearVectorField2D(BaseVectorField2D):
         Set the matrix attribute m.
         Also compute its eigenvalues and eigenvectors.
         """
-        self.m = np.array([[c1, c2], [c3, c4]])
-        w, v = np.linalg.eig(self.m)
-        self.eigvals = w
-        self.eigvects = v
-        
+        with self.profiler.phase("compute"):
+            self.m = np.array([[c1, c2], [c3, c4]])
+            self._set_eigen()
+        self._particle_flow = None
+
     def set_matrix_element(self, i: int, j: int, value: float) -> None:
         """
         Set only a single matrix element of m.
         Also compute its eigenvalues and eigenvectors.
         """
-        self.m[i][j] = value
-        w, v = np.linalg.eig(self.m)
-        self.eigvals = w
-        self.eigvects = v
+        with self.profiler.phase("compute"):
+            self.m[i][j] = value
+            self._set_eigen()
+        self._particle_flow = None
+
+    def _set_eigen(self, eigvals: np.ndarray = None,
+                   eigvects: np.ndarray = None) -> None:
+        """
+        Compute the eigenvalues and eigenvectors of m, unless they are
+        given. These are only used to classify the fixed point and to
+        seed the trajectories, which are themselves computed from the
+        flow map. They are looked up in the cache first, and this also
+        selects the cache entry of the other results for m. Only an entry
+        of exactly m is reused, so that matrices that share its quantized
+        key never get each other's results.
+        """
+        key = self.cache.key(self.m)
+        entry = self.cache.get(
+            key, match=lambda e: np.array_equal(e.matrix, self.m))
+        if entry is None:
+            if eigvals is None:
+                eigvals, eigvects = np.linalg.eig(self.m)
+            entry = MatrixCacheEntry(self.m, eigvals, eigvects)
+            self.cache.put(key, entry)
+        self._cache_entry = entry
+        self.eigvals = entry.eigvals
+        self.eigvects = entry.eigvects
@@ -1,7 +1,11 @@
 """
 Locate mouse function
 """
-from typing import List, Tuple
+from types import SimpleNamespace
+from typing import List, Tuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from matplotlib.axes import Axes
 
 
 class Event:
@@ -93,3 +97,49 @@ def locate_mouse(event: Event,
     # print(x, y)
 
     return x, y
+
+
+def locate_mouse_on_axes(event: Event, ax: "Axes",
+                         window_height: int) -> Tuple[float, float]:
+    """
+    Locate the position of the mouse in the coordinates of the axes ax,
+    using the pixels that the axes currently cover on the canvas and their
+    current limits, so that this stays correct after zooming and panning.
+
+    event: An event which has an x and y attribute, which represent
+           the position of the event, with y starting from the top.
+    ax: The matplotlib axes.
+    window_height: The height of the canvas.
+    """
+    xlim = ax.get_xlim()
+    ylim = ax.get_ylim()
+    pixel_xlim = [ax.bbox.xmin, ax.bbox.xmax]
+    pixel_ylim = [ax.bbox.ymin, ax.bbox.ymax]
+    mx = (xlim[1] - xlim[0])/(pixel_xlim[1] - pixel_xlim[0])
+    my = (ylim[1] - ylim[0])/(pixel_ylim[1] - pixel_ylim[0])
+    x = (event.x - pixel_xlim[0])*mx + xlim[0]
+    y = (window_height - event.y - pixel_ylim[0])*my + ylim[0]
+    return x, y
+
+
+def navigation_event(ax: "Axes", x: float, y: float, window_height: int,
+                     **kwargs) -> SimpleNamespace:
+    """
+    Return the attributes of the matplotlib MouseEvent at a position of
+    the mouse that the navigation handlers of the vector fields use.
+
+    ax: The matplotlib axes.
+    x, y: The position of the mouse in pixels, with y starting from the top.
+    window_height: The height of the canvas.
+    kwargs: The button, whether this is a double click, or the step of
+            the mouse wheel.
+    """
+    y = window_height - y
+    inside = ax.bbox.contains(x, y)
+    xdata, ydata = ax.transData.inverted().transform((x, y))
+    attributes = {"x": x, "y": y, "inaxes": ax if inside else None,
+                  "xdata": xdata if inside else None,
+                  "ydata": ydata if inside else None,
+                  "button": None, "dblclick": False, "step": 0}
+    attributes.update(kwargs)
+    return SimpleNamespace(**attributes)
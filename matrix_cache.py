@@ -0,0 +1,131 @@
+"""
+Least recently used cache of results keyed by matrix.
+"""
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterator
+
+
+class MatrixCacheEntry:
+    """
+    Results that only depend on the matrix of a linear system.
+    Each attribute other than the matrix is None until it is first
+    computed.
+
+    Attributes:
+    matrix [np.ndarray]: The exact matrix of the results
+    eigvals [np.ndarray]: Eigenvalues of the matrix
+    eigvects [np.ndarray]: Eigenvectors of the matrix
+    fptype [str]: Classification of the fixed point
+    uvc [Tuple[np.ndarray, np.ndarray]]: Values of the field on the quiver
+    trajectories [np.ndarray]: (N, T, 2) array of the plotted trajectories
+    """
+
+    def __init__(self, matrix: np.ndarray, eigvals: np.ndarray = None,
+                 eigvects: np.ndarray = None) -> None:
+        """
+        Initializer. The matrix is copied.
+        """
+        self.matrix = np.array(matrix, np.float64)
+        self.eigvals = eigvals
+        self.eigvects = eigvects
+        self.fptype = None
+        self.uvc = None
+        self.trajectories = None
+
+
+class MatrixCache:
+    """
+    Bounded least recently used cache, where matrices are quantized
+    to a fixed resolution before being used as keys. With the default
+    resolution, matrices that differ by less than half a step of the
+    sliders share a key. Values that must only be reused for the exact
+    same matrix are checked with the match argument of get, and are
+    replaced by those of the latest matrix of their key.
+
+    Attributes:
+    capacity [int]: Maximum number of entries.
+    resolution [float]: Resolution to which matrices are quantized.
+    hits [int]: Number of lookups that found an entry.
+    misses [int]: Number of lookups that did not find an entry.
+    evictions [int]: Number of entries removed to respect the capacity.
+    """
+
+    def __init__(self, capacity: int = 512,
+                 resolution: float = 0.01) -> None:
+        """
+        Initializer.
+        """
+        if capacity < 1:
+            raise ValueError("The capacity must be at least 1.")
+        self.capacity = capacity
+        self.resolution = resolution
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+
+    def key(self, m: np.ndarray) -> tuple:
+        """
+        Return the key of the matrix m.
+        """
+        return tuple(np.rint(np.ravel(m)/self.resolution).astype(np.int64)
+                     .tolist())
+
+    def get(self, key: Hashable, default: Any = None,
+            match: Callable[[Any], bool] = None) -> Any:
+        """
+        Return the value stored at key, marking it as the most recently
+        used, or default if there is none. If match is given, a value
+        for which it returns False is treated as if there was none.
+        """
+        try:
+            value = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            return default
+        if match is not None and not match(value):
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        Store a value at key, evicting the least recently used
+        entries if there are more than capacity of them.
+        """
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def values(self) -> Iterator[Any]:
+        """
+        Iterate over all stored values.
+        """
+        return iter(self._entries.values())
+
+    def clear(self) -> None:
+        """
+        Remove all entries. The counters are left as they are.
+        """
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Return the counters, the number of entries and the hit rate.
+        """
+        lookups = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "size": len(self._entries),
+                "capacity": self.capacity,
+                "hit_rate": self.hits/lookups if lookups else 0.0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
@@ -0,0 +1,137 @@
+"""
+Nonlinear vector field in 2D, whose trajectories are integrated numerically.
+"""
+import argparse
+import numpy as np
+from vector_field import BaseVectorField2D
+from typing import Callable, List, Tuple
+
+Rhs = Callable[[np.ndarray, np.ndarray], Tuple[np.ndarray, np.ndarray]]
+
+
+class NonlinearVectorField2D(BaseVectorField2D):
+    """
+    Vector field in 2D given by an arbitrary function.
+
+    Attributes:
+    rhs [Rhs]: Function of x and y that returns (dx/dt, dy/dt)
+    name [str]: Shown as the title of the plot
+    seeds [int]: The trajectories start from a seeds x seeds grid
+    initial_conditions [np.ndarray]: (N, 2) ICs of the trajectories
+    trajectories [LineCollection]: All plotted trajectories
+
+    Reference:
+    Strogatz, S. (2015). Phase Plane.
+    In Nonlinear Dynamics and Chaos,
+    With Applications to Physics, Chemistry, and Engineering,
+    chapter 6. Routledge.
+    """
+
+    def __init__(self, rhs: Rhs, bounds: List[float] = None,
+                 name: str = "", seeds: int = 12,
+                 time: Tuple[float, float] = (-4.0, 4.0),
+                 headless: bool = False, grid_points: int = 21) -> None:
+        """
+        Initializer.
+
+        Parameters:
+        rhs: Function of x and y that returns (dx/dt, dy/dt).
+        bounds: xmin, xmax, ymin and ymax of the plot.
+        name: Shown as the title of the plot.
+        seeds: The trajectories start from a seeds x seeds grid.
+        time: Range of times of the trajectories.
+        """
+        if bounds is None:
+            bounds = [-10.0, 10.0, -10.0, 10.0]
+        self.rhs = rhs
+        self.name = name
+        self.time = time
+        self.trajectories = None
+        self.seeds = seeds
+        self.set_seeds(*bounds)
+        BaseVectorField2D.__init__(self, bounds, headless, grid_points)
+
+    def set_seeds(self, xmin: float, xmax: float,
+                  ymin: float, ymax: float) -> None:
+        """
+        Start the trajectories from a seeds x seeds grid inside the bounds.
+        """
+        x, y = np.meshgrid(np.linspace(xmin, xmax, self.seeds + 2)[1:-1],
+                           np.linspace(ymin, ymax, self.seeds + 2)[1:-1])
+        self.initial_conditions = np.stack([x.ravel(), y.ravel()], axis=1)
+
+    def set_view(self, xmin: float, xmax: float,
+                 ymin: float, ymax: float) -> None:
+        """
+        Recompute the plot for the given bounds, with the trajectories
+        seeded inside them.
+        """
+        self.set_seeds(xmin, xmax, ymin, ymax)
+        BaseVectorField2D.set_view(self, xmin, xmax, ymin, ymax)
+
+    def set_values(self) -> None:
+        """
+        Nothing to set, since the field is given by rhs.
+        """
+        pass
+
+    def f(self, xy: np.ndarray, *t: float,
+          out: np.ndarray = None) -> np.ndarray:
+        """
+        Evaluate rhs at the points xy of shape (2, ...).
+        """
+        xy = np.asarray(xy, np.float64)
+        if out is None:
+            out = np.empty(xy.shape)
+        out[0], out[1] = self.rhs(xy[0], xy[1])
+        return out
+
+    def set_title(self) -> None:
+        """
+        Set the title.
+        """
+        self.title.set_text(self.name)
+
+    def plot_trajectories(self, init_call: bool = False) -> None:
+        """
+        Plot the trajectories of all initial conditions.
+        """
+        t = np.linspace(self.time[0], self.time[1], 200)
+        xy = self.compute_trajectories(self.initial_conditions, t)
+        if init_call:
+            from matplotlib.collections import LineCollection
+            self.trajectories = LineCollection(xy, colors="blue",
+                                               linewidths=0.75)
+            self.ax.add_collection(self.trajectories)
+            self.add_plot(self.trajectories)
+        else:
+            self.trajectories.set_segments(xy)
+
+
+# Examples from chapter 6 of Strogatz
+EXAMPLES = {
+    # Example 6.1.1
+    "example_6_1_1": (lambda x, y: (x + np.exp(-y), -y),
+                      [-3.0, 3.0, -3.0, 3.0]),
+    # Rabbits versus sheep, section 6.4
+    "rabbits_sheep": (lambda x, y: (x*(3.0 - x - 2.0*y),
+                                    y*(2.0 - x - y)),
+                      [0.0, 3.0, 0.0, 3.0]),
+    # Nonlinear pendulum, section 6.7
+    "pendulum": (lambda x, y: (y, -np.sin(x)),
+                 [-2.0*np.pi, 2.0*np.pi, -3.0, 3.0]),
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Render the phase portrait of a nonlinear system.")
+    parser.add_argument("example", choices=sorted(EXAMPLES))
+    parser.add_argument("-o", "--output", default="phase_portrait.png")
+    parser.add_argument("--seeds", type=int, default=12)
+    args = parser.parse_args()
+    rhs, bounds = EXAMPLES[args.example]
+    field = NonlinearVectorField2D(rhs, bounds, args.example.replace(
+        "_", " "), args.seeds, headless=True)
+    with open(args.output, "wb") as f:
+        f.write(field.render("png"))
@@ -0,0 +1,146 @@
+"""
+Vectorized classification of the fixed point of many linear systems in 2D.
+
+The type of the fixed point of x' = Mx only depends on the trace tau and
+determinant delta of M, except for telling a star apart from a degenerate
+node. The complete classification can be found on page 133 of Strogatz.
+
+Reference:
+Strogatz, S. (2015). Linear Systems.
+In Nonlinear Dynamics and Chaos,
+With Applications to Physics, Chemistry, and Engineering,
+chapter 5. Routledge.
+"""
+import numpy as np
+from typing import Tuple, Union
+
+# Integer codes for each type of fixed point.
+NON_ISOLATED = 0
+SADDLE_NODE = 1
+STABLE_NODE = 2
+UNSTABLE_NODE = 3
+STAR = 4
+DEGENERATE_NODE = 5
+STABLE_SPIRAL = 6
+UNSTABLE_SPIRAL = 7
+CENTRE = 8
+
+# Names of each type of fixed point, indexed by their code.
+FIXED_POINT_TYPES = ("Non-isolated", "Saddle Node", "Stable Node",
+                     "Unstable Node", "Star", "Degernate Node",
+                     "Stable Spiral", "Unstable Spiral", "Centre")
+
+ArrayLike = Union[float, np.ndarray]
+
+
+def invariants(matrices: np.ndarray) -> Tuple[np.ndarray, np.ndarray,
+                                              np.ndarray]:
+    """
+    Return the trace, determinant and discriminant tau^2 - 4 delta
+    of a (..., 2, 2) array of matrices.
+    """
+    matrices = np.asarray(matrices, np.float64)
+    a, b = matrices[..., 0, 0], matrices[..., 0, 1]
+    c, d = matrices[..., 1, 0], matrices[..., 1, 1]
+    trace = a + d
+    det = a*d - b*c
+    return trace, det, trace*trace - 4.0*det
+
+
+def classify_elements(a: ArrayLike, b: ArrayLike,
+                      c: ArrayLike, d: ArrayLike,
+                      atol: float = 1e-10,
+                      rtol: float = 1e-12) -> np.ndarray:
+    """
+    Classify the fixed point of the matrices [[a, b], [c, d]].
+
+    Parameters:
+    a, b, c, d: Matrix elements, which are broadcast against each other.
+    atol, rtol: Absolute and relative tolerances used to decide whether
+                the determinant, discriminant, trace and off-diagonal
+                elements are zero. The relative tolerance is scaled by the
+                largest element of each matrix (squared for the
+                determinant and discriminant).
+
+    Returns an array of uint8 codes, indexing FIXED_POINT_TYPES.
+    """
+    a, b, c, d = np.broadcast_arrays(*[np.asarray(e, np.float64)
+                                       for e in (a, b, c, d)])
+    trace = a + d
+    det = a*d - b*c
+    disc = trace*trace - 4.0*det
+    scale = np.maximum(np.maximum(np.abs(a), np.abs(b)),
+                       np.maximum(np.abs(c), np.abs(d)))
+    tol1 = atol + rtol*scale
+    tol2 = atol + rtol*scale*scale
+    repeated = np.abs(disc) <= tol2
+    diagonal = (np.abs(b) <= tol1) & (np.abs(c) <= tol1)
+    conditions = [np.abs(det) <= tol2,
+                  det < 0.0,
+                  repeated & diagonal,
+                  repeated,
+                  (disc < 0.0) & (np.abs(trace) <= tol1),
+                  (disc < 0.0) & (trace < 0.0),
+                  disc < 0.0,
+                  trace < 0.0]
+    choices = [NON_ISOLATED, SADDLE_NODE, STAR, DEGENERATE_NODE, CENTRE,
+               STABLE_SPIRAL, UNSTABLE_SPIRAL, STABLE_NODE]
+    return np.select(conditions, choices,
+                     UNSTABLE_NODE).astype(np.uint8)
+
+
+def classify(matrices: np.ndarray, atol: float = 1e-10,
+             rtol: float = 1e-12) -> np.ndarray:
+    """
+    Classify the fixed point of a (..., 2, 2) array of matrices.
+    See classify_elements for the meaning of the tolerances.
+    """
+    matrices = np.asarray(matrices, np.float64)
+    return classify_elements(matrices[..., 0, 0], matrices[..., 0, 1],
+                             matrices[..., 1, 0], matrices[..., 1, 1],
+                             atol, rtol)
+
+
+def parameter_grid(a: ArrayLike, b: ArrayLike,
+                   c: ArrayLike, d: ArrayLike,
+                   atol: float = 1e-10,
+                   rtol: float = 1e-12) -> np.ndarray:
+    """
+    Classify every matrix on the grid spanned by the values of a, b, c and d.
+    Each parameter is either a scalar, which is held fixed, or a 1D array
+    of values, which becomes an axis of the result. For example,
+    parameter_grid(np.arange(-10.0, 10.005, 0.01), -1.5, 1.5,
+    np.arange(-10.0, 10.005, 0.01)) gives a (2001, 2001) stability map
+    over a and d. The grid is never built as an array of matrices.
+    """
+    params = [np.asarray(p, np.float64) for p in (a, b, c, d)]
+    n_axes = sum(p.ndim for p in params)
+    axis = 0
+    for i, p in enumerate(params):
+        if p.ndim == 1:
+            shape = [1]*n_axes
+            shape[axis] = p.size
+            params[i] = p.reshape(shape)
+            axis += 1
+        elif p.ndim > 1:
+            raise ValueError("Each parameter must be a scalar "
+                             "or a 1D array.")
+    return classify_elements(*params, atol=atol, rtol=rtol)
+
+
+def trace_determinant_diagram(trace: np.ndarray, det: np.ndarray,
+                              atol: float = 1e-10,
+                              rtol: float = 1e-12) -> np.ndarray:
+    """
+    Classify every point of the grid spanned by the 1D arrays trace and det,
+    returning an array of shape (det.size, trace.size) which can be shown
+    directly with imshow. Since a star cannot be told apart from a
+    degenerate node from these alone, the parabola tau^2 = 4 delta
+    is always labelled as a degenerate node.
+    """
+    # The companion matrix [[0, -delta], [1, tau]] has the given
+    # trace and determinant, and is never diagonal.
+    trace = np.asarray(trace, np.float64)
+    det = np.asarray(det, np.float64)
+    return classify_elements(0.0, -det[:, None], 1.0, trace[None, :],
+                             atol, rtol)
@@ -0,0 +1,89 @@
+"""
+Render phase portraits without a GUI.
+"""
+import argparse
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from linear_vector_field import LinearVectorField2D
+from typing import Iterable, List, Union
+
+
+def render_phase_portrait(matrix: np.ndarray,
+                          bounds: List[float] = None,
+                          initial_conditions: np.ndarray = None,
+                          fmt: str = "png", grid_points: int = 21,
+                          arrow_spacing: float = None,
+                          flow_texture: bool = False
+                          ) -> Union[bytes, np.ndarray]:
+    """
+    Render the phase portrait of x' = Mx on an Agg canvas.
+
+    Parameters:
+    matrix: The 2x2 matrix M, or its four elements a, b, c, d.
+    bounds: xmin, xmax, ymin and ymax of the plot. If not given,
+            these are read from the resources folder.
+    initial_conditions: (N, 2) array of initial conditions whose
+                        trajectories are also plotted.
+    fmt: "png" for the encoded PNG bytes, or "rgba" for a
+         (height, width, 4) uint8 array.
+    grid_points: Number of points of the grid along each axis.
+    arrow_spacing: Minimum spacing in pixels between the arrows.
+    flow_texture: Show a line integral convolution texture of the flow.
+    """
+    field = LinearVectorField2D(bounds, headless=True,
+                                grid_points=grid_points,
+                                arrow_spacing=arrow_spacing)
+    field.set_matrix(*np.ravel(matrix))
+    if flow_texture:
+        field.show_flow_texture()
+    field.plot_vector_field()
+    if initial_conditions is not None:
+        field.set_initial_conditions(initial_conditions)
+    return field.render(fmt)
+
+
+def render_many(matrices: Iterable[np.ndarray], max_workers: int = None,
+                **kwargs) -> List[Union[bytes, np.ndarray]]:
+    """
+    Render the phase portraits of many matrices concurrently on a pool
+    of threads. Each portrait has its own figure, so they do not share
+    any state, and NumPy and Agg release the GIL for much of the work.
+
+    Parameters:
+    matrices: The 2x2 matrices, or their four elements a, b, c, d.
+    max_workers: Number of threads. By default, this is chosen by
+                 ThreadPoolExecutor from the number of CPUs.
+    kwargs: Passed to render_phase_portrait for every matrix.
+
+    Returns the rendered portraits in the same order as the matrices.
+    """
+    with ThreadPoolExecutor(max_workers) as executor:
+        return list(executor.map(
+            lambda m: render_phase_portrait(m, **kwargs), matrices))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Render the phase portrait of x' = ax + by, "
+                    "y' = cx + dy to a PNG file.")
+    parser.add_argument("elements", type=float, nargs=4,
+                        metavar=("a", "b", "c", "d"))
+    parser.add_argument("-o", "--output", default="phase_portrait.png")
+    parser.add_argument("--bounds", type=float, nargs=4,
+                        metavar=("xmin", "xmax", "ymin", "ymax"))
+    parser.add_argument("--ic", type=float, nargs=2, action="append",
+                        metavar=("x", "y"),
+                        help="Initial condition of an extra trajectory. "
+                             "This may be given multiple times.")
+    parser.add_argument("--grid-points", type=int, default=21)
+    parser.add_argument("--arrow-spacing", type=float,
+                        help="Minimum spacing in pixels between arrows.")
+    parser.add_argument("--flow-texture", action="store_true",
+                        help="Show a line integral convolution texture "
+                             "of the flow behind the arrows.")
+    args = parser.parse_args()
+    with open(args.output, "wb") as f:
+        f.write(render_phase_portrait(args.elements, args.bounds, args.ic,
+                                      grid_points=args.grid_points,
+                                      arrow_spacing=args.arrow_spacing,
+                                      flow_texture=args.flow_texture))
@@ -0,0 +1,35 @@
+"""
+Scratch arrays that are reused between calls on the update path.
+"""
+import numpy as np
+
+
+class ScratchBuffers:
+    """
+    Uninitialized scratch arrays, requested by name. Each name has a
+    single flat buffer, and every request returns a view of its start
+    in the shape that was asked for, so that one buffer is kept for each
+    name whatever the shapes requested. The buffers are not locked, so
+    they must only be used by one thread at a time.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initializer.
+        """
+        self._arrays = {}
+
+    def get(self, name: str, shape: tuple,
+            dtype: type = np.float64) -> np.ndarray:
+        """
+        Return an uninitialized array of the given shape, which is a view
+        of the buffer with this name. The buffer is only allocated again
+        when it is too small, at twice its size or more.
+        """
+        key = name, dtype
+        size = int(np.prod(shape))
+        array = self._arrays.get(key)
+        if array is None or len(array) < size:
+            capacity = size if array is None else max(size, 2*len(array))
+            array = self._arrays[key] = np.empty(capacity, dtype)
+        return array[:size].reshape(shape)
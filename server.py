@@ -0,0 +1,331 @@
+"""
+Local HTTP service that renders phase portraits, using only the standard
+library. Run it with
+
+    python server.py --port 8000
+
+and request, for example,
+
+    http://localhost:8000/portrait.png?a=-0.5&b=-1.5&c=1.5&d=-0.5
+    http://localhost:8000/trajectories.json?a=1&b=0&c=0&d=-1&ic=1,2
+
+The query parameters are the matrix elements a, b, c and d, and optionally
+bounds=xmin,xmax,ymin,ymax, grid (the number of grid points along each
+axis) and ic=x,y, which may be repeated to add trajectories.
+"""
+import argparse
+import hashlib
+import json
+import threading
+import numpy as np
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+from linear_vector_field import LinearVectorField2D
+from matrix_cache import MatrixCache
+from typing import Iterator, Tuple
+
+MAX_GRID_POINTS = 101
+MAX_INITIAL_CONDITIONS = 64
+# Largest magnitude of the matrix elements, far beyond the range of the
+# sliders, which keeps them within the integers of the cache keys
+MAX_MATRIX_ELEMENT = 1e6
+
+
+class FieldPool:
+    """
+    Pool of headless fields that are reused between requests, so that the
+    figure is not built for every request. Each configuration of bounds and
+    grid points has its own fields, and only the most recently used
+    configurations are kept.
+
+    Attributes:
+    size [int]: Maximum number of idle fields kept per configuration.
+    created [int]: Total number of fields that were built.
+    """
+
+    def __init__(self, size: int = 4, configurations: int = 8) -> None:
+        """
+        Initializer.
+        """
+        self.size = size
+        self.created = 0
+        self._idle = MatrixCache(configurations)
+        self._lock = threading.Lock()
+
+    def prewarm(self, bounds: Tuple[float, ...] = None,
+                grid_points: int = 21) -> None:
+        """
+        Build all of the fields of a configuration ahead of the first
+        request.
+        """
+        fields = [self._build(bounds, grid_points) for _ in range(self.size)]
+        for field in fields:
+            self._release((bounds, grid_points), field)
+
+    @contextmanager
+    def field(self, bounds: Tuple[float, ...] = None,
+              grid_points: int = 21) -> Iterator[LinearVectorField2D]:
+        """
+        Borrow a field for the duration of a with block. A new one is
+        built if all of the fields of the configuration are in use.
+        """
+        key = (bounds, grid_points)
+        with self._lock:
+            idle = self._idle.get(key)
+            field = idle.pop() if idle else None
+        if field is None:
+            field = self._build(bounds, grid_points)
+        try:
+            yield field
+        finally:
+            self._release(key, field)
+
+    def _build(self, bounds: Tuple[float, ...],
+               grid_points: int) -> LinearVectorField2D:
+        field = LinearVectorField2D(
+            None if bounds is None else list(bounds), headless=True,
+            grid_points=grid_points)
+        with self._lock:
+            self.created += 1
+        return field
+
+    def _release(self, key: tuple, field: LinearVectorField2D) -> None:
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle is None:
+                idle = []
+                self._idle.put(key, idle)
+            if len(idle) < self.size:
+                idle.append(field)
+
+
+def parse_query(query: str) -> dict:
+    """
+    Parse and validate the query string of a request.
+    Raise a ValueError describing the first invalid parameter.
+    """
+    params = parse_qs(query)
+
+    def floats(value: str, n: int, name: str) -> Tuple[float, ...]:
+        try:
+            numbers = tuple(float(v) for v in value.split(","))
+        except ValueError:
+            numbers = ()
+        if len(numbers) != n or not np.all(np.isfinite(numbers)):
+            raise ValueError("%s must be %d comma separated finite numbers."
+                             % (name, n))
+        return numbers
+
+    matrix = []
+    for name in ("a", "b", "c", "d"):
+        if name not in params:
+            raise ValueError("The matrix element %s is missing." % name)
+        matrix.extend(floats(params[name][-1], 1, name))
+        if abs(matrix[-1]) > MAX_MATRIX_ELEMENT:
+            raise ValueError("The matrix element %s must be from %g to %g."
+                             % (name, -MAX_MATRIX_ELEMENT,
+                                MAX_MATRIX_ELEMENT))
+
+    bounds = None
+    if "bounds" in params:
+        bounds = floats(params["bounds"][-1], 4, "bounds")
+        if bounds[0] >= bounds[1] or bounds[2] >= bounds[3]:
+            raise ValueError("bounds must be xmin,xmax,ymin,ymax with "
+                             "xmin < xmax and ymin < ymax.")
+
+    grid_points = 21
+    if "grid" in params:
+        try:
+            grid_points = int(params["grid"][-1])
+        except ValueError:
+            grid_points = 0
+        if not 2 <= grid_points <= MAX_GRID_POINTS:
+            raise ValueError("grid must be an integer from 2 to %d."
+                             % MAX_GRID_POINTS)
+
+    initial_conditions = tuple(floats(v, 2, "ic")
+                               for v in params.get("ic", []))
+    if len(initial_conditions) > MAX_INITIAL_CONDITIONS:
+        raise ValueError("At most %d initial conditions are allowed."
+                         % MAX_INITIAL_CONDITIONS)
+    return {"matrix": tuple(matrix), "bounds": bounds,
+            "grid_points": grid_points,
+            "initial_conditions": initial_conditions}
+
+
+def _points(xy: np.ndarray) -> list:
+    """
+    Convert an array of points to nested lists for JSON,
+    with None in place of the points that are not finite.
+    """
+    values = np.round(xy, 6).astype(object)
+    values[~np.isfinite(xy)] = None
+    return values.tolist()
+
+
+class PortraitServer(ThreadingHTTPServer):
+    """
+    HTTP server that renders phase portraits on a thread per request.
+
+    Responses only depend on the query, so they are cached by the matrix,
+    quantized to the resolution of the sliders, together with the other
+    parameters. The matrix is also quantized before it is plotted, so that
+    a cached response is identical to a freshly rendered one.
+
+    Attributes:
+    pool [FieldPool]: Fields that are reused between requests.
+    cache [MatrixCache]: Response bodies and their ETags.
+    verbose [bool]: Log every request.
+    """
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], pool_size: int = 4,
+                 cache_capacity: int = 1024, verbose: bool = False) -> None:
+        """
+        Initializer.
+        """
+        ThreadingHTTPServer.__init__(self, address, PortraitRequestHandler)
+        self.pool = FieldPool(pool_size)
+        self.cache = MatrixCache(cache_capacity)
+        self.verbose = verbose
+        self._cache_lock = threading.Lock()
+
+    def respond(self, path: str, query: str) -> Tuple[bytes, str, str]:
+        """
+        Return the body, content type and ETag of the response to a GET
+        request. Raise a KeyError for an unknown path, and a ValueError
+        for invalid query parameters.
+        """
+        if path == "/stats":
+            with self._cache_lock:
+                stats = {"cache": self.cache.stats(),
+                         "fields": self.pool.created}
+            return json.dumps(stats).encode(), "application/json", None
+        if path not in ("/portrait.png", "/trajectories.json"):
+            raise KeyError(path)
+        params = parse_query(query)
+        key = (path, self.cache.key(params["matrix"]), params["bounds"],
+               params["grid_points"], params["initial_conditions"])
+        with self._cache_lock:
+            response = self.cache.get(key)
+        if response is None:
+            matrix = np.array(key[1])*self.cache.resolution
+            if path == "/portrait.png":
+                body = self.render(matrix, params)
+                content_type = "image/png"
+            else:
+                body = self.trajectories(matrix, params)
+                content_type = "application/json"
+            etag = '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+            response = body, content_type, etag
+            with self._cache_lock:
+                self.cache.put(key, response)
+        return response
+
+    def render(self, matrix: np.ndarray, params: dict) -> bytes:
+        """
+        Render the phase portrait as PNG.
+        """
+        with self._plotted_field(matrix, params) as field:
+            return field.render("png")
+
+    def trajectories(self, matrix: np.ndarray, params: dict) -> bytes:
+        """
+        Return the plotted trajectories, and the eigenvalues and fixed
+        point type of the matrix, as JSON.
+        """
+        with self._plotted_field(matrix, params) as field:
+            data = {"matrix": field.m.tolist(),
+                    "bounds": field.bounds.tolist(),
+                    "fixed_point": field.classify_fixed_point(),
+                    "eigenvalues": [[w.real, w.imag]
+                                    for w in field.eigvals.tolist()],
+                    "trajectories": _points(np.array(
+                        field.trajectories.get_segments())),
+                    "initial_conditions": [list(ic) for ic in
+                                           params["initial_conditions"]],
+                    "ic_trajectories": _points(np.array(
+                        field.ic_trajectories.get_segments()))}
+        return json.dumps(data).encode()
+
+    @contextmanager
+    def _plotted_field(self, matrix: np.ndarray,
+                       params: dict) -> Iterator[LinearVectorField2D]:
+        """
+        Borrow a field from the pool and plot the requested system on it.
+        """
+        with self.pool.field(params["bounds"],
+                             params["grid_points"]) as field:
+            field.set_matrix(*matrix)
+            field.plot_vector_field()
+            field.set_initial_conditions(
+                np.reshape(params["initial_conditions"], [-1, 2]))
+            yield field
+
+
+class PortraitRequestHandler(BaseHTTPRequestHandler):
+    """
+    Handle the GET requests of a PortraitServer.
+    """
+    server: PortraitServer
+
+    def do_GET(self) -> None:
+        url = urlparse(self.path)
+        try:
+            body, content_type, etag = self.server.respond(url.path,
+                                                           url.query)
+        except KeyError:
+            return self._send_error(404, "Unknown path %s." % url.path)
+        except ValueError as e:
+            return self._send_error(400, str(e))
+        if etag is not None and etag == self.headers.get("If-None-Match"):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if etag is not None:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "max-age=86400")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, code: int, message: str) -> None:
+        body = json.dumps({"error": message}).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Serve phase portraits of x' = ax + by, y' = cx + dy "
+                    "over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--pool-size", type=int, default=4,
+                        help="Idle fields kept for each configuration.")
+    parser.add_argument("--cache-size", type=int, default=1024,
+                        help="Number of responses that are cached.")
+    parser.add_argument("--verbose", action="store_true",
+                        help="Log every request.")
+    args = parser.parse_args()
+    server = PortraitServer((args.host, args.port), args.pool_size,
+                            args.cache_size, args.verbose)
+    server.pool.prewarm()
+    print("Serving on http://%s:%d" % server.server_address[:2])
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
@@ -1,10 +1,17 @@
 """
 This is the tkinter gui
 """
-from locate_mouse import locate_mouse
+from time import perf_counter
+_START_TIME = perf_counter()
+import argparse
+import os
+from interaction_trace import (InteractionRecorder, apply_event,
+                               SLIDER, DRAG, KEEP, DELETE, SCROLL,
+                               PAN_PRESS, PAN_MOTION, PAN_RELEASE)
+from typing import Sequence
 import tkinter as tk
 from linear_vector_field import LinearVectorField2D
-from matplotlib.backends import backend_tkagg
+_IMPORT_TIME = perf_counter()
 
 
 class App(LinearVectorField2D):
@@ -13,24 +20,51 @@ class App(LinearVectorField2D):
     
     Attributes:
     window [tk.Tk]: Main tkinter gui window
-    canvas [backend_tkagg.FigureCanvasTkAgg]: Canvas to graph on
+    canvas [backend_tkagg.FigureCanvasTkAgg]: Canvas to graph on, or a
+                                              TkCanvasRenderer if
+                                              tk_canvas is set
+    tk_canvas [bool]: Draw the plot natively on a tk.Canvas instead of
+                      rasterizing it with matplotlib.
     sliderslist [List[tk.Scale]]: List of tkinter sliders
     quit_button [tk.Button]: The quit button
+    startup_times [Dict[str, float]]: Times in seconds since the start of
+                                      the program at which each stage of
+                                      starting up finished.
+    workspace_path [str]: File that the workspace is saved to when
+                          quitting, if any.
+    pick_radius [int]: Distance in pixels within which a click
+                       picks a trajectory of the workspace.
+    recorder [InteractionRecorder]: Records the events, if recording.
+    recording_path [str]: File that the recording is saved to when
+                          quitting, if any.
     """
     
-    def __init__(self) -> None:
+    def __init__(self, tk_canvas: bool = False) -> None:
         """
         This is the constructor.
         """
 
+        # Show the window first, since building the figure and
+        # importing matplotlib is most of the time spent starting up.
+        self.startup_times = {"imports": _IMPORT_TIME - _START_TIME}
+        self.window = tk.Tk()
+        self.window.title("Linear Vector Field in 2D")
+        self.window.update()
+        self.startup_times["window"] = perf_counter() - _START_TIME
+
         #Initialize the parent class
         LinearVectorField2D.__init__(self)
+        self.startup_times["figure"] = perf_counter() - _START_TIME
 
         # Tkinter GUI Objects
-        self.window = None
         self.canvas = None
+        self.tk_canvas = tk_canvas
         self.sliderslist = []
         self.quit_button = None
+        self.workspace_path = None
+        self.pick_radius = 8
+        self.recorder = None
+        self.recording_path = None
 
         self.place_widgets()
 
@@ -38,30 +72,96 @@ class App(LinearVectorField2D):
     def slider_update(self, event: tk.Event) -> None:
         """
         Respond to slider events from the slider widgets.
+        The plot itself is only recomputed on the next frame.
         """
 
-        tmplist = []
-        for i in range(len(self.sliderslist)):
-            tmplist.append(self.sliderslist[i].get())
+        with self.profiler.phase("events"):
+            tmplist = []
+            for i in range(len(self.sliderslist)):
+                tmplist.append(self.sliderslist[i].get())
 
-        self.set_matrix(*tuple(tmplist))
-        self.plot_vector_field()
+            self.handle_event(SLIDER, tmplist)
 
     def mouse_listener(self, event: tk.Event) -> None:
         """
-        Handle mouse input.
+        Handle mouse input, which requests the interactive line
+        to start from the mouse.
+        """
+        with self.profiler.phase("events"):
+            self.handle_event(DRAG, (event.x, event.y))
+
+    def keep_listener(self, event: tk.Event) -> None:
+        """
+        Keep the trajectory starting at the mouse in the workspace.
+        """
+        with self.profiler.phase("events"):
+            self.handle_event(KEEP, (event.x, event.y))
+
+    def delete_listener(self, event: tk.Event) -> None:
+        """
+        Delete the trajectory of the workspace nearest to the mouse.
+        """
+        with self.profiler.phase("events"):
+            self.handle_event(DELETE, (event.x, event.y))
+
+    def navigation_listener(self, kind: int, event: tk.Event,
+                            *values: float) -> None:
+        """
+        Zoom or pan the view, with the position of the mouse followed by
+        the values of the event as described for EVENT_DTYPE.
         """
-        ax = self.figure.get_axes()[0]
-        xlim = ax.get_xlim()
-        ylim = ax.get_ylim()
-        pixel_xlim = [ax.bbox.xmin, ax.bbox.xmax]
-        pixel_ylim = [ax.bbox.ymin, ax.bbox.ymax]
-        height = self.canvas.get_tk_widget().winfo_height()
-        mx = (xlim[1] - xlim[0])/(pixel_xlim[1] - pixel_xlim[0])
-        my = (ylim[1] - ylim[0])/(pixel_ylim[1] - pixel_ylim[0])
-        x = (event.x - pixel_xlim[0])*mx + xlim[0]
-        y = (height - event.y - pixel_ylim[0])*my + ylim[0]
-        self.set_interactive_line(x, y)
+        with self.profiler.phase("events"):
+            self.handle_event(kind, (event.x, event.y) + values)
+
+    def connect_navigation(self) -> None:
+        """
+        Zoom with the mouse wheel, and pan by dragging with the right or
+        middle mouse button, as BaseVectorField2D.connect_navigation does.
+        The events are bound on the widget of the canvas and go through
+        handle_event, so that they are recorded with the other events,
+        whichever canvas is used.
+        """
+        listener = self.navigation_listener
+
+        def bind(sequence: str, callback) -> None:
+            self.canvas.get_tk_widget().bind(sequence, callback, add="+")
+
+        bind("<MouseWheel>", lambda event: listener(
+            SCROLL, event, 1 if event.delta > 0 else -1))
+        bind("<Button-4>", lambda event: listener(SCROLL, event, 1))
+        bind("<Button-5>", lambda event: listener(SCROLL, event, -1))
+        for button in (2, 3):
+            bind("<ButtonPress-%d>" % button,
+                 lambda event, button=button: listener(
+                     PAN_PRESS, event, button, 0))
+            bind("<Double-Button-%d>" % button,
+                 lambda event, button=button: listener(
+                     PAN_PRESS, event, button, 1))
+            bind("<B%d-Motion>" % button,
+                 lambda event: listener(PAN_MOTION, event))
+            bind("<ButtonRelease-%d>" % button,
+                 lambda event: listener(PAN_RELEASE, event))
+
+    def handle_event(self, kind: int, values: Sequence[float]) -> None:
+        """
+        Record an event if a recording is running, then handle it
+        with apply_event, as the replay of the recording also does.
+        """
+        if self.recorder is not None:
+            self.recorder.record(kind, values)
+        apply_event(self, kind, values,
+                    self.canvas.get_tk_widget().winfo_height(),
+                    self.pick_radius)
+
+    def load(self, path: str) -> None:
+        """
+        Load a workspace saved with save_workspace, and move the sliders
+        to its matrix.
+        """
+        matrix = self.load_workspace(path)
+        if matrix is not None:
+            for slider, value in zip(self.sliderslist, matrix.ravel()):
+                slider.set(value)
 
     def place_widgets(self) -> None:
         """
@@ -69,8 +169,6 @@ class App(LinearVectorField2D):
         """
 
         # Primary Tkinter GUI
-        self.window = tk.Tk()
-        self.window.title("Linear Vector Field in 2D")
         self.window.configure()
 
         # Canvas
@@ -81,15 +179,25 @@ class App(LinearVectorField2D):
         # Link to question: https://stackoverflow.com/q/21197728
         # [Question by user3208454:
         # https://stackoverflow.com/users/3208454/user3208454]
-        self.canvas = backend_tkagg.FigureCanvasTkAgg(
-            self.figure,
-            master=self.window
-        )
+        if self.tk_canvas:
+            from tk_canvas_renderer import TkCanvasRenderer
+            self.canvas = TkCanvasRenderer(self, self.window)
+        else:
+            from matplotlib.backends import backend_tkagg
+            self.canvas = backend_tkagg.FigureCanvasTkAgg(
+                self.figure,
+                master=self.window
+            )
         maxrowspan = 15
         self.canvas.get_tk_widget().grid(
                 row=0, column=0, rowspan=maxrowspan, columnspan=3)
         self._canvas_height = self.canvas.get_tk_widget().winfo_height()
         self.canvas.get_tk_widget().bind("<B1-Motion>", self.mouse_listener)
+        self.canvas.get_tk_widget().bind("<Shift-Button-1>",
+                                         self.keep_listener)
+        self.canvas.get_tk_widget().bind("<Control-Button-1>",
+                                         self.delete_listener)
+        self.connect_navigation()
 
         # Quit button
         self.quit_button = tk.Button(
@@ -139,15 +247,108 @@ class App(LinearVectorField2D):
         #
         self.figure.patch.set_facecolor(colour)
 
+    def animation_loop(self) -> None:
+        """
+        Play the animation, on the tk.Canvas if tk_canvas is set.
+        """
+        if self.tk_canvas:
+            self.canvas.animation_loop()
+        else:
+            LinearVectorField2D.animation_loop(self)
+
+    def measure_startup(self) -> None:
+        """
+        Record the time at which the first frame is drawn, then print
+        all of the startup times and quit.
+        """
+        def on_draw(event) -> None:
+            self.figure.canvas.mpl_disconnect(connection)
+            self.startup_times["first frame"] = perf_counter() - _START_TIME
+            for stage, t in self.startup_times.items():
+                print("%-12s %.3f s" % (stage, t))
+            self.window.after_idle(self.quit)
+        connection = self.figure.canvas.mpl_connect("draw_event", on_draw)
+
     def quit(self, *event: tk.Event) -> None:
         """
-        Quit the application.
+        Quit the application, saving the workspace and the recording
+        if they have a file.
         """
+        if self.workspace_path is not None:
+            self.save_workspace(self.workspace_path)
+        if self.recorder is not None:
+            self.recorder.save(self.recording_path)
         self.window.quit()
         self.window.destroy()
 
 
 if __name__ == "__main__":
-    app = App()
+    parser = argparse.ArgumentParser(
+        description="Interactive plot of a linear vector field in 2D.")
+    parser.add_argument("--flow-texture", action="store_true",
+                        help="Show a line integral convolution texture "
+                             "of the flow behind the arrows.")
+    parser.add_argument("--workspace", metavar="PATH",
+                        help="Load the kept trajectories and the matrix "
+                             "from an .npz file if it exists, and save "
+                             "them to it when quitting.")
+    parser.add_argument("--record", metavar="PATH",
+                        help="Record the slider and mouse events to an "
+                             ".npz file, which is saved when quitting and "
+                             "can be replayed with benchmarks.replay.")
+    parser.add_argument("--particles", type=int, nargs="?", const=2000,
+                        metavar="COUNT",
+                        help="Animate tracer particles that are advected "
+                             "by the flow (2000 by default).")
+    parser.add_argument("--worker", action="store_true",
+                        help="Compute the plot for new matrices on a "
+                             "background thread, so that the sliders stay "
+                             "responsive with many kept trajectories.")
+    parser.add_argument("--tk-canvas", action="store_true",
+                        help="Draw the plot natively on a Tk canvas, which "
+                             "is faster than rasterizing it with matplotlib, "
+                             "but cannot show the flow texture, particles "
+                             "or atlas.")
+    parser.add_argument("--profile", action="store_true",
+                        help="Show the frame rate and frame times, and "
+                             "print their percentiles when quitting.")
+    parser.add_argument("--startup-time", action="store_true",
+                        help="Print how long starting up takes, and quit "
+                             "once the first frame is drawn.")
+    parser.add_argument("--atlas", metavar="PATH",
+                        help="Show frames from an atlas built with "
+                             "atlas.py whenever the matrix is on it.")
+    args = parser.parse_args()
+    if args.tk_canvas and (args.flow_texture or args.particles is not None
+                           or args.atlas is not None or args.startup_time):
+        parser.error("--tk-canvas cannot be combined with --flow-texture, "
+                     "--particles, --atlas or --startup-time.")
+    app = App(args.tk_canvas)
+    if args.workspace is not None:
+        app.workspace_path = args.workspace
+        if os.path.exists(args.workspace):
+            app.load(args.workspace)
+    if args.flow_texture:
+        app.show_flow_texture()
+    if args.particles is not None:
+        app.show_particles(args.particles)
+    if args.worker:
+        app.use_worker()
+    if args.atlas is not None:
+        from atlas import RenderAtlas
+        app.use_atlas(RenderAtlas(args.atlas))
+    if args.profile:
+        app.show_profiler_overlay()
+    if args.record is not None:
+        # Started last, so that the recording starts from the final state
+        app.recording_path = args.record
+        app.recorder = InteractionRecorder(
+            app, [slider.get() for slider in app.sliderslist])
+    if args.startup_time:
+        app.measure_startup()
     app.animation_loop()
     tk.mainloop()
+    if args.profile:
+        for phase, p in app.profiler.percentiles().items():
+            print("%-8s " % phase + "  ".join(
+                "%s %.2f ms" % item for item in p.items()))
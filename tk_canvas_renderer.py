@@ -0,0 +1,452 @@
+"""
+Renderer that draws the interactive plot natively on a tk.Canvas.
+
+FigureCanvasTkAgg rasterizes every frame with Agg and then copies the
+image into Tk, which is slow at the resolution of the figure. This renderer
+instead mirrors the animated artists of a BaseVectorField2D onto a
+tk.Canvas: the arrows of the quiver become polygon items, the lines and
+line collections become line items, and the texts become text items over
+rectangles. The items are created once and then moved with coords, with
+all of the points transformed from data to pixels by NumPy in one go, and
+only the artists that changed since the last frame are updated.
+
+The matplotlib figure still holds the state of the plot, lays out the axes
+and their ticks, and is used for static export with render, but it is
+never drawn while animating. Images and scatter plots are not drawn, so
+the flow texture, the atlas and the particles need the Agg canvas.
+"""
+import math
+import numpy as np
+import tkinter as tk
+from matplotlib import rcParams
+from matplotlib.collections import LineCollection
+from matplotlib.colors import to_hex
+from matplotlib.lines import Line2D
+from matplotlib.quiver import Quiver
+from matplotlib.text import Text
+from typing import Callable, List, Sequence, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from matplotlib.artist import Artist
+    from vector_field import BaseVectorField2D
+
+# The default arrow of matplotlib's Quiver, in units of the width of its
+# shaft: heads 3 wide and 5 long, which meet the shaft 4.5 from the tip.
+# Arrows shorter than the head are only a shrunk head, and those shorter
+# than the width are a dot.
+_ARROW_INDEX = [0, 1, 2, 3, 2, 1, 0, 0]
+_ARROW_X = np.array([0.0, -4.5, -5.0, 0.0])[_ARROW_INDEX]
+_ARROW_SHAFT = np.array([0.0, 1.0, 1.0, 1.0])[_ARROW_INDEX]
+_ARROW_Y = 0.5*np.array([1.0, 1.0, 3.0, 0.0, -3.0, -1.0, -1.0, 1.0])
+_HEAD_X = np.array([0.0, 0.5, 0.0, 5.0])[_ARROW_INDEX]
+_HEAD_LENGTH = 5.0
+_DOT = 0.5*np.exp(1j*np.pi/3.0*np.arange(8))
+
+# Line that is drawn outside of the canvas, for lines with no points
+_HIDDEN_LINE = [-10.0, -10.0, -10.0, -10.0]
+
+
+def quiver_scale(uv: np.ndarray) -> float:
+    """
+    Return the length of the (N, 2) vectors uv, as a fraction of the
+    width of the axes, that matplotlib's Quiver draws an arrow of unit
+    length with, so that a typical arrow is a few widths long.
+    """
+    sn = max(10.0, math.sqrt(len(uv)))
+    return 1.8*float(np.mean(np.hypot(uv[:, 0], uv[:, 1])))*sn
+
+
+def arrow_polygons(uv: np.ndarray, length_scale: float) -> np.ndarray:
+    """
+    Return the (N, 8, 2) vertices of the arrows of the (N, 2) vectors uv,
+    in units of the width of their shafts, with their tails at the origin
+    and y pointing up. The length of an arrow is length_scale*|uv|.
+    """
+    length = np.hypot(uv[:, 0], uv[:, 1])
+    length *= length_scale
+    np.clip(length, 0.0, 2.0**16, out=length)
+    length = length[:, None]
+    shape = np.where(length < _HEAD_LENGTH,
+                     (length/_HEAD_LENGTH)*(_HEAD_X + 1j*_ARROW_Y),
+                     _ARROW_X + _ARROW_SHAFT*length + 1j*_ARROW_Y)
+    shape = np.where(length < 1.0, _DOT, shape)
+    shape *= np.exp(1j*np.arctan2(uv[:, 1], uv[:, 0]))[:, None]
+    return np.stack([shape.real, shape.imag], axis=-1)
+
+
+def _hex_colors(rgba: np.ndarray) -> List[str]:
+    """
+    Return the Tk colours of an (N, 4) array of RGBA colours.
+    Tk has no transparency, so the alpha is ignored.
+    """
+    rgb = np.round(np.asarray(rgba)[:, :3]*255.0).astype(int)
+    return ["#%02x%02x%02x" % tuple(colour) for colour in rgb]
+
+
+class _AfterTimer:
+    """
+    Call a function repeatedly with the after method of a Tk widget.
+    It has the start and stop methods of the timers of matplotlib, so that
+    the animation can pause and wake it up as it does for BlitAnimation.
+    """
+
+    def __init__(self, widget: tk.Widget, interval: int,
+                 callback: Callable[[], None]) -> None:
+        self.widget = widget
+        self.interval = interval
+        self.callback = callback
+        self._id = None
+
+    def start(self) -> None:
+        if self._id is None:
+            self._id = self.widget.after(self.interval, self._tick)
+
+    def stop(self) -> None:
+        if self._id is not None:
+            self.widget.after_cancel(self._id)
+            self._id = None
+
+    def _tick(self) -> None:
+        # Scheduled first, so that the callback can stop the timer
+        self._id = self.widget.after(self.interval, self._tick)
+        self.callback()
+
+
+class TkCanvasRenderer:
+    """
+    Draw the animated artists of a field on a tk.Canvas, and play its
+    animation with Tk's event loop instead of BlitAnimation.
+
+    Attributes:
+    field [BaseVectorField2D]: The field that is drawn.
+    canvas [tk.Canvas]: The canvas, which has the size of the figure in
+                        pixels, so that the coordinates of mouse events
+                        are the same as on a FigureCanvasTkAgg.
+    height [int]: Height of the canvas in pixels.
+    event_source [_AfterTimer]: Timer of the animation, which the field
+                                stops when nothing changes and starts
+                                again when woken up.
+    """
+
+    def __init__(self, field: "BaseVectorField2D", master: tk.Widget,
+                 **kwargs) -> None:
+        """
+        Create the canvas in master, with the given options.
+        """
+        self.field = field
+        width, height = (int(round(size)) for size in field.figure.bbox.size)
+        self.height = height
+        self.canvas = tk.Canvas(master, width=width, height=height,
+                                highlightthickness=0, **kwargs)
+        self.event_source = _AfterTimer(self.canvas, field.animation_interval,
+                                        self._frame)
+        self._items = {}
+        self._styles = {}
+        self._view = None
+        self._scale = np.array([1.0, -1.0])
+        self._offset = np.array([0.0, float(height)])
+        self._quiver = None
+        self._quiver_scale = 1.0
+        self._restack = False
+
+    def get_tk_widget(self) -> tk.Canvas:
+        """
+        Return the canvas, as FigureCanvasTkAgg does for its widget.
+        """
+        return self.canvas
+
+    @property
+    def pixels_per_point(self) -> float:
+        return self.field.figure.dpi/72.0
+
+    def to_pixels(self, xy: np.ndarray) -> np.ndarray:
+        """
+        Transform an (..., 2) array of points from data coordinates to the
+        pixels of the canvas, with y pointing down.
+        """
+        xy = xy*self._scale
+        xy += self._offset
+        return xy
+
+    def animation_loop(self) -> None:
+        """
+        Play the animation of the field on the canvas.
+        """
+        self.field.collect_artists()
+        self.field.main_animation = self
+        self.event_source.start()
+
+    def _frame(self) -> None:
+        field = self.field
+        # Updates the field, and stops the timer if nothing changed
+        artists = field._make_frame(0)
+        with field.profiler.phase("draw"):
+            self.draw(artists)
+            self.canvas.update_idletasks()
+        field.profiler.end_frame()
+
+    def draw(self, artists: Sequence["Artist"]) -> None:
+        """
+        Update the items of the artists that changed since the last frame,
+        which matplotlib marks as stale. Everything is drawn again when
+        the view changes.
+        """
+        ax = self.field.ax
+        view = ax.get_xlim() + ax.get_ylim() + tuple(
+            self.field.figure.bbox.size)
+        redraw = view != self._view
+        if redraw:
+            self.draw_axes()
+            self._view = view
+        for artist in [a for a in self._items if a not in artists]:
+            self.canvas.delete(self._tag(artist))
+            del self._items[artist]
+            self._styles.pop(artist, None)
+        for artist in artists:
+            if not (redraw or artist.stale or artist not in self._items):
+                continue
+            if isinstance(artist, Quiver):
+                self._draw_quiver(artist)
+            elif isinstance(artist, LineCollection):
+                self._draw_line_collection(artist)
+            elif isinstance(artist, Line2D):
+                self._draw_line(artist)
+            elif isinstance(artist, Text):
+                self._draw_text(artist)
+            else:
+                continue
+            self.canvas.itemconfigure(
+                self._tag(artist),
+                state="normal" if artist.get_visible() else "hidden")
+            artist.stale = False
+        if self._restack:
+            self._raise(artists)
+            self._restack = False
+
+    def draw_axes(self) -> None:
+        """
+        Draw the background, grid, ticks and labels of the axes, as well as
+        the margins around them, which hide the parts of the artists that
+        are outside of the axes. These only change with the view.
+        """
+        ax, canvas = self.field.ax, self.canvas
+        pt = self.pixels_per_point
+        ax.apply_aspect()
+        m = ax.transData.get_affine().get_matrix()
+        self._scale = np.array([m[0, 0], -m[1, 1]])
+        self._offset = np.array([m[0, 2], self.height - m[1, 2]])
+        left, right = ax.bbox.x0, ax.bbox.x1
+        top, bottom = self.height - ax.bbox.y1, self.height - ax.bbox.y0
+        width, height = (int(round(size)) for size in
+                         self.field.figure.bbox.size)
+        canvas.delete("axes", "frame")
+        background = to_hex(self.field.figure.get_facecolor())
+        canvas.configure(background=background)
+        canvas.create_rectangle(left, top, right, bottom, outline="",
+                                fill=to_hex(ax.get_facecolor()), tags="axes")
+
+        font = ("Helvetica", -int(round(rcParams["font.size"]*pt)))
+        tick = rcParams["xtick.major.size"]*pt
+        pad = rcParams["xtick.major.pad"]*pt
+        grid = any(line.get_visible() for line in ax.xaxis.get_gridlines())
+        grid_options = {"fill": rcParams["grid.color"],
+                        "width": rcParams["grid.linewidth"]*pt,
+                        "tags": "axes"}
+        for axis, (low, high) in ((ax.xaxis, ax.get_xlim()),
+                                  (ax.yaxis, ax.get_ylim())):
+            eps = 1e-9*(high - low)
+            locations = [t for t in axis.get_majorticklocs()
+                         if low - eps <= t <= high + eps]
+            labels = axis.get_major_formatter().format_ticks(locations)
+            for location, label in zip(locations, labels):
+                if axis is ax.xaxis:
+                    x = location*self._scale[0] + self._offset[0]
+                    if grid:
+                        canvas.create_line(x, top, x, bottom, **grid_options)
+                    canvas.create_line(x, bottom, x, bottom + tick,
+                                       tags="frame")
+                    canvas.create_text(x, bottom + tick + pad, text=label,
+                                       anchor="n", font=font,
+                                       tags=("frame", "xtick"))
+                else:
+                    y = location*self._scale[1] + self._offset[1]
+                    if grid:
+                        canvas.create_line(left, y, right, y, **grid_options)
+                    canvas.create_line(left - tick, y, left, y, tags="frame")
+                    canvas.create_text(left - tick - pad, y, text=label,
+                                       anchor="e", font=font,
+                                       tags=("frame", "ytick"))
+
+        # Margins in the colour of the figure, which clip the artists
+        for x0, y0, x1, y1 in ((0, 0, width, top), (0, bottom, width, height),
+                               (0, top, left, bottom),
+                               (right, top, width, bottom)):
+            canvas.create_rectangle(x0, y0, x1, y1, fill=background,
+                                    outline="", tags="frame")
+        canvas.create_rectangle(left, top, right, bottom, outline="black",
+                                width=rcParams["axes.linewidth"]*pt,
+                                tags="frame")
+        canvas.tag_raise("xtick")
+        canvas.tag_raise("ytick")
+
+        labelpad = rcParams["axes.labelpad"]*pt
+        xticks, yticks = canvas.bbox("xtick"), canvas.bbox("ytick")
+        below = xticks[3] if xticks else bottom + tick + pad
+        beside = yticks[0] if yticks else left - tick - pad
+        canvas.create_text(0.5*(left + right), below + labelpad,
+                           text=ax.get_xlabel(), anchor="n", font=font,
+                           tags="frame")
+        canvas.create_text(beside - labelpad, 0.5*(top + bottom),
+                           text=ax.get_ylabel(), anchor="s", angle=90,
+                           font=font, tags="frame")
+        self._restack = True
+
+    def _tag(self, artist: "Artist") -> str:
+        return "artist%d" % id(artist)
+
+    def _raise(self, artists: Sequence["Artist"]) -> None:
+        """
+        Stack the items in the order of the artists, with the texts
+        above the margins of the axes and the rest below them.
+        """
+        canvas = self.canvas
+        canvas.tag_lower("axes")
+        texts = [a for a in artists if isinstance(a, Text)]
+        for artist in [a for a in artists if not isinstance(a, Text)] + [
+                None] + texts:
+            if artist is None:
+                canvas.tag_raise("frame")
+            elif self._items.get(artist):
+                canvas.tag_raise(self._tag(artist))
+
+    def _resize(self, artist: "Artist", count: int,
+                create: Callable[[tuple], int]) -> List[int]:
+        """
+        Return the count items of an artist, creating or deleting
+        items so that there are that many of them.
+        """
+        items = self._items.setdefault(artist, [])
+        tags = ("artist", self._tag(artist))
+        while len(items) < count:
+            items.append(create(tags))
+            self._restack = True
+        while len(items) > count:
+            self.canvas.delete(items.pop())
+        return items
+
+    def _line_coords(self, xy: np.ndarray) -> list:
+        """
+        Return the coordinates of a line item through the finite points
+        of an (n, 2) array of pixels.
+        """
+        finite = np.all(np.isfinite(xy), axis=1)
+        if not np.all(finite):
+            xy = xy[finite]
+        if len(xy) == 0:
+            return _HIDDEN_LINE
+        if len(xy) == 1:
+            xy = np.repeat(xy, 2, axis=0)
+        return xy.ravel().tolist()
+
+    def _draw_quiver(self, quiver: Quiver) -> None:
+        uv = np.column_stack([np.ma.filled(quiver.U, 0.0),
+                              np.ma.filled(quiver.V, 0.0)])
+        if quiver is not self._quiver:
+            # As matplotlib does, the lengths of the arrows are
+            # scaled once, when the quiver is first drawn
+            self._quiver = quiver
+            self._quiver_scale = quiver_scale(uv)
+        span = self.field.ax.bbox.width
+        width = 0.06*span/np.clip(math.sqrt(len(uv)), 8.0, 25.0)
+        length_scale = span/(self._quiver_scale*width) \
+            if self._quiver_scale > 0.0 else 0.0
+        polygons = arrow_polygons(uv, length_scale)
+        polygons *= width*np.sign(self._scale)
+        polygons += self.to_pixels(quiver.XY)[:, None, :]
+        colour = _hex_colors(quiver.get_facecolor())[0]
+        items = self._resize(
+            quiver, len(uv), lambda tags: self.canvas.create_polygon(
+                0, 0, 0, 0, 0, 0, fill=colour, outline="", tags=tags))
+        coords = self.canvas.coords
+        for item, vertices in zip(items,
+                                  polygons.reshape(len(uv), -1).tolist()):
+            coords(item, vertices)
+
+    def _draw_line_collection(self, collection: LineCollection) -> None:
+        paths = collection.get_paths()
+        canvas = self.canvas
+        items = self._resize(
+            collection, len(paths),
+            lambda tags: canvas.create_line(_HIDDEN_LINE, tags=tags))
+        colours = _hex_colors(collection.get_colors())
+        widths = [w*self.pixels_per_point
+                  for w in collection.get_linewidths()]
+        style = colours, widths, len(items)
+        if self._styles.get(collection) != style:
+            self._styles[collection] = style
+            for i, item in enumerate(items):
+                canvas.itemconfigure(item, fill=colours[i % len(colours)],
+                                     width=widths[i % len(widths)])
+        if not paths:
+            return
+        try:
+            # Usually all of the lines have the same number of points
+            pixels = [self.to_pixels(np.stack(
+                [path.vertices for path in paths]))]
+        except ValueError:
+            pixels = [self.to_pixels(path.vertices) for path in paths]
+        coords = canvas.coords
+        if len(pixels) == 1:
+            pixels = pixels[0]
+            finite = np.all(np.isfinite(pixels), axis=(1, 2))
+            if np.all(finite):
+                for item, xy in zip(items,
+                                    pixels.reshape(len(items), -1).tolist()):
+                    coords(item, xy)
+                return
+        for item, xy in zip(items, pixels):
+            coords(item, self._line_coords(xy))
+
+    def _draw_line(self, line: Line2D) -> None:
+        item, = self._resize(line, 1, lambda tags: self.canvas.create_line(
+            _HIDDEN_LINE, capstyle="round", joinstyle="round", tags=tags))
+        self.canvas.coords(item, self._line_coords(
+            self.to_pixels(line.get_xydata())))
+        style = line.get_color(), line.get_linewidth()
+        if self._styles.get(line) != style:
+            self._styles[line] = style
+            self.canvas.itemconfigure(
+                item, fill=to_hex(line.get_color()),
+                width=line.get_linewidth()*self.pixels_per_point)
+
+    def _draw_text(self, text: Text) -> None:
+        canvas = self.canvas
+        if text not in self._items:
+            tags = ("artist", self._tag(text))
+            self._items[text] = [
+                canvas.create_rectangle(0, 0, 0, 0, tags=tags),
+                canvas.create_text(0, 0, justify="left", tags=tags)]
+            self._restack = True
+        box, item = self._items[text]
+        x, y = text.get_transform().transform(text.get_position())
+        size = text.get_fontsize()*self.pixels_per_point
+        vertical = {"top": "n", "center": "", "center_baseline": ""}.get(
+            text.get_verticalalignment(), "s")
+        horizontal = {"left": "w", "right": "e"}.get(
+            text.get_horizontalalignment(), "")
+        canvas.coords(item, x, self.height - y)
+        canvas.itemconfigure(item, text=text.get_text(),
+                             fill=to_hex(text.get_color()),
+                             anchor=(vertical + horizontal) or "center",
+                             font=("Helvetica", -int(round(size))))
+        patch = text.get_bbox_patch()
+        bbox = canvas.bbox(item) if text.get_text() else None
+        if patch is None or bbox is None:
+            canvas.coords(box, _HIDDEN_LINE)
+            canvas.itemconfigure(box, fill="", outline="")
+            return
+        pad = 0.3*size
+        canvas.coords(box, bbox[0] - pad, bbox[1] - pad,
+                      bbox[2] + pad, bbox[3] + pad)
+        canvas.itemconfigure(box, fill=to_hex(patch.get_facecolor()),
+                             outline=to_hex(patch.get_edgecolor()))
@@ -0,0 +1,300 @@
+"""
+Sampling of the trajectories of linear systems where they are visible.
+"""
+import numpy as np
+from flow_map import flow
+from scratch_buffers import ScratchBuffers
+from typing import Sequence, Tuple
+
+# Largest |Re(eigenvalue)| t up to which the time range of a rotation
+# is stretched. The flow then grows or shrinks by a factor of about 2e4,
+# which takes any trajectory out of the plot or into its fixed point.
+MAX_GROWTH = 10.0
+
+
+class TrajectorySampler:
+    """
+    Sample trajectories of x' = Mx from the closed-form flow map, at
+    equally spaced times, or with the samples placed where the
+    trajectories are visible if adaptive is set. The adaptive samples
+    take about twenty times longer to compute, so they are best kept for
+    plots that are not redrawn on every frame, such as exports.
+
+    Each sampler keeps its own scratch buffers, which only grow with the
+    largest number of trajectories sampled, so a sampler must only be used
+    by one thread at a time.
+
+    Attributes:
+    samples [int]: Default number of samples of each trajectory.
+    adaptive [bool]: Place the samples where the trajectories are
+                     visible, instead of at equally spaced times.
+    coarse_samples [int]: Number of samples used to find the time window
+                          that each trajectory spends inside the plot.
+    fine_samples [int]: Number of samples used to measure the arc length
+                        and the turning angle within this window.
+    """
+
+    def __init__(self, samples: int = 200, coarse_samples: int = 48,
+                 fine_samples: int = 240, adaptive: bool = False) -> None:
+        """
+        Initializer.
+        """
+        self.samples = samples
+        self.adaptive = adaptive
+        self.coarse_samples = coarse_samples
+        self.fine_samples = fine_samples
+        self._buffers = ScratchBuffers()
+        self._ramps = {}
+
+    def sample(self, m: np.ndarray, eigvals: np.ndarray,
+               bounds: Sequence[float], xy0: np.ndarray, t0: float,
+               t1: float, n: int = None,
+               out: np.ndarray = None) -> np.ndarray:
+        """
+        Compute trajectories of x' = mx from t0 to t1 at n samples
+        (samples by default). eigvals are the eigenvalues of m.
+
+        Unless adaptive is set, the samples are equally spaced in time,
+        and the points are clipped to a square that contains the bounds
+        padded by their size on each side. Points far off the plot are
+        then not drawn, while the segments that cross the plot keep their
+        direction, unless they reach beyond the padding.
+
+        Otherwise, a coarse pass first finds the time window that each
+        trajectory spends inside the plot bounds, so that no samples are
+        wasted off screen. A finer pass over this window then measures
+        the arc length and the turning angle of the visible parts of
+        each trajectory, and the samples are placed so that half of them
+        are equally spaced in arc length and the other half in turning
+        angle. The time range is also stretched to cover a full period
+        of slow rotations, so that the orbits of centres are not
+        truncated, unless the trajectories leave the plot first.
+
+        All intermediate arrays are views of buffers that are only
+        allocated again for a larger number of trajectories, and the
+        result is written to out if it is given, so that repeated calls
+        allocate next to nothing.
+
+        Returns an (N, n, 2) array of (x, y) points.
+        """
+        n = self.samples if n is None else n
+        xy0 = np.reshape(np.asarray(xy0, np.float64), [-1, 2])
+        rows = len(xy0)
+        if out is None:
+            out = np.empty([rows, n, 2])
+        if rows == 0:
+            return out
+        if not self.adaptive:
+            return self._sample_grid(m, bounds, xy0, t0, t1, n, out)
+        coarse, fine = self.coarse_samples, self.fine_samples
+        buffer = self._buffers.get
+        t0, t1 = time_range(eigvals, t0, t1)
+        xmin, xmax, ymin, ymax = bounds
+        pad = 0.05*max(xmax - xmin, ymax - ymin)
+        lower, upper = buffer("lower", (2,)), buffer("upper", (2,))
+        lower[0], lower[1] = xmin - pad, ymin - pad
+        upper[0], upper[1] = xmax + pad, ymax + pad
+
+        # Time window inside the plot, padded by a coarse step
+        t = buffer("t_coarse", (coarse,))
+        np.multiply(self._ramp(coarse), t1 - t0, out=t)
+        t += t0
+        xy = flow(m, xy0, t, out=buffer("xy_coarse", (rows, coarse, 2)),
+                  work=buffer("work_coarse", (coarse, 3)))
+        both = buffer("both", (rows, coarse, 2), bool)
+        above = buffer("above", (rows, coarse, 2), bool)
+        np.greater_equal(xy, lower, out=both)
+        np.less_equal(xy, upper, out=above)
+        both &= above
+        inside = buffer("inside", (rows, coarse), bool)
+        np.logical_and(both[..., 0], both[..., 1], out=inside)
+        last_index = coarse - 1
+        first = buffer("first", (rows,), np.intp)
+        last = buffer("last", (rows,), np.intp)
+        np.argmax(inside, axis=1, out=first)
+        first -= 1
+        np.maximum(first, 0, out=first)
+        np.argmax(inside[:, ::-1], axis=1, out=last)
+        np.subtract(last_index + 1, last, out=last)
+        np.minimum(last, last_index, out=last)
+        visible = buffer("visible", (rows,), bool)
+        np.any(inside, axis=1, out=visible)
+        ta, span = buffer("ta", (rows,)), buffer("span", (rows,))
+        np.take(t, first, out=ta, mode="clip")
+        ta *= visible
+        np.take(t, last, out=span, mode="clip")
+        span *= visible
+        span -= ta
+
+        # Arc length and turning angle within the window
+        u = self._ramp(fine)
+        t = buffer("t_fine", (rows, fine))
+        np.multiply(span[:, None], u, out=t)
+        t += ta[:, None]
+        xy = flow(m, xy0, t, out=buffer("xy_fine", (rows, fine, 2)),
+                  work=buffer("work_fine", (rows, fine, 3)))
+        # Segments of which both ends are outside of the padded bounds
+        # are not visible, and get no samples, even though the clipped
+        # points still move along the bounds. Neither does the turning
+        # at the points where the clipping bends the trajectory.
+        clipped = buffer("clipped", (rows, fine, 2), bool)
+        beyond = buffer("beyond", (rows, fine, 2), bool)
+        np.less(xy, lower, out=clipped)
+        np.greater(xy, upper, out=beyond)
+        clipped |= beyond
+        outside = buffer("outside", (rows, fine), bool)
+        np.logical_or(clipped[..., 0], clipped[..., 1], out=outside)
+        hidden = buffer("hidden", (rows, fine - 1), bool)
+        np.logical_and(outside[:, 1:], outside[:, :-1], out=hidden)
+        np.clip(xy, lower, upper, out=xy)
+        dxy = buffer("dxy", (rows, fine - 1, 2))
+        np.subtract(xy[:, 1:], xy[:, :-1], out=dxy)
+        ds = buffer("ds", (rows, fine - 1))
+        np.hypot(dxy[..., 0], dxy[..., 1], out=ds)
+        np.copyto(ds, 0.0, where=hidden)
+        cross = buffer("cross", (rows, fine - 2))
+        dot = buffer("dot", (rows, fine - 2))
+        product = buffer("product", (rows, fine - 2))
+        np.multiply(dxy[:, 1:, 0], dxy[:, :-1, 1], out=cross)
+        np.multiply(dxy[:, 1:, 1], dxy[:, :-1, 0], out=product)
+        cross -= product
+        np.multiply(dxy[:, 1:, 0], dxy[:, :-1, 0], out=dot)
+        np.multiply(dxy[:, 1:, 1], dxy[:, :-1, 1], out=product)
+        dot += product
+        dtheta = np.arctan2(cross, dot, out=cross)
+        np.abs(dtheta, out=dtheta)
+        bent = buffer("bent", (rows, fine - 2), bool)
+        np.logical_or(outside[:, :-2], outside[:, 1:-1], out=bent)
+        bent |= outside[:, 2:]
+        np.copyto(dtheta, 0.0, where=bent)
+        dtheta *= 0.5
+        # Attribute the turning at each point to both of its segments
+        turning = buffer("turning", (rows, fine - 1))
+        turning.fill(0.0)
+        turning[:, 1:] += dtheta
+        turning[:, :-1] += dtheta
+        measure = _normalized_cumsum(ds, u, buffer("measure", (rows, fine)))
+        measure += _normalized_cumsum(turning, u,
+                                      buffer("cumsum", (rows, fine)))
+        measure *= 0.5
+
+        # Invert the measure to get the times of the samples
+        t = _rowwise_interp(self._ramp(n), measure, u,
+                            buffer("t_samples", (rows, n)),
+                            buffer("interp", (4, rows, n)),
+                            buffer("offset_measure", (rows, fine)))
+        t *= span[:, None]
+        t += ta[:, None]
+        return flow(m, xy0, t, out=out,
+                    work=buffer("work_samples", (rows, n, 3)))
+
+    def _sample_grid(self, m: np.ndarray, bounds: Sequence[float],
+                     xy0: np.ndarray, t0: float, t1: float, n: int,
+                     out: np.ndarray) -> np.ndarray:
+        """
+        Sample the trajectories at n equally spaced times from t0 to t1,
+        clipped to a square that contains the bounds padded by their size
+        on each side.
+        """
+        buffer = self._buffers.get
+        t = buffer("t_grid", (n,))
+        np.multiply(self._ramp(n), t1 - t0, out=t)
+        t += t0
+        flow(m, xy0, t, out=out, work=buffer("work_grid", (n, 3)))
+        xmin, xmax, ymin, ymax = bounds
+        width, height = xmax - xmin, ymax - ymin
+        # Clipping both coordinates to the same scalar limits is several
+        # times faster than broadcasting limits for each of them
+        lower = min(xmin - width, ymin - height)
+        upper = max(xmax + width, ymax + height)
+        return np.clip(out, lower, upper, out=out)
+
+    def _ramp(self, n: int) -> np.ndarray:
+        """
+        Return n equally spaced values from 0 to 1, which are only
+        computed once.
+        """
+        ramp = self._ramps.get(n)
+        if ramp is None:
+            ramp = self._ramps[n] = np.linspace(0.0, 1.0, n)
+        return ramp
+
+
+def time_range(eigvals: np.ndarray, t0: float,
+               t1: float) -> Tuple[float, float]:
+    """
+    Stretch the time range from t0 to t1 so that it covers at
+    least one period of rotation, up to a limit. The range is not
+    stretched further than where the trajectories grow or shrink by
+    a factor of exp(MAX_GROWTH), since the samples beyond this would
+    be wasted off the plot, and the flow map would eventually overflow.
+    """
+    w = np.max(np.abs(np.imag(eigvals)))
+    if w > 0.0:
+        period = min(2.0*np.pi/w, 200.0)
+        if t1 - t0 < period:
+            scale = period/(t1 - t0)
+            growth = np.max(np.abs(np.real(eigvals)))*max(abs(t0), abs(t1))
+            if growth*scale > MAX_GROWTH:
+                scale = max(1.0, MAX_GROWTH/growth)
+            t0, t1 = t0*scale, t1*scale
+    return t0, t1
+
+
+def _normalized_cumsum(dm: np.ndarray, ramp: np.ndarray,
+                       out: np.ndarray) -> np.ndarray:
+    """
+    Write the cumulative sum of the (N, F - 1) increments dm along each
+    row to the (N, F) array out, starting from zero and scaled to end at
+    one. Rows with no increments are replaced by the (F,) array ramp.
+    """
+    out[:, 0] = 0.0
+    np.cumsum(dm, axis=1, out=out[:, 1:])
+    empty = out[:, -1] <= 0.0
+    out /= np.where(empty, 1.0, out[:, -1])[:, None]
+    if np.any(empty):
+        out[empty] = ramp
+    return out
+
+
+def _rowwise_interp(x: np.ndarray, xp: np.ndarray, fp: np.ndarray,
+                    out: np.ndarray, work: np.ndarray,
+                    offset_xp: np.ndarray) -> np.ndarray:
+    """
+    Like np.interp(x, xp[i], fp) for each row i of xp, where the values
+    of x and each row of xp are non-decreasing and lie within [0, 1].
+
+    The result is written to the (N, len(x)) array out. work is a
+    (4, N, len(x)) scratch array, and offset_xp one of the shape of xp.
+    """
+    rows, cols = xp.shape
+    x0, x1, w, shifted_x = work
+    # Offset each row so that all of them can be searched at once.
+    offsets = 2.0*np.arange(rows)[:, None]
+    np.add(xp, offsets, out=offset_xp)
+    np.add(x[None, :], offsets, out=shifted_x)
+    index = np.searchsorted(offset_xp.ravel(), shifted_x.ravel(),
+                            side="right").reshape(rows, len(x))
+    # Index into the flattened xp, kept within the row
+    row_start = cols*np.arange(rows)[:, None]
+    index -= 1
+    np.clip(index, row_start, row_start + cols - 2, out=index)
+    # The indices are within bounds, and mode="clip" stops take from
+    # buffering its output.
+    flat_xp = xp.reshape(-1)
+    np.take(flat_xp, index, out=x0, mode="clip")
+    index += 1
+    np.take(flat_xp, index, out=x1, mode="clip")
+    np.subtract(x1, x0, out=x1)
+    np.subtract(x[None, :], x0, out=w)
+    np.divide(w, x1, out=w, where=x1 > 0.0)
+    w[x1 <= 0.0] = 0.0
+    # Interpolate fp with the weights, reusing x0 and x1
+    index -= row_start
+    np.take(fp, index, out=x1, mode="clip")
+    index -= 1
+    np.take(fp, index, out=x0, mode="clip")
+    x1 -= x0
+    x1 *= w
+    np.add(x0, x1, out=out)
+    return out
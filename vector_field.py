@@ -2,22 +2,53 @@
 Abstract vector field in 2D.
 """
 import numpy as np
-from animation import Animation
-from matplotlib.pyplot import text, grid
-from typing import List
+from io import BytesIO
+from time import perf_counter
+from animation import Animation, RedrawScheduler
+from integrators import rk4, dopri5
+from scratch_buffers import ScratchBuffers
+from typing import List, Union
 
 
 class BaseVectorField2D(Animation):
     """
     Abstract VectorField2D class.
+
+    Attributes:
+    grid_points [int]: Number of points of the grid along each axis.
+    arrow_spacing [float]: If not None, the minimum spacing in pixels
+                           between the arrows of the quiver, which only
+                           shows every few points of a dense grid.
+    xy [np.ndarray]: (2, grid_points, grid_points) array of the x and y
+                     coordinates of the grid.
+    home_bounds [np.ndarray]: Bounds of the plot when it was created.
+    zoom_factor [float]: Factor by which each step of the mouse wheel
+                         zooms in or out.
+    view_delay [float]: Time in seconds without any change of the view
+                        after which the plot is recomputed for it.
+    clock [Callable[[], float]]: Returns the time in seconds that the
+                                 delays of the plot are measured with,
+                                 which can be replaced by a virtual clock.
     """
 
-    def __init__(self, bounds: List[int]) -> None:
+    def __init__(self, bounds: List[int], headless: bool = False,
+                 grid_points: int = 21, arrow_spacing: float = None) -> None:
         """
         Initializer for the BaseVectorField2D class.
         """
 
-        super().__init__(True)
+        super().__init__(True, headless)
+        self.grid_points = grid_points
+        self.arrow_spacing = arrow_spacing
+        self.home_bounds = np.array(bounds, np.float64)
+        self.zoom_factor = 1.25
+        self.view_delay = 0.15
+        self.clock = perf_counter
+        self._view_pending = False
+        self._view_time = 0.0
+        self._view_target = self.home_bounds.copy()
+        self._drag = None
+        self._buffers = ScratchBuffers()
 
         # Attributes are defined in the methods.
         # self.autoaddartists = True
@@ -25,10 +56,14 @@ class BaseVectorField2D(Animation):
         self.set_values()
         self.set_plotting_objects()
         self.plot_vector_field(init_call=True)
+        self.set_scheduler()
 
-    def f(self, xy, *t) -> None:
+    def f(self, xy: np.ndarray, *t: float,
+          out: np.ndarray = None) -> np.ndarray:
         """
         Abstract function that dictates the ODE.
+        xy has shape (2, ...), and the result has the same shape.
+        If given, the result is written to out, which must be contiguous.
         """
         raise NotImplementedError
 
@@ -39,17 +74,14 @@ class BaseVectorField2D(Animation):
         """
 
         # Number of points for each axis
-        N = 21
+        N = self.grid_points
 
         # Dimensions of the plot
         self.bounds = np.array([xmin, xmax, ymin, ymax])
 
-        x = np.outer(np.ones([N]),
-                     np.linspace(self.bounds[0], self.bounds[1], N))
-        y = np.outer(np.linspace(self.bounds[2], self.bounds[3], N),
-                     np.ones([N]))
-
-        self.xy = [x, y]
+        self.xy = np.empty([2, N, N])
+        self.xy[0] = np.linspace(self.bounds[0], self.bounds[1], N)[None, :]
+        self.xy[1] = np.linspace(self.bounds[2], self.bounds[3], N)[:, None]
 
     def set_values(self) -> None:
         """
@@ -74,15 +106,151 @@ class BaseVectorField2D(Animation):
         self.ax.set_xlabel("x")
         self.ax.set_ylabel("y")
         self.ax.set_aspect("equal")
-        self.text = text(self.bounds[0] + 1, self.bounds[3] - 1,
-                         "", color="black")
+        # The texts are placed relative to the axes, so that they stay
+        # in place when the view is zoomed or panned.
+        self.text = self.ax.text(0.05, 0.95, "", color="black",
+                                 transform=self.ax.transAxes)
         self.text.set_bbox({"facecolor": "white", "alpha": 1.0})
-        self.title = text(self.bounds[0]/2 + self.bounds[1]/3,
-                          self.bounds[3] 
-                          - 0.1*(self.bounds[3] - self.bounds[2]),
-                         "", color="black")
+        self.title = self.ax.text(5.0/12.0, 0.9, "", color="black",
+                                  transform=self.ax.transAxes)
         self.title.set_bbox({"facecolor": "white", "alpha": 1.0})
-        grid()
+        self.ax.grid()
+        self.set_quiver_grid()
+
+    def set_quiver_grid(self) -> None:
+        """
+        Choose the points of the grid where arrows are drawn, and allocate
+        the buffer that the values of the vector field are written to.
+        If arrow_spacing is set, the grid is decimated so that the arrows
+        are at least that many pixels apart on screen.
+        """
+        stride = 1
+        if self.arrow_spacing is not None and self.grid_points > 1:
+            pixel_spacing = min(self.ax.bbox.width, self.ax.bbox.height)/(
+                self.grid_points - 1)
+            stride = max(1, int(np.ceil(self.arrow_spacing/pixel_spacing)))
+        self._quiver_xy = np.ascontiguousarray(
+            self.xy[:, ::stride, ::stride])
+        self._uvc = np.empty_like(self._quiver_xy)
+
+    def set_scheduler(self) -> None:
+        """
+        Setup the scheduler that coalesces events into redraws.
+        Subclasses can register further components, such as the
+        parameters of the vector field, with the quiver, trajectories
+        and title as dependents.
+        """
+        self.scheduler = RedrawScheduler(self.wake)
+        self.scheduler.register("view_limits", self.set_view_limits,
+                                args=tuple(self.bounds))
+        self.scheduler.register("quiver", self.update_quiver)
+        self.scheduler.register("trajectories", self.plot_trajectories)
+        self.scheduler.register("title", self.set_title)
+        self.scheduler.register("view", self.set_view,
+                                ("quiver", "trajectories", "title"),
+                                args=tuple(self.bounds))
+
+    def set_view_limits(self, xmin: float, xmax: float,
+                        ymin: float, ymax: float) -> None:
+        """
+        Move the view to the given bounds without recomputing anything,
+        which is cheap enough to do on every frame of a gesture. Only the
+        animated artists are drawn again, over the background of the
+        figure, whose grid and ticks are left behind until set_view
+        recomputes the plot and draws the figure once the view stops
+        changing.
+        """
+        self.ax.set_xlim(xmin, xmax)
+        self.ax.set_ylim(ymin, ymax)
+        self._view_pending = True
+        self._view_time = self.clock()
+
+    def set_view(self, xmin: float, xmax: float,
+                 ymin: float, ymax: float) -> None:
+        """
+        Recompute the grid of the quiver for the given bounds, keeping
+        the same number of arrows on screen. The trajectories are then
+        recomputed by the scheduler, since they depend on the view.
+        """
+        # The background is out of date after a gesture
+        stale = self._view_pending or not np.allclose(
+            self.ax.get_xlim() + self.ax.get_ylim(), (xmin, xmax, ymin, ymax))
+        self.set_coords(xmin, xmax, ymin, ymax)
+        self._view_target = self.bounds.copy()
+        self._view_pending = False
+        self.ax.set_xlim(xmin, xmax)
+        self.ax.set_ylim(ymin, ymax)
+        self.set_quiver_grid()
+        # A new quiver is made, so that its arrows are scaled again
+        quiver = self.line
+        quiver.remove()
+        self.update_quiver(init_call=True)
+        self.line.set_animated(quiver.get_animated())
+        if quiver in self._plots:
+            self._plots[self._plots.index(quiver)] = self.line
+        if stale:
+            self.figure.canvas.draw()
+
+    def reset_view(self) -> None:
+        """
+        Go back to the bounds the plot was created with.
+        """
+        self.scheduler.request("view", *self.home_bounds)
+
+    def connect_navigation(self) -> None:
+        """
+        Zoom with the mouse wheel, and pan by dragging with the right or
+        middle mouse button. A double click with either of them resets
+        the view. This must be called once the canvas of the figure,
+        for example a FigureCanvasTkAgg, has been created.
+        """
+        canvas = self.figure.canvas
+        canvas.mpl_connect("scroll_event", self._on_scroll)
+        canvas.mpl_connect("button_press_event", self._on_press)
+        canvas.mpl_connect("motion_notify_event", self._on_motion)
+        canvas.mpl_connect("button_release_event", self._on_release)
+
+    def _request_view_limits(self, bounds: np.ndarray) -> None:
+        """
+        Request that the view be moved to the bounds on the next frame.
+        Later gestures start from these bounds, even before they are
+        shown.
+        """
+        self._view_target = np.asarray(bounds, np.float64)
+        self.scheduler.request("view_limits", *self._view_target)
+
+    def _on_scroll(self, event) -> None:
+        if event.inaxes is not self.ax or event.xdata is None:
+            return
+        bounds = self._view_target
+        factor = self.zoom_factor**-event.step
+        width = bounds[1] - bounds[0]
+        factor = np.clip(factor*width, 1e-3, 1e4)/width
+        centre = np.array([event.xdata, event.xdata,
+                           event.ydata, event.ydata])
+        self._request_view_limits(centre + (bounds - centre)*factor)
+
+    def _on_press(self, event) -> None:
+        if event.inaxes is not self.ax or event.button not in (2, 3):
+            return
+        if event.dblclick:
+            self._drag = None
+            self.reset_view()
+        else:
+            self._drag = event.x, event.y, self._view_target
+
+    def _on_motion(self, event) -> None:
+        if self._drag is None:
+            return
+        x0, y0, bounds = self._drag
+        # Pixels per unit, which stay the same while panning
+        scale = self.ax.bbox.width/(bounds[1] - bounds[0])
+        dx = (event.x - x0)/scale
+        dy = (event.y - y0)/scale
+        self._request_view_limits(bounds - np.array([dx, dx, dy, dy]))
+
+    def _on_release(self, event) -> None:
+        self._drag = None
 
     def plot_trajectories(self, init_call: bool = False) -> None:
         """
@@ -90,25 +258,122 @@ class BaseVectorField2D(Animation):
         """
         raise NotImplementedError
 
+    def compute_trajectories(self, xy0: np.ndarray,
+                             t: np.ndarray) -> np.ndarray:
+        """
+        Compute many trajectories at once by integrating f numerically.
+        Subclasses with a closed-form solution can override this.
+
+        Parameters:
+        xy0: (N, 2) array of initial conditions at t = 0.
+        t: (T,) increasing array of times, which may be negative.
+
+        Returns an (N, T, 2) array of (x, y) points.
+        """
+        return self.integrate_trajectories(xy0, t)
+
+    def integrate_trajectories(self, xy0: np.ndarray, t: np.ndarray,
+                               method: str = "dopri5",
+                               **kwargs) -> np.ndarray:
+        """
+        Integrate f forwards and backwards in time from t = 0 for all of
+        the initial conditions xy0 at once, stopping the trajectories that
+        leave the plot.
+
+        Parameters:
+        xy0: (N, 2) array of initial conditions at t = 0.
+        t: (T,) increasing array of times, which may be negative.
+        method: "rk4" for fixed steps, or "dopri5" for adaptive steps.
+        kwargs: Passed on to the integrator.
+
+        Returns an (N, T, 2) array of (x, y) points, which are NaN where
+        the trajectory has left the plot.
+        """
+        integrator = {"rk4": rk4, "dopri5": dopri5}[method]
+        xy0 = np.reshape(np.asarray(xy0, np.float64), [-1, 2])
+        t = np.asarray(t, np.float64)
+        xmin, xmax, ymin, ymax = self.bounds
+        pad = 0.05*max(xmax - xmin, ymax - ymin)
+        bounds = [xmin - pad, xmax + pad, ymin - pad, ymax + pad]
+        out = np.empty([len(xy0), len(t), 2])
+        backward = t < 0.0
+        for part, sign in ((backward, -1.0), (~backward, 1.0)):
+            if not np.any(part):
+                continue
+            # Integrate outwards from zero in both directions
+            tp = t[part][::int(sign)]
+            tp = np.concatenate([[0.0], tp]) if tp[0] != 0.0 else tp
+            xy = integrator(self._f_points, xy0, tp, bounds, **kwargs)
+            xy = xy[:, len(xy[0]) - np.count_nonzero(part):]
+            out[:, part] = xy[:, ::int(sign)]
+        return out
+
+    def _f_points(self, xy: np.ndarray, t: np.ndarray) -> np.ndarray:
+        """
+        Evaluate f on a (2, N) array of points at the (N,) times t.
+        """
+        return self.f(xy, t)
+
     def plot_vector_field(self, init_call: bool = False) -> None:
         """
         Plot the vector field.
         """
-        xdot, ydot = self.f(self.xy)
+        self.update_quiver(init_call=init_call)
+        self.plot_trajectories(init_call=init_call)
+        self.set_title()
+
+    def quiver_values(self) -> np.ndarray:
+        """
+        Return the values of the vector field at the arrows of the quiver.
+        These are written to the same buffer every time.
+        """
+        return self.f(self._quiver_xy, out=self._uvc)
+
+    def update_quiver(self, init_call: bool = False) -> None:
+        """
+        Plot the arrows of the vector field.
+        """
+        with self.profiler.phase("compute"):
+            xdot, ydot = self.quiver_values()
         if init_call:
-            self.line = self.ax.quiver(self.xy[0], self.xy[1],
+            self.line = self.ax.quiver(self._quiver_xy[0],
+                                       self._quiver_xy[1],
                                        xdot, ydot, color="black")
 
         else:
-            self.line.set_UVC(xdot, ydot)
-        self.plot_trajectories(init_call=init_call)
-        self.set_title()
-        
-    def update(self):
+            with self.profiler.phase("artists"):
+                self.line.set_UVC(xdot, ydot)
+
+    def render(self, fmt: str = "png") -> Union[bytes, np.ndarray]:
+        """
+        Draw the figure on its Agg canvas, without going through
+        the animation loop.
+
+        Parameters:
+        fmt: Either "png", which returns the encoded PNG bytes,
+             or "rgba", which returns a (height, width, 4) uint8 array
+             of the canvas.
+        """
+        if fmt == "png":
+            buffer = BytesIO()
+            self.figure.savefig(buffer, format="png",
+                                facecolor=self.figure.get_facecolor())
+            return buffer.getvalue()
+        elif fmt == "rgba":
+            self.figure.canvas.draw()
+            return np.array(self.figure.canvas.buffer_rgba())
+        raise ValueError("Unknown format %s." % fmt)
+
+    def update(self) -> bool:
         """
-        Update the animation
+        Update the animation by recomputing whatever changed since
+        the last frame.
         """
         # print("fps: %.1f" % (1/self.delta_t))
         # print(self._plots)
-        pass
-        # self.plot_vector_field(init_call = False)
+        if self._view_pending and \
+                not self.scheduler.is_dirty("view_limits") and \
+                self.clock() - self._view_time > self.view_delay:
+            self.scheduler.request("view", *self.ax.get_xlim(),
+                                   *self.ax.get_ylim())
+        return self.scheduler.flush() or self._view_pending
@@ -0,0 +1,249 @@
+"""
+Background worker that computes the frames of a LinearVectorField2D.
+
+When the matrix changes, the field copies everything that a frame depends
+on into a FrameRequest and submits it to the worker, instead of computing
+the frame on the thread of the GUI. The worker thread computes the eigen
+data, the values of the quiver and all of the trajectories into a new
+FrameData, the back buffer, which it only hands over once it is complete.
+The animation loop then takes the latest finished frame, and pushes it to
+the artists. Only the latest request is kept: requests that are superseded
+before the worker gets to them are dropped, and the one being computed is
+abandoned between its stages. NumPy releases the GIL for the array work,
+so the sliders stay responsive while a frame is computed.
+"""
+import threading
+import numpy as np
+from phase_diagram import FIXED_POINT_TYPES, classify
+from trajectory_sampler import TrajectorySampler
+from typing import Tuple
+
+# Number of initial conditions sampled at a time, between which
+# the worker checks whether its request was superseded
+CHUNK_SIZE = 256
+
+
+class FrameRequest:
+    """
+    Everything that a frame depends on, copied from the field when the
+    request is made, so that the worker never reads the field itself.
+
+    Attributes:
+    matrix [np.ndarray]: The 2x2 matrix of the frame.
+    bounds [np.ndarray]: xmin, xmax, ymin and ymax of the plot.
+    quiver_xy [np.ndarray]: (2, ...) positions of the arrows.
+    trajectory_coeffs [np.ndarray]: (N, 2) eigen-coefficients of the
+                                    initial conditions of the plotted
+                                    trajectories.
+    trajectory_scale [float]: Factor by which these are scaled.
+    trajectory_time [Tuple[float, float]]: Time range of the plotted
+                                           trajectories.
+    interactive_line_ic [Tuple[float, float]]: IC of the interactive line.
+    initial_conditions [np.ndarray]: (M, 2) ICs of the trajectories of
+                                     the workspace.
+    interactive_time [Tuple[float, float]]: Time range of these.
+    samples [int]: Number of samples of each trajectory.
+    adaptive [bool]: Whether the samples are placed where the
+                     trajectories are visible.
+    generation [int]: Set by the worker when the request is submitted.
+    """
+
+    def __init__(self, matrix: np.ndarray, bounds: np.ndarray,
+                 quiver_xy: np.ndarray, trajectory_coeffs: np.ndarray,
+                 trajectory_scale: float,
+                 trajectory_time: Tuple[float, float],
+                 interactive_line_ic: Tuple[float, float],
+                 initial_conditions: np.ndarray,
+                 interactive_time: Tuple[float, float],
+                 samples: int, adaptive: bool = False) -> None:
+        """
+        Initializer. The arrays are copied.
+        """
+        self.matrix = np.array(matrix, np.float64).reshape(2, 2)
+        self.bounds = np.array(bounds, np.float64)
+        self.quiver_xy = np.array(quiver_xy, np.float64)
+        self.trajectory_coeffs = trajectory_coeffs
+        self.trajectory_scale = trajectory_scale
+        self.trajectory_time = trajectory_time
+        self.interactive_line_ic = tuple(interactive_line_ic)
+        self.initial_conditions = np.array(initial_conditions, np.float64)
+        self.interactive_time = interactive_time
+        self.samples = samples
+        self.adaptive = adaptive
+        self.generation = 0
+
+
+class FrameData:
+    """
+    A frame computed by the worker. Its arrays are never written to once
+    it is handed over, so that the artists can keep references to them.
+
+    Attributes:
+    request [FrameRequest]: The request that the frame was computed for.
+    eigvals [np.ndarray]: Eigenvalues of the matrix.
+    eigvects [np.ndarray]: Eigenvectors of the matrix.
+    fptype [str]: Classification of the fixed point.
+    uvc [np.ndarray]: (2, ...) values of the field at the arrows.
+    trajectories [np.ndarray]: (N, n, 2) plotted trajectories.
+    interactive_line [np.ndarray]: (n, 2) interactive trajectory.
+    ic_trajectories [np.ndarray]: (M, n, 2) trajectories of the
+                                  workspace.
+    """
+
+    def __init__(self, request: FrameRequest) -> None:
+        """
+        Initializer.
+        """
+        self.request = request
+        self.eigvals = None
+        self.eigvects = None
+        self.fptype = None
+        self.uvc = None
+        self.trajectories = None
+        self.interactive_line = None
+        self.ic_trajectories = None
+
+    @property
+    def generation(self) -> int:
+        return self.request.generation
+
+
+class ComputeWorker:
+    """
+    Thread that computes the frame of the latest request.
+
+    Attributes:
+    generation [int]: Generation of the latest request.
+    completed [int]: Number of frames that were handed over.
+    cancelled [int]: Number of requests that were superseded before
+                     their frame was finished.
+    """
+
+    def __init__(self) -> None:
+        """
+        Start the worker thread.
+        """
+        self.generation = 0
+        self.completed = 0
+        self.cancelled = 0
+        # The scratch buffers of the sampler are only used by the worker
+        self._sampler = TrajectorySampler()
+        self._condition = threading.Condition()
+        self._request = None
+        self._ready = None
+        self._error = None
+        self._busy = False
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, daemon=True,
+                                        name="ComputeWorker")
+        self._thread.start()
+
+    def submit(self, request: FrameRequest) -> int:
+        """
+        Submit a request, which supersedes any earlier one,
+        and return its generation.
+        """
+        with self._condition:
+            if self._request is not None:
+                self.cancelled += 1
+            self.generation += 1
+            request.generation = self.generation
+            self._request = request
+            self._condition.notify()
+        return request.generation
+
+    def take(self) -> FrameData:
+        """
+        Return the latest finished frame, or None if there is no new one.
+        An exception raised while computing it is raised here instead.
+        """
+        with self._condition:
+            frame, self._ready = self._ready, None
+            error, self._error = self._error, None
+        if error is not None:
+            raise error
+        return frame
+
+    def pending(self) -> bool:
+        """
+        Return whether a frame is being computed or waiting to be taken.
+        """
+        with self._condition:
+            return (self._request is not None or self._busy
+                    or self._ready is not None or self._error is not None)
+
+    def stop(self) -> None:
+        """
+        Stop the worker thread once it is done with its current request.
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while self._request is None and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                request, self._request = self._request, None
+                self._busy = True
+            frame, error = None, None
+            try:
+                frame = self.compute(request)
+            except Exception as e:
+                error = e
+            with self._condition:
+                self._busy = False
+                if error is not None:
+                    self._error = error
+                elif frame is None or frame.generation != self.generation:
+                    self.cancelled += 1
+                else:
+                    self._ready = frame
+                    self.completed += 1
+
+    def _superseded(self, request: FrameRequest) -> bool:
+        return request.generation != self.generation
+
+    def compute(self, request: FrameRequest) -> FrameData:
+        """
+        Compute the frame of a request. Return None as soon as a newer
+        request is submitted.
+        """
+        frame = FrameData(request)
+        m = request.matrix
+        frame.eigvals, frame.eigvects = np.linalg.eig(m)
+        frame.fptype = FIXED_POINT_TYPES[classify(m)]
+        xy = request.quiver_xy
+        frame.uvc = np.matmul(m, xy.reshape(2, -1)).reshape(xy.shape)
+        if self._superseded(request):
+            return None
+
+        self._sampler.adaptive = request.adaptive
+
+        def sample(xy0: np.ndarray, t0: float, t1: float,
+                   out: np.ndarray) -> np.ndarray:
+            return self._sampler.sample(m, frame.eigvals, request.bounds,
+                                        xy0, t0, t1, request.samples, out)
+
+        xy0 = request.trajectory_scale*np.real(
+            request.trajectory_coeffs @ frame.eigvects.T)
+        frame.trajectories = sample(
+            xy0, *request.trajectory_time,
+            np.empty([len(xy0), request.samples, 2]))
+        frame.interactive_line = sample(
+            np.array([request.interactive_line_ic]),
+            *request.interactive_time,
+            np.empty([1, request.samples, 2]))[0]
+        ics = request.initial_conditions
+        frame.ic_trajectories = np.empty([len(ics), request.samples, 2])
+        for start in range(0, len(ics), CHUNK_SIZE):
+            if self._superseded(request):
+                return None
+            stop = start + CHUNK_SIZE
+            sample(ics[start:stop], *request.interactive_time,
+                   frame.ic_trajectories[start:stop])
+        return frame
@@ -0,0 +1,224 @@
+"""
+Workspace of the trajectories that the user placed on the plot.
+
+The initial conditions and the points of all of the trajectories are kept
+in two arrays that grow geometrically, rather than in an object for each
+trajectory, so that thousands of them can be recomputed in one batch when
+the matrix changes. A uniform grid over the segments of the trajectories
+finds the one nearest to the mouse by only looking at the segments in the
+cells around it.
+"""
+import numpy as np
+from typing import Dict, Sequence, Tuple
+
+
+class TrajectoryIndex:
+    """
+    Uniform grid over the segments of a set of trajectories.
+
+    Each segment is put in the cell of its midpoint, and the cells are
+    stored one after the other, so that each row of cells around a point
+    is a contiguous slice of the segments.
+
+    Attributes:
+    bounds [np.ndarray]: xmin, xmax, ymin and ymax covered by the grid.
+                         Segments outside of it are put in the cells at
+                         its edges.
+    cells [int]: Number of cells along each axis.
+    reach [float]: Half the length of the longest segment, which is how
+                   far a segment may extend outside of its cell.
+    """
+
+    def __init__(self, xy: np.ndarray, bounds: Sequence[float],
+                 cells: int = 64) -> None:
+        """
+        Index the (N, n, 2) array of the points of N trajectories.
+        """
+        self.bounds = np.array(bounds, np.float64)
+        self.cells = cells
+        a = xy[:, :-1].reshape(-1, 2)
+        b = xy[:, 1:].reshape(-1, 2)
+        segment = np.flatnonzero(np.all(np.isfinite(a), axis=1)
+                                 & np.all(np.isfinite(b), axis=1))
+        a, b = a[segment], b[segment]
+        midpoint = 0.5*(a + b)
+        cell = (self._cell(midpoint[:, 1], 2)*cells
+                + self._cell(midpoint[:, 0], 0))
+        order = np.argsort(cell, kind="stable")
+        self._a = a[order]
+        self._ab = b[order] - self._a
+        self._trajectory = segment[order]//max(xy.shape[1] - 1, 1)
+        self._start = np.zeros(cells*cells + 1, np.intp)
+        np.cumsum(np.bincount(cell, minlength=cells*cells),
+                  out=self._start[1:])
+        self.reach = 0.5*float(np.max(np.hypot(
+            self._ab[:, 0], self._ab[:, 1]))) if len(order) else 0.0
+
+    def _cell(self, values: np.ndarray, axis: int) -> np.ndarray:
+        """
+        Return the cells along the x (axis 0) or y (axis 2) axis
+        of the grid that contain the given values.
+        """
+        low, high = self.bounds[axis], self.bounds[axis + 1]
+        cell = np.floor((values - low)*(self.cells/(high - low)))
+        return np.clip(cell, 0, self.cells - 1).astype(np.intp)
+
+    def nearest(self, x: float, y: float,
+                radius: float) -> Tuple[int, float]:
+        """
+        Return the index of the trajectory nearest to (x, y) and its
+        distance, or None if no trajectory is within radius.
+        """
+        reach = radius + self.reach
+        (x0, x1), (y0, y1) = (
+            self._cell(np.array([x - reach, x + reach]), 0),
+            self._cell(np.array([y - reach, y + reach]), 2))
+        rows = [np.arange(self._start[row*self.cells + x0],
+                          self._start[row*self.cells + x1 + 1])
+                for row in range(y0, y1 + 1)]
+        candidates = np.concatenate(rows)
+        if len(candidates) == 0:
+            return None
+        # Distance from (x, y) to the nearest point of each segment
+        a, ab = self._a[candidates], self._ab[candidates]
+        ap = np.array([x, y]) - a
+        length2 = np.sum(ab*ab, axis=1)
+        t = np.clip(np.sum(ap*ab, axis=1)/np.where(length2 > 0.0,
+                                                     length2, 1.0),
+                    0.0, 1.0)
+        distance = np.hypot(*(ap - t[:, None]*ab).T)
+        i = np.argmin(distance)
+        if distance[i] > radius:
+            return None
+        return int(self._trajectory[candidates[i]]), float(distance[i])
+
+
+class TrajectoryWorkspace:
+    """
+    Initial conditions of user-defined trajectories, and their points.
+
+    Attributes:
+    samples [int]: Number of points of each trajectory.
+    """
+
+    def __init__(self, samples: int = 120, capacity: int = 16) -> None:
+        """
+        Initializer.
+        """
+        self.samples = samples
+        self._count = 0
+        self._xy0 = np.empty([capacity, 2])
+        self._xy = np.full([capacity, samples, 2], np.nan)
+        self._index = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def initial_conditions(self) -> np.ndarray:
+        """
+        (N, 2) array of the initial conditions.
+        """
+        return self._xy0[:self._count]
+
+    @property
+    def trajectories(self) -> np.ndarray:
+        """
+        (N, samples, 2) array of the points of the trajectories, which
+        are written in place when they are recomputed. The points of
+        newly added trajectories are NaN until they are computed.
+        """
+        return self._xy[:self._count]
+
+    def _reserve(self, count: int) -> None:
+        """
+        Grow the arrays, at least doubling their capacity, so that they
+        hold count trajectories.
+        """
+        capacity = len(self._xy0)
+        if count <= capacity:
+            return
+        capacity = max(count, 2*capacity)
+        xy0 = np.empty([capacity, 2])
+        xy = np.full([capacity, self.samples, 2], np.nan)
+        xy0[:self._count] = self.initial_conditions
+        xy[:self._count] = self.trajectories
+        self._xy0, self._xy = xy0, xy
+
+    def add(self, xy0: np.ndarray) -> int:
+        """
+        Add the trajectories of an (N, 2) array of initial conditions,
+        and return the index of the first one.
+        """
+        xy0 = np.reshape(np.asarray(xy0, np.float64), [-1, 2])
+        start = self._count
+        self._reserve(start + len(xy0))
+        self._xy0[start:start + len(xy0)] = xy0
+        self._xy[start:start + len(xy0)] = np.nan
+        self._count += len(xy0)
+        self._index = None
+        return start
+
+    def remove(self, indices: Sequence[int]) -> None:
+        """
+        Remove the trajectories with the given indices. The order of the
+        others is kept.
+        """
+        keep = np.ones(self._count, bool)
+        keep[np.asarray(indices, np.intp)] = False
+        count = int(np.count_nonzero(keep))
+        self._xy0[:count] = self.initial_conditions[keep]
+        self._xy[:count] = self.trajectories[keep]
+        self._count = count
+        self._index = None
+
+    def set(self, xy0: np.ndarray) -> None:
+        """
+        Replace all of the trajectories with those of an (N, 2) array
+        of initial conditions.
+        """
+        xy0 = np.array(xy0, np.float64)
+        self._count = 0
+        self.add(xy0)
+
+    def invalidate(self) -> None:
+        """
+        Drop the spatial index, for example after the trajectories were
+        recomputed. It is rebuilt by the next call of nearest.
+        """
+        self._index = None
+
+    def nearest(self, x: float, y: float, radius: float,
+                bounds: Sequence[float]) -> int:
+        """
+        Return the index of the trajectory nearest to (x, y), or None if
+        no trajectory is within radius. The spatial index covers bounds,
+        which is usually the view of the plot.
+        """
+        if self._count == 0:
+            return None
+        if self._index is None or \
+                not np.array_equal(self._index.bounds, bounds):
+            self._index = TrajectoryIndex(self.trajectories, bounds)
+        found = self._index.nearest(x, y, radius)
+        return None if found is None else found[0]
+
+    def save(self, path: str, **arrays: np.ndarray) -> None:
+        """
+        Save the initial conditions to an .npz file, together with any
+        other given arrays, such as the matrix of the system.
+        """
+        # Written through a file, so that no .npz suffix is appended
+        with open(path, "wb") as f:
+            np.savez(f, initial_conditions=self.initial_conditions,
+                     **arrays)
+
+    def load(self, path: str) -> Dict[str, np.ndarray]:
+        """
+        Replace the trajectories with the initial conditions saved in an
+        .npz file, and return the other arrays that were saved with them.
+        """
+        with np.load(path) as data:
+            arrays = {name: data[name] for name in data.files}
+        self.set(arrays.pop("initial_conditions"))
+        return arrays